@@ -0,0 +1,118 @@
+import json
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from services.job_event_hub import JobSubscription, format_sse, get_job_event_hub
+
+router = APIRouter()
+
+
+def _validate(job_id: List[str], user_id: Optional[str]) -> None:
+    if not job_id and not user_id:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one job_id or a user_id")
+    if len(job_id) > get_job_event_hub().config.max_job_ids:
+        raise HTTPException(status_code=400, detail=f"At most {get_job_event_hub().config.max_job_ids} job ids per subscription")
+
+
+async def _initial_events(subscription: JobSubscription, last_event_id: Optional[str]):
+    """Replay after last_event_id, or else a snapshot of the subscribed jobs"""
+    hub = get_job_event_hub()
+    if last_event_id:
+        return await hub.replay(subscription, last_event_id)
+
+    return [(None, event) for event in await hub.snapshot(subscription)]
+
+
+@router.get('/v1/events/jobs')
+async def job_events(
+    request: Request,
+    job_id: List[str] = Query([], description="Job ids to follow (repeatable)"),
+    user_id: Optional[str] = Query(None, description="Follow every job of this user"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-sent job status and progress events
+
+    Starts with the current state of the requested jobs (or, on reconnect,
+    with what was missed since Last-Event-ID), then streams transitions as
+    workers publish them. Comment lines are sent as heartbeats.
+    """
+    _validate(job_id, user_id)
+    hub = get_job_event_hub()
+    try:
+        subscription = await hub.subscribe(job_id, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Job events unavailable: {str(e)}")
+    try:
+        initial = await _initial_events(subscription, last_event_id)
+    except ValueError:
+        hub.unsubscribe(subscription)
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    except Exception as e:
+        hub.unsubscribe(subscription)
+        raise HTTPException(status_code=503, detail=f"Job events unavailable: {str(e)}")
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            for event_id, event in initial:
+                yield format_sse(event, event_id)
+            while True:
+                if subscription.overflowed:
+                    # The client reconnects with Last-Event-ID and replays the gap
+                    yield "event: overflow\ndata: {}\n\n"
+                    return
+                item = await subscription.next(hub.config.heartbeat)
+                if item is None:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(item[1], item[0])
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket('/v1/events/jobs/ws')
+async def job_events_ws(
+    websocket: WebSocket,
+    job_id: List[str] = Query([]),
+    user_id: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Query(None),
+):
+    """The same events over a WebSocket, one JSON message per event"""
+    try:
+        _validate(job_id, user_id)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    await websocket.accept()
+    hub = get_job_event_hub()
+    try:
+        subscription = await hub.subscribe(job_id, user_id)
+    except Exception:
+        await websocket.close(code=1011, reason="Job events unavailable")
+        return
+    try:
+        for event_id, event in await _initial_events(subscription, last_event_id):
+            await websocket.send_text(json.dumps({"id": event_id, "event": event}))
+        while not subscription.overflowed:
+            item = await subscription.next(hub.config.heartbeat)
+            if item is None:
+                await websocket.send_text(json.dumps({"type": "ping"}))
+                continue
+            await websocket.send_text(json.dumps({"id": item[0], "event": item[1]}))
+        await websocket.close(code=1013, reason="Subscriber fell behind; reconnect with last_event_id")
+    except WebSocketDisconnect:
+        pass
+    except ValueError:
+        await websocket.close(code=1008, reason="Invalid last_event_id")
+    finally:
+        hub.unsubscribe(subscription)
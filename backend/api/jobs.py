@@ -1,20 +1,34 @@
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from services.jobs import JobsStore
 
 router = APIRouter()
 store = JobsStore()
 
+MAX_BULK_JOBS = 10000
+
 class CreateJobRequest(BaseModel):
     type: str
     payload: dict
 
+class BulkCreateJobsRequest(BaseModel):
+    jobs: List[CreateJobRequest]
+
 @router.post('/v1/jobs')
 def create_job(req: CreateJobRequest):
     job_id = store.create_job(req.type, req.payload)
     return {"id": job_id}
 
+@router.post('/v1/jobs/bulk')
+def create_jobs_bulk(req: BulkCreateJobsRequest):
+    if not req.jobs:
+        raise HTTPException(status_code=400, detail="No jobs given")
+    if len(req.jobs) > MAX_BULK_JOBS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_JOBS} jobs per request")
+    job_ids = store.create_jobs([(job.type, job.payload) for job in req.jobs])
+    return {"ids": job_ids, "created": len(job_ids)}
+
 @router.get('/v1/jobs/{job_id}')
 def get_job(job_id: str):
     job = store.get_job(job_id)
@@ -23,6 +37,15 @@ def get_job(job_id: str):
     return job
 
 @router.get('/v1/jobs')
-def list_jobs(limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
-    jobs = store.list_recent(limit=limit, offset=offset)
-    return {"items": jobs, "limit": limit, "offset": offset}
+def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    type: Optional[str] = Query(None, description="Only jobs of this type"),
+    status: Optional[str] = Query(None, description="Only jobs in this status"),
+):
+    try:
+        jobs, next_cursor = store.list_page(limit=limit, cursor=cursor, job_type=type, status=status, offset=offset)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": jobs, "limit": limit, "offset": offset, "next_cursor": next_cursor}
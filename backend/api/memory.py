@@ -113,9 +113,9 @@ async def upload_memory(
         job_id = await processing_service.queue_memory_processing(
             memory_id=memory_id,
             image_uuid=image_uuid,
-            image_data=base64.b64decode(upload_request.image_data),
             user_tags=upload_request.user_tags or [],
-            user_notes=upload_request.user_notes
+            user_notes=upload_request.user_notes,
+            user_id=user_id
         )
         
         return MemoryUploadResponse(
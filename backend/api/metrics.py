@@ -1,13 +1,22 @@
 from fastapi import APIRouter, Response
 from prometheus_client import CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest, Gauge
+from services.inference_executor import get_inference_executor
+from services.job_retention import get_job_compactor
 
 router = APIRouter()
 
 _registry = CollectorRegistry()
 HEALTH_GAUGE = Gauge('eye_health', 'Health status of EYE components', ['component'], registry=_registry)
+JOB_RETENTION_GAUGE = Gauge('eye_job_retention', 'Job metadata compactor totals', ['stat'], registry=_registry)
 
 @router.get('/v1/metrics')
 def metrics():
     HEALTH_GAUGE.labels(component='backend').set(1)
+    for stat, value in get_job_compactor().stats().items():
+        if isinstance(value, (int, float)):
+            JOB_RETENTION_GAUGE.labels(stat=stat).set(value)
     data = generate_latest(_registry)
+    dispatcher = get_inference_executor().dispatcher
+    if dispatcher is not None:
+        data += dispatcher.render_prometheus().encode()
     return Response(content=data, media_type=CONTENT_TYPE_LATEST)
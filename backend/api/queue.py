@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from services.queue import QueueClient
@@ -9,6 +10,11 @@ class EnqueueRequest(BaseModel):
     type: str
     payload: dict
 
+class AckRequest(BaseModel):
+    receipt: str
+    success: bool = True
+    error: Optional[str] = None
+
 @router.post('/v1/queue/enqueue')
 def enqueue_job(req: EnqueueRequest):
     result = queue_client.enqueue({"type": req.type, "payload": req.payload})
@@ -18,5 +24,22 @@ def enqueue_job(req: EnqueueRequest):
 
 @router.get('/v1/queue/dequeue')
 def dequeue_job():
-    job = queue_client.dequeue(block=False)
-    return {"job": job}
+    # The job stays in flight until its receipt is acked (or it times out)
+    item = queue_client.dequeue(block=False)
+    if item is None:
+        return {"job": None}
+    return item
+
+@router.post('/v1/queue/ack')
+def ack_job(req: AckRequest):
+    try:
+        if req.success:
+            return {"acked": queue_client.ack(req.receipt)}
+        retry = queue_client.nack(req.receipt, req.error or "failed")
+        return {"acked": retry >= 0, "retrying": retry > 0, "dead_lettered": retry == 0}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid receipt")
+
+@router.get('/v1/queue/stats')
+def queue_stats():
+    return {**queue_client.stats(), "dead_letters": queue_client.dead_letters(limit=20)}
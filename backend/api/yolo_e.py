@@ -1,16 +1,43 @@
 """
 YOLO-E API endpoints for high-performance object detection and few-shot learning
 """
+import io
 import os
 import json
 import uuid
-from typing import Dict, List, Optional, Any
+import asyncio
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Any, Tuple, Union
 from pathlib import Path
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 from storage.adapters.s3 import S3Adapter
 from config import settings
+from services.yolo_e_registry import (
+    TRAINED_WEIGHTS_DIR,
+    get_model_registry,
+    resolve_base_model_path,
+    resolve_device,
+)
+from services.yolo_e_batcher import BatchKey
+from services.yolo_e_inference import (
+    DEFAULT_IMAGE_SIZE,
+    columns_to_detections,
+    detect_batch,
+    detect_tiled,
+    get_inference_batcher,
+    normalize_classes,
+)
+from services.image_decoder import ImageDecodeError, get_image_decoder
+from services.inference_executor import ExecutorSaturated, get_inference_executor
+from services.text_embedding_cache import get_text_embedding_cache
+from services.detection_cache import content_hash, get_detection_cache
+from services.model_export import BACKENDS, BackendUnavailable, ExportInProgress, get_model_exporter
+from engines.tiling import TileSpec
+from fastapi.concurrency import run_in_threadpool
 
 router = APIRouter()
 
@@ -85,45 +112,64 @@ class YOLOEDetectionResult(BaseModel):
     detections: List[Dict[str, Any]]
     processing_time: float
     confidence_scores: List[float]
+    class_ids: List[int] = []
     class_names: List[str]
     bounding_boxes: List[List[float]]
 
+class YOLOECompactDetectionResult(BaseModel):
+    """YOLO-E detection result as parallel arrays (response_format=compact)"""
+    image_path: str
+    processing_time: float
+    count: int
+    class_ids: List[int]
+    class_names: List[str]
+    confidence_scores: List[float]
+    bounding_boxes: List[List[float]]
+
 class YOLOEModelLoadRequest(BaseModel):
     """YOLO-E model load request"""
     model_config = {"protected_namespaces": ()}
     
     model_path: str
     config_path: Optional[str] = None
+    use_gpu: bool = False
+
+class YOLOEModelExportRequest(BaseModel):
+    """YOLO-E model export request"""
+    model_config = {"protected_namespaces": ()}
+    
+    model_path: str  # Base model file name or trained weights path
+    backends: List[str] = ["onnx", "onnx-int8"]
+
+def _resolve_weights_path(model_path: str) -> str:
+    """Trained weights are passed as full paths, base models by file name"""
+    return model_path if os.path.isabs(model_path) else resolve_base_model_path(model_path)
 
 @router.post("/v1/yolo-e/models/load")
 async def load_yolo_e_model(request: YOLOEModelLoadRequest) -> Dict[str, str]:
     """
-    Load YOLO-E model for inference and training
+    Load YOLO-E model into the process-wide registry so later inference
+    requests reuse it instead of reading the weights again
     
     Args:
         model_path: Path to YOLO-E model weights
         config_path: Optional path to model configuration
+        use_gpu: Whether to warm the GPU copy of the model
     
     Returns:
         Model loading status
     """
     try:
-        # TODO: Implement actual model loading logic
-        # This would integrate with the YOLOENode class
-        
         model_id = str(uuid.uuid4())
         
         # Validate model path exists
-        model_full_path = f"/app/storage/weights/yolo_e/base/{request.model_path}"
+        model_full_path = resolve_base_model_path(request.model_path)
         if not os.path.exists(model_full_path):
             raise HTTPException(status_code=404, detail="Model file not found")
         
-        # Load the actual YOLO-E model using ultralytics
         try:
-            from ultralytics import YOLO
-            
-            # Load the YOLO-E model
-            model = YOLO(model_full_path)
+            device = resolve_device(request.use_gpu)
+            entry = await run_in_threadpool(get_model_registry().warm, model_full_path, device)
             
             # Determine model capabilities based on filename
             model_name = Path(request.model_path).stem
@@ -139,7 +185,7 @@ async def load_yolo_e_model(request: YOLOEModelLoadRequest) -> Dict[str, str]:
                 max_classes=1200,  # LVIS + Objects365 categories
                 few_shot_support=True,
                 loaded_classes=1200,
-                device="cpu",  # Will be updated based on actual device
+                device=device,
                 confidence_threshold=0.5,
                 iou_threshold=0.45,
                 status="loaded"
@@ -151,6 +197,7 @@ async def load_yolo_e_model(request: YOLOEModelLoadRequest) -> Dict[str, str]:
                 "model_path": request.model_path,
                 "message": "YOLO-E model loaded successfully",
                 "model_info": _loaded_yolo_e_model_info.dict(),
+                "registry_entry": entry.to_dict(),
                 "capabilities": {
                     "prompt_free": is_prompt_free,
                     "segmentation": is_segmentation,
@@ -163,9 +210,120 @@ async def load_yolo_e_model(request: YOLOEModelLoadRequest) -> Dict[str, str]:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to load YOLO-E model: {str(e)}")
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load model: {str(e)}")
 
+@router.get("/v1/yolo-e/models/loaded")
+async def get_loaded_models() -> Dict[str, Any]:
+    """
+    List models resident in the registry
+    
+    Returns:
+        Loaded models (most recently used first) and registry statistics
+    """
+    registry = get_model_registry()
+    return {
+        "models": registry.list_loaded(),
+        "stats": registry.stats()
+    }
+
+@router.post("/v1/yolo-e/models/export")
+async def export_yolo_e_model(request: YOLOEModelExportRequest) -> Dict[str, Any]:
+    """
+    Export weights to CPU runtime formats
+    
+    Artifacts are written next to the original weights and reused until the
+    weights file changes.
+    
+    Args:
+        model_path: Base model file name or trained weights path
+        backends: Formats to build ("onnx", "onnx-int8")
+    
+    Returns:
+        Artifact status for every backend
+    """
+    try:
+        weights_path = _resolve_weights_path(request.model_path)
+        if not os.path.exists(weights_path):
+            raise HTTPException(status_code=404, detail=f"Model file not found: {request.model_path}")
+        unknown = [b for b in request.backends if b not in BACKENDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown backends: {', '.join(unknown)}")
+        
+        exporter = get_model_exporter()
+        for backend in request.backends:
+            await run_in_threadpool(exporter.ensure, weights_path, backend)
+        
+        return {
+            "model_path": weights_path,
+            "artifacts": exporter.list_artifacts(weights_path)
+        }
+        
+    except HTTPException:
+        raise
+    except BackendUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model export failed: {str(e)}")
+
+@router.post("/v1/yolo-e/models/compare")
+async def compare_yolo_e_backends(
+    files: List[UploadFile] = File(...),
+    model_path: str = Form("yoloe-11s-seg.pt"),
+    backends: str = Form("torch,onnx,onnx-int8"),  # Comma-separated
+    runs: int = Form(3),
+    confidence_threshold: float = Form(0.25),
+    iou_threshold: float = Form(0.45)
+) -> Dict[str, Any]:
+    """
+    Compare accuracy and CPU latency of runtime backends on sample images
+    
+    Args:
+        files: Representative sample images
+        model_path: Base model file name or trained weights path
+        backends: Backends to compare; torch is the accuracy reference
+        runs: Timed passes per backend
+    
+    Returns:
+        Per-backend latency, throughput, artifact size and agreement with
+        torch; also saved next to the weights as <stem>.backends.json
+    """
+    try:
+        weights_path = _resolve_weights_path(model_path)
+        if not os.path.exists(weights_path):
+            raise HTTPException(status_code=404, detail=f"Model file not found: {model_path}")
+        selected = [b.strip() for b in backends.split(",") if b.strip()]
+        unknown = [b for b in selected if b not in BACKENDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown backends: {', '.join(unknown)}")
+        
+        images = []
+        decoder = get_image_decoder()
+        for file in files:
+            try:
+                images.append(decoder.decode(await file.read(), DEFAULT_IMAGE_SIZE).array)
+            except ImageDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"{file.filename}: {str(e)}")
+        
+        return await run_in_threadpool(
+            get_model_exporter().compare,
+            weights_path,
+            images,
+            selected,
+            max(1, min(runs, 20)),
+            confidence_threshold,
+            iou_threshold
+        )
+        
+    except HTTPException:
+        raise
+    except BackendUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Backend comparison failed: {str(e)}")
+
 # Training endpoints
 @router.post("/v1/yolo-e/training/start")
 async def start_training(request: YOLOETrainingRequest) -> YOLOETrainingJob:
@@ -409,7 +567,7 @@ async def get_trained_models(project_name: Optional[str] = None) -> List[Dict[st
     """
     try:
         models = []
-        models_dir = Path("/app/storage/weights/yolo_e/trained")
+        models_dir = Path(TRAINED_WEIGHTS_DIR)
         
         if project_name:
             project_dir = models_dir / project_name
@@ -442,6 +600,83 @@ async def get_trained_models(project_name: Optional[str] = None) -> List[Dict[st
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get trained models: {str(e)}")
 
+RESPONSE_FORMATS = ("full", "compact")
+# Visual prompting is not implemented yet
+PROMPT_MODES = ("internal", "text")
+
+def _check_response_format(response_format: str) -> None:
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"response_format must be one of: {', '.join(RESPONSE_FORMATS)}")
+
+def _check_prompt_mode(prompt_mode: str) -> None:
+    if prompt_mode not in PROMPT_MODES:
+        raise HTTPException(status_code=400, detail=f"prompt_mode must be one of: {', '.join(PROMPT_MODES)}")
+
+def _format_detections(
+    image_path: str,
+    columns: Dict[str, list],
+    processing_time: float,
+    response_format: str
+) -> Union[YOLOEDetectionResult, YOLOECompactDetectionResult]:
+    """Build the response from columnar detections; compact skips the per-detection dicts"""
+    if response_format == "compact":
+        return YOLOECompactDetectionResult(
+            image_path=image_path,
+            processing_time=processing_time,
+            count=len(columns["class_ids"]),
+            **columns
+        )
+    return YOLOEDetectionResult(
+        image_path=image_path,
+        detections=columns_to_detections(columns),
+        processing_time=processing_time,
+        **columns
+    )
+
+def _tile_spec(tiled: bool, tile_size: int, tile_overlap: float, tile_merge: str) -> Optional[TileSpec]:
+    """Validated tiling settings, or None when tiling is off"""
+    if not tiled:
+        return None
+    spec = TileSpec(tile_size=tile_size, overlap=tile_overlap, merge=tile_merge)
+    try:
+        spec.validate()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return spec
+
+async def _resolve_backend(
+    model_path: str,
+    backend: str,
+    use_gpu: bool,
+    class_list: Optional[List[str]] = None
+) -> Tuple[str, str]:
+    """Weights file and device for an inference backend; the first use starts its export"""
+    if backend not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"backend must be one of: {', '.join(BACKENDS)}")
+    if backend == "torch":
+        return model_path, resolve_device(use_gpu)
+    if class_list:
+        # Exported graphs carry a fixed vocabulary
+        raise HTTPException(status_code=400, detail="Text prompts require backend=torch")
+    try:
+        weights_path = await run_in_threadpool(get_model_exporter().ensure_background, model_path, backend)
+    except ExportInProgress as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except BackendUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model export failed: {str(e)}")
+    # Exported artifacts run on ONNX Runtime's CPU provider
+    return weights_path, "cpu"
+
+def _busy_error(e: ExecutorSaturated) -> HTTPException:
+    """Map a saturated inference queue to 503 with a Retry-After hint"""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 # Inference with trained models
 @router.post("/v1/yolo-e/infer/trained")
 async def infer_with_trained_model(
@@ -449,8 +684,14 @@ async def infer_with_trained_model(
     model_path: str = Form(...),
     confidence_threshold: float = Form(0.5),
     iou_threshold: float = Form(0.45),
-    use_gpu: bool = Form(True)
-) -> YOLOEDetectionResult:
+    use_gpu: bool = Form(True),
+    backend: str = Form("torch"),  # "torch", "onnx", "onnx-int8"
+    tiled: bool = Form(False),  # Sliced inference for high-resolution images
+    tile_size: int = Form(640),
+    tile_overlap: float = Form(0.2),
+    tile_merge: str = Form("nms"),  # "nms" or "wbf"
+    response_format: str = Form("full")  # "full" or "compact"
+) -> Union[YOLOEDetectionResult, YOLOECompactDetectionResult]:
     """
     Perform inference with trained model
     
@@ -460,6 +701,15 @@ async def infer_with_trained_model(
         confidence_threshold: Minimum confidence for detections
         iou_threshold: IoU threshold for NMS
         use_gpu: Whether to use GPU for inference
+        backend: "torch", or "onnx" / "onnx-int8" to run an exported
+            artifact on CPU (exported on first use)
+        tiled: Cut the full-resolution image into overlapping tiles and
+            merge detections across tiles instead of downscaling it
+        tile_size: Tile edge in pixels
+        tile_overlap: Fraction of a tile shared with its neighbours
+        tile_merge: "nms" or "wbf" (weighted box fusion) across tiles
+        response_format: "full" for per-detection dicts plus parallel lists,
+            "compact" for parallel lists only
         
     Returns:
         Detection results
@@ -469,77 +719,61 @@ async def infer_with_trained_model(
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="Only image files are allowed")
         
+        _check_response_format(response_format)
+        tile_spec = _tile_spec(tiled, tile_size, tile_overlap, tile_merge)
+        
         # Validate model path
         if not os.path.exists(model_path):
             raise HTTPException(status_code=404, detail=f"Trained model not found: {model_path}")
         
-        # Save uploaded file temporarily
-        import tempfile
         import time
         start_time = time.time()
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        weights_path, device = await _resolve_backend(model_path, backend, use_gpu)
         
-        try:
-            # Set environment variables to disable GUI dependencies for OpenCV
-            import os
-            os.environ['QT_QPA_PLATFORM'] = 'offscreen'
-            os.environ['DISPLAY'] = ':99'
-            os.environ['OPENCV_VIDEOIO_PRIORITY_MSMF'] = '0'
-            
-            from ultralytics import YOLO
-            
-            # Load trained model
-            model = YOLO(model_path)
-            
-            # Set device (GPU/CPU)
-            device = "cuda" if use_gpu else "cpu"
-            
-            # Run inference
-            results = model(temp_file_path, device=device, conf=confidence_threshold, iou=iou_threshold)
-            
-            # Process results
-            detections = []
-            if results and len(results) > 0:
-                result = results[0]
-                if result.boxes is not None:
-                    for i in range(len(result.boxes)):
-                        box = result.boxes.xyxy[i].cpu().numpy()
-                        conf = result.boxes.conf[i].cpu().numpy()
-                        cls = int(result.boxes.cls[i].cpu().numpy())
-                        
-                        detections.append({
-                            "class_id": cls,
-                            "class_name": model.names[cls] if cls in model.names else f"class_{cls}",
-                            "confidence": float(conf),
-                            "bbox": [float(box[0]), float(box[1]), float(box[2]), float(box[3])]
-                        })
-            
-            processing_time = time.time() - start_time
+        content = await file.read()
+        
+        # Re-submitted images are answered from the detection cache
+        cache = get_detection_cache()
+        cache_key = cache.cache_key(
+            content_hash(content), weights_path, confidence_threshold, iou_threshold,
+            options=tile_spec.cache_tag() if tile_spec else ""
+        )
+        detections = await cache.aget(cache_key)
+        
+        if detections is None:
+            # Decode the upload in memory; tiled inference keeps full resolution
+            try:
+                image = await run_in_threadpool(
+                    get_image_decoder().decode, content, None if tile_spec else DEFAULT_IMAGE_SIZE
+                )
+            except ImageDecodeError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             
-            # Create result object
-            result = YOLOEDetectionResult(
-                image_path=file.filename,
-                detections=detections,
-                processing_time=processing_time,
-                confidence_scores=[det["confidence"] for det in detections],
-                class_ids=[det["class_id"] for det in detections],
-                class_names=[det["class_name"] for det in detections],
-                bounding_boxes=[det["bbox"] for det in detections]
+            # Trained model comes from the shared registry
+            key = BatchKey(
+                model_path=weights_path,
+                device=device,
+                confidence_threshold=confidence_threshold,
+                iou_threshold=iou_threshold
             )
-            
-            return result
-            
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
-        
+            executor = get_inference_executor()
+            with executor.admit():
+                if tile_spec:
+                    detections = await executor.run(detect_tiled, key, image, tile_spec)
+                else:
+                    detections = (await executor.run(detect_batch, key, [image]))[0]
+            await cache.aset(cache_key, detections)
+        
+        processing_time = time.time() - start_time
+        
+        # Create result object
+        return _format_detections(file.filename, detections, processing_time, response_format)
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturated as e:
+        raise _busy_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
 
@@ -618,9 +852,15 @@ async def infer_single_image(
     confidence_threshold: float = Form(0.5),
     iou_threshold: float = Form(0.45),
     use_gpu: bool = Form(True),
+    backend: str = Form("torch"),  # "torch", "onnx", "onnx-int8"
     custom_classes: str = Form(""),  # Comma-separated class names
-    prompt_mode: str = Form("internal")  # "internal", "text", "visual"
-) -> YOLOEDetectionResult:
+    prompt_mode: str = Form("internal"),  # "internal", "text"
+    tiled: bool = Form(False),  # Sliced inference for high-resolution images
+    tile_size: int = Form(640),
+    tile_overlap: float = Form(0.2),
+    tile_merge: str = Form("nms"),  # "nms" or "wbf"
+    response_format: str = Form("full")  # "full" or "compact"
+) -> Union[YOLOEDetectionResult, YOLOECompactDetectionResult]:
     """
     Perform inference on single image with YOLO-E
     
@@ -628,6 +868,15 @@ async def infer_single_image(
         file: Image file to process
         confidence_threshold: Minimum confidence for detections
         iou_threshold: IoU threshold for NMS
+        backend: "torch", or "onnx" / "onnx-int8" to run an exported
+            artifact on CPU (exported on first use)
+        tiled: Cut the full-resolution image into overlapping tiles and
+            merge detections across tiles instead of downscaling it
+        tile_size: Tile edge in pixels
+        tile_overlap: Fraction of a tile shared with its neighbours
+        tile_merge: "nms" or "wbf" (weighted box fusion) across tiles
+        response_format: "full" for per-detection dicts plus parallel lists,
+            "compact" for parallel lists only
     
     Returns:
         Detection results
@@ -636,98 +885,303 @@ async def infer_single_image(
         # Validate file type
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="Only image files are allowed")
+        _check_response_format(response_format)
+        _check_prompt_mode(prompt_mode)
+        tile_spec = _tile_spec(tiled, tile_size, tile_overlap, tile_merge)
         
-        # Save uploaded file temporarily
-        import tempfile
         import time
         start_time = time.time()
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # Construct model path
+        model_full_path = resolve_base_model_path(model_path)
+        if not os.path.exists(model_full_path):
+            raise HTTPException(status_code=404, detail=f"Model file not found: {model_path}")
         
-        try:
-            # Load and run YOLO-E inference
-            import os
-            os.environ['QT_QPA_PLATFORM'] = 'offscreen'
-            os.environ['DISPLAY'] = ':99'
-            os.environ['OPENCV_VIDEOIO_PRIORITY_MSMF'] = '0'
-            
-            from ultralytics import YOLO
-            
-            # Construct model path
-            model_full_path = f"/app/storage/weights/yolo_e/base/{model_path}"
-            if not os.path.exists(model_full_path):
-                raise HTTPException(status_code=404, detail=f"Model file not found: {model_path}")
-            
-            # Load model
-            model = YOLO(model_full_path)
-            
-            # Set device (GPU/CPU)
-            device = "cuda" if use_gpu else "cpu"
-            
-            # Handle different prompt modes according to YOLOE documentation
-            if prompt_mode == "text" and custom_classes:
-                # Text prompting: Use custom classes with set_classes
-                class_list = [cls.strip() for cls in custom_classes.split(",") if cls.strip()]
-                if class_list:
-                    # Get text embeddings for the classes
-                    try:
-                        text_pe = model.get_text_pe(class_list)
-                        model.set_classes(class_list, text_pe)
-                    except AttributeError:
-                        # Fallback if get_text_pe is not available
-                        model.set_classes(class_list)
-            elif prompt_mode == "internal":
-                # Use internal vocabulary (1200+ base classes) - default behavior
-                pass
-            # Note: Visual prompting would require additional implementation
-            
-            # Run inference
-            results = model(temp_file_path, device=device, conf=confidence_threshold, iou=iou_threshold)
-            
-            # Process results
-            detections = []
-            if results and len(results) > 0:
-                result = results[0]
-                if result.boxes is not None:
-                    for i in range(len(result.boxes)):
-                        box = result.boxes.xyxy[i].cpu().numpy()
-                        conf = result.boxes.conf[i].cpu().numpy()
-                        cls = int(result.boxes.cls[i].cpu().numpy())
-                        
-                        detections.append({
-                            "class_id": cls,
-                            "class_name": model.names[cls] if cls in model.names else f"class_{cls}",
-                            "confidence": float(conf),
-                            "bbox": [float(box[0]), float(box[1]), float(box[2]), float(box[3])]
-                        })
-            
-            processing_time = time.time() - start_time
+        # Handle different prompt modes according to YOLOE documentation
+        class_list: List[str] = []
+        if prompt_mode == "text" and custom_classes:
+            # Text prompting: Use custom classes with set_classes
+            class_list = normalize_classes(custom_classes)
+        # "internal" uses the built-in vocabulary (1200+ base classes)
+        
+        weights_path, device = await _resolve_backend(model_full_path, backend, use_gpu, class_list)
+        
+        content = await file.read()
+        
+        # Re-submitted images are answered from the detection cache
+        cache = get_detection_cache()
+        cache_key = cache.cache_key(
+            content_hash(content), weights_path, confidence_threshold, iou_threshold, class_list, prompt_mode,
+            options=tile_spec.cache_tag() if tile_spec else ""
+        )
+        detections = await cache.aget(cache_key)
+        
+        if detections is None:
+            # Decode the upload in memory; tiled inference keeps full resolution
+            try:
+                image = await run_in_threadpool(
+                    get_image_decoder().decode, content, None if tile_spec else DEFAULT_IMAGE_SIZE
+                )
+            except ImageDecodeError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             
-            # Create result object
-            result = YOLOEDetectionResult(
-                image_path=file.filename,
-                detections=detections,
-                processing_time=processing_time,
-                confidence_scores=[det["confidence"] for det in detections],
-                class_ids=[det["class_id"] for det in detections],
-                class_names=[det["class_name"] for det in detections],
-                bounding_boxes=[det["bbox"] for det in detections]
+            # Concurrent requests with the same key share one forward pass
+            batch_key = BatchKey(
+                model_path=weights_path,
+                device=device,
+                confidence_threshold=confidence_threshold,
+                iou_threshold=iou_threshold,
+                classes=tuple(class_list)
+            )
+            executor = get_inference_executor()
+            with executor.admit():
+                if tile_spec:
+                    # Tiles already form a batch, so skip the micro-batcher
+                    detections = await executor.run(detect_tiled, batch_key, image, tile_spec)
+                else:
+                    detections = await get_inference_batcher().submit(batch_key, image)
+            await cache.aset(cache_key, detections)
+        
+        processing_time = time.time() - start_time
+        
+        # Create result object
+        return _format_detections(file.filename, detections, processing_time, response_format)
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturated as e:
+        raise _busy_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
+
+MAX_BATCH_IMAGES = int(os.getenv("EYE_YOLO_E_MAX_BATCH_IMAGES", "1000"))
+
+def _parse_object_keys(object_keys: str) -> List[str]:
+    """Accept a JSON array or a comma-separated list of object keys"""
+    object_keys = object_keys.strip()
+    if not object_keys:
+        return []
+    if object_keys.startswith("["):
+        return [str(key) for key in json.loads(object_keys)]
+    return [key.strip() for key in object_keys.split(",") if key.strip()]
+
+@router.post("/v1/yolo-e/infer/batch")
+async def infer_batch_images(
+    files: Optional[List[UploadFile]] = File(None),
+    object_keys: str = Form(""),  # JSON array or comma-separated object-store keys
+    model_path: str = Form("yoloe-11s-seg.pt"),
+    confidence_threshold: float = Form(0.5),
+    iou_threshold: float = Form(0.45),
+    use_gpu: bool = Form(True),
+    backend: str = Form("torch"),  # "torch", "onnx", "onnx-int8"
+    custom_classes: str = Form(""),  # Comma-separated class names
+    prompt_mode: str = Form("internal"),  # "internal", "text"
+    batch_size: int = Form(16),
+    response_format: str = Form("full")  # "full" or "compact"
+) -> StreamingResponse:
+    """
+    Perform inference on many images in one call, streaming results
+    
+    Args:
+        files: Image uploads
+        object_keys: Object-store keys to fetch instead of (or besides) uploads
+        batch_size: Images per forward pass
+        backend: "torch", or "onnx" / "onnx-int8" to run an exported
+            artifact on CPU (exported on first use)
+        response_format: "full" for per-detection dicts, "compact" for
+            parallel class/confidence/box arrays
+    
+    Returns:
+        NDJSON stream with one line per image, in completion order, followed
+        by a summary line
+    """
+    files = files or []
+    try:
+        keys = _parse_object_keys(object_keys)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="object_keys must be a JSON array or comma-separated list")
+    
+    total = len(files) + len(keys)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Provide files or object_keys")
+    if total > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IMAGES} images per request")
+    batch_size = max(1, min(batch_size, 64))
+    _check_response_format(response_format)
+    _check_prompt_mode(prompt_mode)
+    
+    model_full_path = resolve_base_model_path(model_path)
+    if not os.path.exists(model_full_path):
+        raise HTTPException(status_code=404, detail=f"Model file not found: {model_path}")
+    
+    class_list = normalize_classes(custom_classes) if prompt_mode == "text" and custom_classes else []
+    weights_path, device = await _resolve_backend(model_full_path, backend, use_gpu, class_list)
+    key = BatchKey(
+        model_path=weights_path,
+        device=device,
+        confidence_threshold=confidence_threshold,
+        iou_threshold=iou_threshold,
+        classes=tuple(class_list)
+    )
+    
+    # FastAPI closes the form's files before the response streams, so take
+    # over the spooled upload files and read each one only when its chunk
+    # is decoded; large uploads stay on disk until then
+    sources: List[Dict[str, Any]] = []
+    for file in files:
+        sources.append({"image_path": file.filename, "file": file.file})
+        file.file = io.BytesIO()
+    for object_key in keys:
+        sources.append({"image_path": object_key, "object_key": object_key})
+    
+    # Hold one executor slot for the whole stream; reject before streaming starts
+    executor = get_inference_executor()
+    admission = ExitStack()
+    admission.callback(_close_sources, sources)
+    try:
+        admission.enter_context(executor.admit())
+    except ExecutorSaturated as e:
+        admission.close()
+        raise _busy_error(e)
+    
+    # Closing is idempotent; the background task covers streams that never start
+    return StreamingResponse(
+        _stream_batch_inference(key, sources, batch_size, admission, response_format),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(admission.close)
+    )
+
+def _close_sources(sources: List[Dict[str, Any]]) -> None:
+    """Close upload files taken over by the batch endpoint"""
+    for source in sources:
+        upload = source.get("file")
+        if upload is not None:
+            upload.close()
+
+def _load_batch_source(source: Dict[str, Any], adapter_holder: Dict[str, S3Adapter]):
+    """Read or fetch, then decode, one batch input"""
+    upload = source.get("file")
+    if upload is not None:
+        upload.seek(0)
+        data = upload.read()
+        upload.close()
+    else:
+        if "adapter" not in adapter_holder:
+            adapter_holder["adapter"] = S3Adapter(
+                bucket=settings.s3_bucket,
+                endpoint_url=settings.s3_endpoint,
+                access_key=settings.s3_access_key,
+                secret_key=settings.s3_secret_key,
+                region=settings.s3_region,
+                create_bucket=False,
             )
+        data = adapter_holder["adapter"].download_bytes(source["object_key"])
+    return get_image_decoder().decode(data, DEFAULT_IMAGE_SIZE)
+
+async def _decode_chunk(chunk: List[Tuple[int, Dict[str, Any]]], adapter_holder: Dict[str, S3Adapter]):
+    """Decode a chunk concurrently; failures are returned in place of images"""
+    async def load(source):
+        try:
+            return await run_in_threadpool(_load_batch_source, source, adapter_holder)
+        except Exception as e:
+            return e
+    return await asyncio.gather(*(load(source) for _, source in chunk))
+
+async def _stream_batch_inference(
+    key: BatchKey,
+    sources: List[Dict[str, Any]],
+    batch_size: int,
+    admission: ExitStack,
+    response_format: str = "full"
+):
+    """Yield NDJSON lines, decoding the next chunk while the current one runs"""
+    import time
+    start_time = time.time()
+    executor = get_inference_executor()
+    adapter_holder: Dict[str, S3Adapter] = {}
+    indexed = list(enumerate(sources))
+    chunks = [indexed[i:i + batch_size] for i in range(0, len(indexed), batch_size)]
+    failed = 0
+    next_decode = None
+    
+    try:
+        next_decode = asyncio.ensure_future(_decode_chunk(chunks[0], adapter_holder))
+        for chunk_index, chunk in enumerate(chunks):
+            decoded = await next_decode
+            if chunk_index + 1 < len(chunks):
+                next_decode = asyncio.ensure_future(_decode_chunk(chunks[chunk_index + 1], adapter_holder))
             
-            return result
+            chunk_start = time.time()
+            ready = [(item, image) for item, image in zip(chunk, decoded) if not isinstance(image, Exception)]
+            for (index, source), image in zip(chunk, decoded):
+                if isinstance(image, Exception):
+                    failed += 1
+                    yield json.dumps({"index": index, "image_path": source["image_path"], "error": str(image)}) + "\n"
+            if not ready:
+                continue
             
-        finally:
-            # Clean up temporary file
             try:
-                os.unlink(temp_file_path)
-            except:
-                pass
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
+                detections = await executor.run(detect_batch, key, [image for _, image in ready])
+            except Exception as e:
+                for (index, source), _ in ready:
+                    failed += 1
+                    yield json.dumps({"index": index, "image_path": source["image_path"], "error": f"Inference failed: {str(e)}"}) + "\n"
+                continue
+            
+            processing_time = time.time() - chunk_start
+            for ((index, source), _), columns in zip(ready, detections):
+                line = {"index": index, "image_path": source["image_path"], "processing_time": processing_time}
+                if response_format == "compact":
+                    line.update(count=len(columns["class_ids"]), **columns)
+                else:
+                    line["detections"] = columns_to_detections(columns)
+                yield json.dumps(line) + "\n"
+        
+        yield json.dumps({
+            "done": True,
+            "total": len(sources),
+            "failed": failed,
+            "processing_time": time.time() - start_time
+        }) + "\n"
+    finally:
+        # The client may disconnect while the next chunk is still decoding
+        if next_decode is not None and not next_decode.done():
+            next_decode.cancel()
+        admission.close()
+
+@router.get("/v1/yolo-e/batching")
+async def get_batching_status() -> Dict[str, Any]:
+    """
+    Get micro-batching policies and statistics
+    
+    Returns:
+        Per-model batch policies, queue depth and batch size statistics
+    """
+    return {
+        **get_inference_batcher().stats(),
+        "executor": get_inference_executor().stats(),
+        "text_embeddings": get_text_embedding_cache().stats()
+    }
+
+@router.get("/v1/yolo-e/cache")
+async def get_detection_cache_stats() -> Dict[str, Any]:
+    """
+    Get detection cache statistics
+    
+    Returns:
+        Entry counts and memory/Redis hit and miss counters
+    """
+    return get_detection_cache().stats()
+
+@router.delete("/v1/yolo-e/cache")
+async def clear_detection_cache() -> Dict[str, Any]:
+    """
+    Drop in-process cached detections
+    
+    Returns:
+        Number of entries removed
+    """
+    return {"cleared": get_detection_cache().clear()}
 
 @router.get("/v1/yolo-e/classes/base")
 async def get_base_classes() -> Dict[str, Any]:
@@ -739,10 +1193,11 @@ async def get_base_classes() -> Dict[str, Any]:
     """
     try:
         # Load a YOLOE model to get the base classes
-        model_full_path = "/app/storage/weights/yolo_e/base/yoloe-11s-seg.pt"
+        model_full_path = resolve_base_model_path("yoloe-11s-seg.pt")
         if os.path.exists(model_full_path):
-            from ultralytics import YOLO
-            model = YOLO(model_full_path)
+            # First call loads the weights, so keep it off the event loop
+            entry = await run_in_threadpool(get_model_registry().warm, model_full_path, "cpu")
+            model = entry.model
             
             # Get class names from the model
             class_names = list(model.names.values()) if hasattr(model, 'names') else []
@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import Response, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,15 +7,36 @@ from fastapi.exceptions import RequestValidationError
 from api.routes import router as api_router
 from api.metrics import router as metrics_router
 from api.queue import router as queue_router
-from api.jobs import router as jobs_router
+from api.jobs import router as jobs_router, store as jobs_store
 from api.yolo_e import router as yolo_e_router
 from api.annotations import router as annotations_router
 from api.ollama import router as ollama_router
 from api.memory import router as memory_router
+from api.events import router as events_router
+from services.model_warmup import get_model_warmup
+from services.job_retention import get_job_compactor
+from services.job_event_hub import get_job_event_hub
+from services.memory_processing_service import cleanup_memory_processing_service, get_memory_processing_service
 
 print("DEBUG: Imported annotations router")
 
-app = FastAPI(title="EYE API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm models in the background: /health answers at once, /ready waits for warm-up
+    asyncio.get_running_loop().run_in_executor(None, get_model_warmup().run)
+    # Index job records written before the type/status indexes existed (once)
+    asyncio.get_running_loop().run_in_executor(None, jobs_store.ensure_indexed)
+    # Expire and archive finished job records in the background
+    get_job_compactor().start()
+    # Resume queued memory jobs (unless a separate memory worker consumes them)
+    await get_memory_processing_service().initialize()
+    yield
+    get_model_warmup().stop()
+    get_job_compactor().stop()
+    await cleanup_memory_processing_service()
+    await get_job_event_hub().close()
+
+app = FastAPI(title="EYE API", lifespan=lifespan)
 
 # Custom exception handler for validation errors
 @app.exception_handler(RequestValidationError)
@@ -65,6 +88,14 @@ async def watermark_header(request: Request, call_next):
 def health():
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until configured models are loaded and warmed"""
+    status = get_model_warmup().status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
 app.include_router(api_router, prefix="/api")
 app.include_router(metrics_router, prefix="/api")
 app.include_router(queue_router, prefix="/api")
@@ -73,3 +104,4 @@ app.include_router(yolo_e_router, prefix="/api")
 app.include_router(annotations_router, prefix="/api")
 app.include_router(ollama_router, prefix="/api")
 app.include_router(memory_router, prefix="/api")
+app.include_router(events_router, prefix="/api")
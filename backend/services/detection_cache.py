@@ -0,0 +1,186 @@
+"""
+YOLO-E Detection Cache
+
+Caches detection results by image content so re-submitted images
+(memory re-processing, pre-labeling reruns, UI refreshes) skip inference:
+1. Keys combine the image content hash with the model fingerprint,
+   thresholds, class set and prompt mode
+2. In-process LRU tier, plus an optional Redis tier with TTL
+3. A changed weights file changes the fingerprint, so results from the
+   old weights are never served
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+import redis
+
+from services.yolo_e_registry import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+DETECTION_CACHE_KEY = "eye:yolo_e:detections:v2:{digest}"
+
+
+@dataclass
+class DetectionCacheConfig:
+    """Detection cache configuration"""
+    enabled: bool = os.getenv("EYE_DETECTION_CACHE", "true").lower() == "true"
+    max_entries: int = int(os.getenv("EYE_DETECTION_CACHE_SIZE", "2048"))
+    redis_enabled: bool = os.getenv("EYE_DETECTION_CACHE_REDIS", "false").lower() == "true"
+    redis_url: str = REDIS_URL
+    ttl_seconds: int = int(os.getenv("EYE_DETECTION_CACHE_TTL", str(24 * 3600)))
+
+
+def content_hash(data: bytes) -> str:
+    """Hash of the encoded image bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DetectionCache:
+    """Two-tier (memory, Redis) cache of per-image detections (columnar format)"""
+
+    def __init__(self, config: Optional[DetectionCacheConfig] = None):
+        self.config = config or DetectionCacheConfig()
+        self._entries: "OrderedDict[str, Dict[str, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis: Optional[redis.Redis] = None
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def redis(self) -> Optional[redis.Redis]:
+        if self.config.redis_enabled and self._redis is None:
+            self._redis = redis.Redis.from_url(self.config.redis_url)
+        return self._redis
+
+    def cache_key(
+        self,
+        image_hash: str,
+        model_path: str,
+        confidence_threshold: float,
+        iou_threshold: float,
+        classes: Sequence[str] = (),
+        prompt_mode: str = "internal",
+        options: str = "",
+    ) -> str:
+        """options carries any other setting that changes the output, e.g. tiling"""
+        payload = "\n".join([
+            image_hash,
+            model_fingerprint(model_path),
+            f"{confidence_threshold:.4f}",
+            f"{iou_threshold:.4f}",
+            prompt_mode,
+            ",".join(classes),
+            options,
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, list]]:
+        """Look up detections, promoting Redis hits into memory"""
+        if not self.config.enabled:
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key]
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(DETECTION_CACHE_KEY.format(digest=key))
+                if raw is not None:
+                    detections = json.loads(raw)
+                    self.redis_hits += 1
+                    self._remember(key, detections)
+                    return detections
+            except Exception as e:
+                logger.warning(f"Detection cache Redis lookup failed: {e}")
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, detections: Dict[str, list]) -> None:
+        if not self.config.enabled:
+            return
+        self._remember(key, detections)
+        if self.redis is not None:
+            try:
+                self.redis.set(
+                    DETECTION_CACHE_KEY.format(digest=key),
+                    json.dumps(detections),
+                    ex=self.config.ttl_seconds,
+                )
+            except Exception as e:
+                logger.warning(f"Detection cache Redis write failed: {e}")
+
+    async def aget(self, key: str) -> Optional[Dict[str, list]]:
+        """get() that keeps Redis round-trips off the event loop"""
+        if self.redis is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, detections: Dict[str, list]) -> None:
+        if self.redis is None:
+            self.set(key, detections)
+            return
+        await asyncio.to_thread(self.set, key, detections)
+
+    def clear(self) -> int:
+        """
+        Drop all in-memory entries
+
+        Redis entries for changed weights are unreachable through the new
+        fingerprint and expire with their TTL.
+        """
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self.invalidations += 1
+        return removed
+
+    def _remember(self, key: str, detections: Dict[str, list]) -> None:
+        with self._lock:
+            self._entries[key] = detections
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.redis_hits + self.misses
+        return {
+            "enabled": self.config.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.config.max_entries,
+            "redis_enabled": self.config.redis_enabled,
+            "ttl_seconds": self.config.ttl_seconds,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Global instance
+_detection_cache: Optional[DetectionCache] = None
+
+
+def get_detection_cache() -> DetectionCache:
+    """Get the global detection cache instance"""
+    global _detection_cache
+    if _detection_cache is None:
+        _detection_cache = DetectionCache()
+    return _detection_cache
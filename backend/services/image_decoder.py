@@ -0,0 +1,133 @@
+"""
+Image Decoder
+
+Decodes uploaded image bytes straight into numpy arrays for inference,
+without a round-trip through temporary files:
+1. Size guards on both the encoded payload and the decoded pixel count
+2. EXIF orientation is applied so boxes match what the user sees
+3. Large JPEGs are downscaled during decode with PIL draft mode
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import io
+import os
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+class ImageDecodeError(ValueError):
+    """Raised when an upload cannot be decoded or fails a size guard"""
+
+
+@dataclass
+class DecoderConfig:
+    """Image decoder configuration"""
+    max_bytes: int = int(os.getenv("EYE_DECODE_MAX_BYTES", str(50 * 1024 * 1024)))
+    max_pixels: int = int(os.getenv("EYE_DECODE_MAX_PIXELS", str(200_000_000)))
+    draft_enabled: bool = os.getenv("EYE_DECODE_DRAFT", "true").lower() == "true"
+    # Only use draft mode when the source is at least this many times larger
+    # than the model input, so the reduced image is still >= the input size
+    draft_min_ratio: float = float(os.getenv("EYE_DECODE_DRAFT_MIN_RATIO", "2.0"))
+
+
+@dataclass
+class DecodedImage:
+    """Decoded image ready for inference"""
+    array: np.ndarray  # HWC, BGR, uint8 (the layout ultralytics expects for arrays)
+    original_size: Tuple[int, int]  # (width, height) after EXIF orientation
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return (self.array.shape[1], self.array.shape[0])
+
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """Factors that map array coordinates back to original image coordinates"""
+        width, height = self.size
+        return (self.original_size[0] / width, self.original_size[1] / height)
+
+
+def _oriented_size(image: Image.Image) -> Tuple[int, int]:
+    """Image size after EXIF orientation, without decoding pixels"""
+    width, height = image.size
+    try:
+        # Orientations 5-8 rotate by 90 degrees and swap the axes
+        if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            return (height, width)
+    except Exception:
+        pass
+    return (width, height)
+
+
+class ImageDecoder:
+    """Shared, stateless decoder for inference uploads"""
+
+    def __init__(self, config: Optional[DecoderConfig] = None):
+        self.config = config or DecoderConfig()
+
+    def decode(self, data: bytes, target_size: Optional[int] = None) -> DecodedImage:
+        """
+        Decode image bytes into a BGR ndarray
+
+        Args:
+            data: Encoded image bytes
+            target_size: Model input size; enables draft-mode downscaling of
+                much larger JPEGs when set
+
+        Returns:
+            Decoded image with the original (oriented) size for box rescaling
+        """
+        if not data:
+            raise ImageDecodeError("Empty image upload")
+        if len(data) > self.config.max_bytes:
+            raise ImageDecodeError(f"Image exceeds {self.config.max_bytes} bytes")
+
+        try:
+            image = Image.open(io.BytesIO(data))
+        except Exception as e:
+            raise ImageDecodeError(f"Unsupported image data: {e}")
+
+        width, height = image.size
+        if width * height > self.config.max_pixels:
+            raise ImageDecodeError(f"Image has {width * height} pixels, limit is {self.config.max_pixels}")
+
+        original_size = _oriented_size(image)
+
+        if (
+            target_size
+            and self.config.draft_enabled
+            and image.format == "JPEG"
+            and max(width, height) >= target_size * self.config.draft_min_ratio
+        ):
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale while staying >= target
+            scale = target_size / max(width, height)
+            image.draft("RGB", (max(1, int(width * scale)), max(1, int(height * scale))))
+
+        try:
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            rgb = np.asarray(image)
+        except Exception as e:
+            raise ImageDecodeError(f"Failed to decode image: {e}")
+
+        return DecodedImage(array=np.ascontiguousarray(rgb[:, :, ::-1]), original_size=original_size)
+
+
+# Global instance
+_image_decoder: Optional[ImageDecoder] = None
+
+
+def get_image_decoder() -> ImageDecoder:
+    """Get the global image decoder instance"""
+    global _image_decoder
+    if _image_decoder is None:
+        _image_decoder = ImageDecoder()
+    return _image_decoder
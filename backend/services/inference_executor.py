@@ -0,0 +1,355 @@
+"""
+Inference Executor
+
+Dedicated, bounded pool for blocking model inference so CPU-bound forward
+passes never run on the event loop:
+1. Thread or process workers, sized by configuration
+2. An admission limit on in-flight requests (running plus queued)
+3. Callers over the limit are rejected immediately with a retry hint
+4. In process mode each worker keeps its own model registry, so calls are
+   routed by the orchestrator Dispatcher: least expected wait, preferring
+   the worker that already has the requested model loaded
+5. Preloads (warm-up) run in every worker and are replayed on a worker
+   process that replaces a crashed one; it counts as cold until they finish
+6. In pool mode, callables registered with register_pooled run as one
+   batch on an EnginePool per model: the model is loaded once per worker
+   process and image arrays travel through shared memory instead of
+   being pickled; anything else runs on the thread pool
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from engines.pool import EnginePool
+from orchestrator.dispatcher import Dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the admission queue is full"""
+
+    def __init__(self, in_flight: int, limit: int, retry_after: int):
+        super().__init__(f"Inference queue is full ({in_flight}/{limit} requests in flight)")
+        self.in_flight = in_flight
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+@dataclass
+class ExecutorConfig:
+    """Inference executor configuration"""
+    mode: str = os.getenv("EYE_INFERENCE_EXECUTOR", "thread")  # "thread", "process" or "pool"
+    workers: int = int(os.getenv("EYE_INFERENCE_WORKERS", "2"))
+    max_queue: int = int(os.getenv("EYE_INFERENCE_MAX_QUEUE", "64"))
+    retry_after: int = int(os.getenv("EYE_INFERENCE_RETRY_AFTER", "2"))
+    torch_threads: int = int(os.getenv("EYE_INFERENCE_TORCH_THREADS", "0"))  # 0 keeps torch default
+    pool_slot_mb: int = int(os.getenv("EYE_INFERENCE_POOL_SLOT_MB", "64"))  # shared memory per pool worker
+
+
+# Dispatcher route for model calls in process mode
+INFERENCE_TASK = "inference"
+INFERENCE_ENGINE = "inference_process"
+
+
+@dataclass(frozen=True)
+class PooledCall:
+    """
+    How pool mode runs a registered callable on an EnginePool
+
+    engine: Picklable callable taking a device and returning an unloaded
+        EngineNode; the pool's workers load it with the call's weights
+    split: Maps the call's arguments to (weights_path, device, inputs,
+        infer_batch kwargs); array inputs go through shared memory
+    """
+    engine: Callable[[str], Any]
+    split: Callable[..., Tuple[str, str, List[Any], Dict[str, Any]]]
+
+
+_pooled_calls: Dict[Callable[..., Any], PooledCall] = {}
+
+
+def register_pooled(fn: Callable[..., Any], call: PooledCall) -> None:
+    """Run fn on an engine pool when the executor is in pool mode"""
+    _pooled_calls[fn] = call
+
+
+def _model_of(args: Tuple[Any, ...]) -> Optional[str]:
+    """Model a call runs, when its first argument carries one (e.g. a BatchKey)"""
+    return getattr(args[0], "model_path", None) if args else None
+
+
+def _run_all(calls: List[Callable[[], Any]]) -> None:
+    for call in calls:
+        call()
+
+
+def _init_worker(torch_threads: int) -> None:
+    """Pin torch intra-op threads in each worker"""
+    if torch_threads <= 0:
+        return
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+
+class InferenceExecutor:
+    """Bounded executor with admission control for blocking inference calls"""
+
+    def __init__(self, config: Optional[ExecutorConfig] = None):
+        self.config = config or ExecutorConfig()
+        self._pool: Optional[Executor] = None
+        self._processes: Dict[str, Executor] = {}
+        self._preloads: List[partial] = []
+        self._cold: set = set()
+        self._engine_pools: Dict[Tuple[Any, str, str], EnginePool] = {}
+        self._lock = threading.Lock()
+        self._engine_pool_lock = threading.Lock()
+        self.dispatcher: Optional[Dispatcher] = None
+        if self.config.mode == "process":
+            # Local processes have no heartbeats; a dead one shows up as BrokenProcessPool
+            self.dispatcher = Dispatcher(heartbeat_timeout=float("inf"))
+            self.dispatcher.register(INFERENCE_TASK, INFERENCE_ENGINE)
+            for index in range(self.config.workers):
+                self.dispatcher.add_worker(f"process-{index}", INFERENCE_ENGINE)
+        self._in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def limit(self) -> int:
+        return self.config.workers + self.config.max_queue
+
+    @property
+    def pool(self) -> Executor:
+        """Shared thread pool (thread mode, and unregistered calls in pool mode)"""
+        if self._pool is None:
+            _init_worker(self.config.torch_threads)
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.config.workers,
+                thread_name_prefix="eye-inference",
+            )
+            logger.info(f"Started thread inference executor with {self.config.workers} workers")
+        return self._pool
+
+    def _process(self, worker_id: str) -> Executor:
+        """Single-process pool behind one dispatcher worker (process mode)"""
+        with self._lock:
+            executor = self._processes.get(worker_id)
+            if executor is None:
+                executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    initializer=_init_worker,
+                    initargs=(self.config.torch_threads,),
+                )
+                self._processes[worker_id] = executor
+                logger.info(f"Started inference process {worker_id}")
+            return executor
+
+    def _engine_pool(self, engine: Callable[[str], Any], weights_path: str, device: str) -> EnginePool:
+        """
+        Started EnginePool for one engine, model and device (pool mode)
+
+        Blocking: the first call loads the model in every pool worker.
+        """
+        with self._engine_pool_lock:
+            key = (engine, weights_path, device)
+            pool = self._engine_pools.get(key)
+            if pool is None:
+                pool = EnginePool(
+                    partial(engine, device),
+                    weights_path,
+                    num_workers=self.config.workers,
+                    threads_per_worker=self.config.torch_threads or None,
+                    slot_bytes=self.config.pool_slot_mb * 1024 * 1024,
+                )
+                pool.start()
+                self._engine_pools[key] = pool
+            return pool
+
+    def _restart(self, worker_id: str, executor: Executor) -> None:
+        """Replace a crashed process; its replacement starts without models"""
+        with self._lock:
+            if self._processes.get(worker_id) is executor:
+                del self._processes[worker_id]
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.dispatcher.heartbeat(worker_id, loaded_models=[])
+        logger.warning(f"Inference process {worker_id} died; restarting it")
+        if self._preloads:
+            self._rewarm(worker_id)
+
+    def _rewarm(self, worker_id: str) -> None:
+        """Replay the preloads on a replacement process in the background"""
+        with self._lock:
+            self._cold.add(worker_id)
+            calls = list(self._preloads)
+        future = self._process(worker_id).submit(_run_all, calls)
+
+        def done(future) -> None:
+            with self._lock:
+                self._cold.discard(worker_id)
+            if future.exception() is not None:
+                logger.error(f"Re-warming inference process {worker_id} failed: {future.exception()}")
+                return
+            for call in calls:
+                model = _model_of(call.args)
+                if model is not None:
+                    self.dispatcher.mark_loaded(worker_id, model)
+            logger.info(f"Inference process {worker_id} re-warmed")
+
+        future.add_done_callback(done)
+
+    def cold_workers(self) -> List[str]:
+        """Worker processes still replaying preloads after a restart"""
+        with self._lock:
+            return sorted(self._cold)
+
+    def broadcast(self, fn: Callable[..., Any], *args: Any) -> List[Any]:
+        """
+        Preload: run a blocking callable once in every worker (blocking)
+
+        Thread workers share this process's registry, so the call runs once
+        here. In process mode it runs in every worker process, its model is
+        recorded as loaded there, and it is replayed on restarted processes.
+        In pool mode the engine pools for the call's model are started first
+        (loading it in every pool worker), then the call runs here for the
+        calls that stay on the thread pool.
+
+        Returns:
+            One result per worker
+
+        Raises:
+            The first worker's exception, if any failed
+        """
+        if self.config.mode == "pool" and args and hasattr(args[0], "device"):
+            key = args[0]
+            for call in set(_pooled_calls.values()):
+                self._engine_pool(call.engine, key.model_path, key.device)
+        if self.dispatcher is None:
+            return [fn(*args)]
+        submitted = []
+        for worker_id in list(self.dispatcher.workers):
+            executor = self._process(worker_id)
+            submitted.append((worker_id, executor, executor.submit(fn, *args)))
+        results = []
+        for worker_id, executor, future in submitted:
+            try:
+                results.append(future.result())
+            except BrokenProcessPool:
+                self._restart(worker_id, executor)
+                raise
+        model = _model_of(args)
+        with self._lock:
+            self._preloads.append(partial(fn, *args))
+        if model is not None:
+            for worker_id, _, _ in submitted:
+                self.dispatcher.mark_loaded(worker_id, model)
+        return results
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """
+        Reserve an in-flight slot for one request
+
+        Raises:
+            ExecutorSaturated: When running plus queued requests hit the limit
+        """
+        with self._lock:
+            if self._in_flight >= self.limit:
+                self.rejected += 1
+                raise ExecutorSaturated(self._in_flight, self.limit, self.config.retry_after)
+            self._in_flight += 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking callable on the pool and await its result
+
+        In process mode the worker is picked by the dispatcher; the model is
+        taken from the first argument's model_path, when it has one. In pool
+        mode a registered callable runs as one batch on its engine pool.
+        """
+        loop = asyncio.get_running_loop()
+        pooled = _pooled_calls.get(fn) if self.config.mode == "pool" else None
+        if pooled is not None:
+            weights_path, device, inputs, kwargs = pooled.split(*args)
+            pool = await loop.run_in_executor(self.pool, self._engine_pool, pooled.engine, weights_path, device)
+            return await asyncio.wrap_future(pool.submit(inputs, **kwargs))
+        if self.dispatcher is None:
+            return await loop.run_in_executor(self.pool, partial(fn, *args))
+
+        model = _model_of(args)
+        worker_id = self.dispatcher.select(INFERENCE_TASK, model)
+        warm = model is None or model in self.dispatcher.workers[worker_id].loaded_models
+        executor = self._process(worker_id)
+        start = time.time()
+        try:
+            result = await loop.run_in_executor(executor, partial(fn, *args))
+        except BrokenProcessPool:
+            self._restart(worker_id, executor)
+            self.dispatcher.complete(worker_id, time.time() - start)
+            raise
+        except BaseException:
+            self.dispatcher.complete(worker_id, time.time() - start)
+            raise
+        latency = time.time() - start
+        self.dispatcher.complete(worker_id, latency, model=model, cold_load_time=None if warm else latency)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.config.mode,
+            "workers": self.config.workers,
+            "max_queue": self.config.max_queue,
+            "in_flight": self._in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "dispatcher": self.dispatcher.metrics()["counters"] if self.dispatcher else None,
+            "engine_pools": {
+                f"{weights_path}@{device}": pool.stats()
+                for (_, weights_path, device), pool in list(self._engine_pools.items())
+            },
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        with self._lock:
+            processes, self._processes = list(self._processes.values()), {}
+        for executor in processes:
+            executor.shutdown(wait=False, cancel_futures=True)
+        with self._engine_pool_lock:
+            engine_pools, self._engine_pools = list(self._engine_pools.values()), {}
+        for pool in engine_pools:
+            pool.close()
+
+
+# Global instance
+_inference_executor: Optional[InferenceExecutor] = None
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Get the global inference executor instance"""
+    global _inference_executor
+    if _inference_executor is None:
+        _inference_executor = InferenceExecutor()
+    return _inference_executor
@@ -0,0 +1,236 @@
+"""
+Job Event Hub
+
+Fans job status events out to SSE and WebSocket clients:
+1. One task per backend process tails the Redis job events stream, however
+   many clients are connected
+2. Each subscription filters by job ids and/or user and has a bounded buffer;
+   a subscriber that falls behind is closed and resumes from its last event id
+3. New subscribers get the current state of their jobs first, or a replay from
+   Last-Event-ID, so nothing between polling and subscribing is lost
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import json
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import redis.asyncio as aioredis
+
+from orchestrator.workers.job_events import (
+    JOB_EVENTS_STREAM,
+    SOURCE_JOBS,
+    SOURCE_MEMORY,
+    SOURCE_YOLO_E,
+)
+from services.jobs import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+# Job hashes a snapshot is read from, by event source
+SNAPSHOT_KEYS = {
+    SOURCE_JOBS: "eye:job:{job_id}",
+    SOURCE_YOLO_E: "eye:yolo_e:job:{job_id}",
+    SOURCE_MEMORY: "eye:memory:job:{job_id}",
+}
+SNAPSHOT_FIELDS = ("status", "user_id", "progress", "step", "error", "attempt")
+
+
+@dataclass
+class JobEventsConfig:
+    """Job event fan-out configuration"""
+    read_block_ms: int = int(os.getenv("EYE_JOB_EVENTS_BLOCK_MS", "5000"))
+    read_count: int = int(os.getenv("EYE_JOB_EVENTS_READ_COUNT", "500"))
+    subscriber_buffer: int = int(os.getenv("EYE_JOB_EVENTS_BUFFER", "256"))
+    max_replay: int = int(os.getenv("EYE_JOB_EVENTS_MAX_REPLAY", "1000"))
+    heartbeat: float = float(os.getenv("EYE_JOB_EVENTS_HEARTBEAT", "15"))
+    max_job_ids: int = int(os.getenv("EYE_JOB_EVENTS_MAX_JOB_IDS", "100"))
+
+
+def _stream_id(event_id: str) -> Tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _decode(fields: Dict[Any, Any]) -> Dict[str, str]:
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in fields.items()
+    }
+
+
+class JobSubscription:
+    """Events for a set of job ids and/or one user"""
+
+    def __init__(self, job_ids: Iterable[str], user_id: Optional[str], buffer: int):
+        self.job_ids: Set[str] = set(job_ids)
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        self.overflowed = False
+        self.last_id: Optional[str] = None
+
+    def matches(self, event: Dict[str, str]) -> bool:
+        return event.get("job_id") in self.job_ids or (
+            self.user_id is not None and event.get("user_id") == self.user_id
+        )
+
+    def offer(self, event_id: str, event: Dict[str, str]) -> None:
+        try:
+            self.queue.put_nowait((event_id, event))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def next(self, timeout: float) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Next (event id, event), or None on timeout"""
+        while True:
+            try:
+                event_id, event = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            # Skip events already covered by the snapshot or replay
+            if self.last_id and _stream_id(event_id) <= _stream_id(self.last_id):
+                continue
+            self.last_id = event_id
+            return event_id, event
+
+
+class JobEventHub:
+    """Tails the job events stream and dispatches to subscribers"""
+
+    def __init__(self, config: Optional[JobEventsConfig] = None, url: str = REDIS_URL):
+        self.config = config or JobEventsConfig()
+        self.client = aioredis.Redis.from_url(url)
+        self._subscribers: Set[JobSubscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._stats = {"events_read": 0, "events_delivered": 0, "overflows": 0}
+
+    async def subscribe(self, job_ids: Iterable[str], user_id: Optional[str] = None) -> JobSubscription:
+        """
+        Register a subscription, starting the stream tail if none is running
+
+        The tail starts from the stream head read here, before any snapshot
+        or replay of this subscriber, so every event after those is tailed.
+        """
+        subscription = JobSubscription(job_ids, user_id, self.config.subscriber_buffer)
+        self._subscribers.add(subscription)
+        try:
+            async with self._start_lock:
+                if self._task is None or self._task.done():
+                    newest = await self.client.xrevrange(JOB_EVENTS_STREAM, count=1)
+                    # An empty stream is read from the start, not from "$" (which would
+                    # skip whatever is added before the first read)
+                    self._task = asyncio.create_task(self._tail(newest[0][0] if newest else "0-0"))
+        except Exception:
+            self._subscribers.discard(subscription)
+            raise
+        return subscription
+
+    def unsubscribe(self, subscription: JobSubscription) -> None:
+        self._subscribers.discard(subscription)
+
+    async def replay(self, subscription: JobSubscription, last_event_id: str) -> List[Tuple[str, Dict[str, str]]]:
+        """Matching events after last_event_id still held by the stream"""
+        _stream_id(last_event_id)  # ValueError on a malformed id
+        rows = await self.client.xrange(JOB_EVENTS_STREAM, min=f"({last_event_id}", max="+",
+                                        count=self.config.max_replay)
+        events = []
+        for event_id, fields in rows:
+            event_id = event_id.decode() if isinstance(event_id, bytes) else event_id
+            event = _decode(fields)
+            if subscription.matches(event):
+                events.append((event_id, event))
+            subscription.last_id = event_id
+        return events
+
+    async def snapshot(self, subscription: JobSubscription) -> List[Dict[str, str]]:
+        """
+        Current state of the subscribed job ids, read from the job hashes
+
+        The stream head is read in the same transaction, so live events that
+        the snapshot already reflects are skipped.
+        """
+        job_ids = sorted(subscription.job_ids)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.xrevrange(JOB_EVENTS_STREAM, count=1)
+        for job_id in job_ids:
+            for key in SNAPSHOT_KEYS.values():
+                pipe.hmget(key.format(job_id=job_id), *SNAPSHOT_FIELDS)
+        replies = iter(await pipe.execute())
+        head = next(replies)
+        if head:
+            head_id = head[0][0]
+            subscription.last_id = head_id.decode() if isinstance(head_id, bytes) else head_id
+
+        events = []
+        for job_id in job_ids:
+            for source in SNAPSHOT_KEYS:
+                values = next(replies)
+                if values[0] is None:
+                    continue
+                event = {"source": source, "job_id": job_id, "snapshot": "true"}
+                for name, value in zip(SNAPSHOT_FIELDS, values):
+                    if value is not None:
+                        event[name] = value.decode() if isinstance(value, bytes) else value
+                events.append(event)
+        return events
+
+    async def _tail(self, last_id: Any) -> None:
+        while self._subscribers:
+            try:
+                reply = await self.client.xread({JOB_EVENTS_STREAM: last_id}, count=self.config.read_count,
+                                                block=self.config.read_block_ms)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job events read failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            for _, rows in reply or []:
+                for event_id, fields in rows:
+                    last_id = event_id
+                    self._dispatch(event_id.decode() if isinstance(event_id, bytes) else event_id, _decode(fields))
+
+    def _dispatch(self, event_id: str, event: Dict[str, str]) -> None:
+        self._stats["events_read"] += 1
+        for subscription in list(self._subscribers):
+            if subscription.overflowed or not subscription.matches(event):
+                continue
+            subscription.offer(event_id, event)
+            if subscription.overflowed:
+                self._stats["overflows"] += 1
+            else:
+                self._stats["events_delivered"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "subscribers": len(self._subscribers)}
+
+    async def close(self) -> None:
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+        await self.client.close()
+
+
+def format_sse(event: Dict[str, str], event_id: Optional[str] = None) -> str:
+    """One server-sent event; the stream id becomes the SSE id"""
+    lines = [f"id: {event_id}"] if event_id else []
+    lines.append("event: job")
+    lines.append(f"data: {json.dumps(event)}")
+    return "\n".join(lines) + "\n\n"
+
+
+# Global instance
+_job_event_hub: Optional[JobEventHub] = None
+
+
+def get_job_event_hub() -> JobEventHub:
+    """Get global job event hub instance"""
+    global _job_event_hub
+    if _job_event_hub is None:
+        _job_event_hub = JobEventHub()
+    return _job_event_hub
@@ -0,0 +1,343 @@
+"""
+Job Metadata Retention
+
+Keeps the Redis job records (eye:job:{id} hashes and the eye:jobs:* indexes)
+from growing without bound:
+1. Finished jobs (SUCCEEDED/FAILED) older than the retention period expire
+2. Beyond max_jobs records, the oldest finished jobs are trimmed as well
+3. Expiring records are optionally archived first, as gzipped JSON lines,
+   to the object store or to Postgres; nothing is deleted if archival fails
+4. A background compactor does this in batches and counts what it reclaimed
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import gzip
+import json
+import time
+import uuid
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from orchestrator.workers.job_index import (
+    DELETE_JOB_SCRIPT,
+    JOB_HASH_PREFIX,
+    JOBS_BY_STATUS_ZSET,
+    JOBS_BY_TYPE_ZSET,
+    JOBS_RECENT_ZSET,
+)
+from services.jobs import REDIS_URL, STATUSES, STATUS_FAILED, STATUS_SUCCEEDED, JobsStore
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+LOCK_KEY = "eye:jobs:compactor:lock"
+
+# The lock holds a per-run token; only its holder may extend or release it.
+# KEYS: lock. ARGV: token, ttl seconds
+EXTEND_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('EXPIRE', KEYS[1], ARGV[2]) end
+return 0
+"""
+
+# KEYS: lock. ARGV: token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+ARCHIVE_NONE = "none"
+ARCHIVE_S3 = "s3"
+ARCHIVE_POSTGRES = "postgres"
+
+
+@dataclass
+class JobRetentionConfig:
+    """Job retention configuration"""
+    enabled: bool = os.getenv("EYE_JOB_RETENTION_ENABLED", "true").lower() == "true"
+    retention_seconds: float = float(os.getenv("EYE_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    max_jobs: int = int(os.getenv("EYE_JOB_RETENTION_MAX_JOBS", "100000"))  # 0 = no cap
+    batch_size: int = int(os.getenv("EYE_JOB_RETENTION_BATCH_SIZE", "500"))
+    max_batches: int = int(os.getenv("EYE_JOB_RETENTION_MAX_BATCHES", "20"))  # per run
+    interval: float = float(os.getenv("EYE_JOB_RETENTION_INTERVAL", "300"))
+    archive: str = os.getenv("EYE_JOB_ARCHIVE", ARCHIVE_NONE)  # none | s3 | postgres
+    archive_prefix: str = os.getenv("EYE_JOB_ARCHIVE_PREFIX", "archive/jobs")
+    database_url: str = os.getenv("EYE_JOB_ARCHIVE_DATABASE_URL", "postgresql://vision:vision@db:5432/vision")
+
+
+def _compress(records: List[Dict[str, str]]) -> bytes:
+    """Records -> gzipped JSON lines"""
+    lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+    return gzip.compress(lines.encode("utf-8"))
+
+
+def _created_range(records: List[Dict[str, str]]) -> List[int]:
+    created = [int(r["created_at"]) for r in records if r.get("created_at", "").isdigit()]
+    return [min(created), max(created)] if created else [0, 0]
+
+
+class S3JobArchive:
+    """One gzipped JSONL object per batch under prefix/YYYY/MM/DD/"""
+
+    def __init__(self, prefix: str):
+        from config import settings
+        from storage.adapters.s3 import S3Adapter
+
+        self.prefix = prefix.strip("/")
+        self.adapter = S3Adapter(
+            bucket=settings.s3_bucket,
+            endpoint_url=settings.s3_endpoint,
+            access_key=settings.s3_access_key,
+            secret_key=settings.s3_secret_key,
+            region=settings.s3_region,
+        )
+
+    def write(self, records: List[Dict[str, str]]) -> int:
+        data = _compress(records)
+        now = datetime.now(timezone.utc)
+        key = f"{self.prefix}/{now:%Y/%m/%d}/{now:%H%M%S}-{uuid.uuid4().hex}.jsonl.gz"
+        self.adapter.upload_bytes(data, key, content_type="application/gzip")
+        return len(data)
+
+
+class PostgresJobArchive:
+    """One row per batch holding the gzipped JSONL records"""
+
+    def __init__(self, database_url: str):
+        from sqlalchemy import Column, DateTime, Integer, LargeBinary, MetaData, String, Table, create_engine
+
+        self.engine = create_engine(database_url)
+        metadata = MetaData()
+        self.table = Table(
+            "job_archive_batches",
+            metadata,
+            Column("id", String, primary_key=True),
+            Column("archived_at", DateTime, nullable=False),
+            Column("job_count", Integer, nullable=False),
+            Column("first_created_at", Integer, nullable=False),
+            Column("last_created_at", Integer, nullable=False),
+            Column("data", LargeBinary, nullable=False),
+        )
+        metadata.create_all(self.engine)
+
+    def write(self, records: List[Dict[str, str]]) -> int:
+        data = _compress(records)
+        first, last = _created_range(records)
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert().values(
+                id=str(uuid.uuid4()),
+                archived_at=datetime.utcnow(),
+                job_count=len(records),
+                first_created_at=first,
+                last_created_at=last,
+                data=data,
+            ))
+        return len(data)
+
+
+class JobCompactor:
+    """Expires, trims and archives finished job records in Redis"""
+
+    def __init__(self, config: Optional[JobRetentionConfig] = None, url: str = REDIS_URL):
+        self.config = config or JobRetentionConfig()
+        self.client = redis.Redis.from_url(url)
+        self.store = JobsStore(url)
+        self._delete_job = self.client.register_script(DELETE_JOB_SCRIPT)
+        self._extend_lock = self.client.register_script(EXTEND_LOCK_SCRIPT)
+        self._release_lock = self.client.register_script(RELEASE_LOCK_SCRIPT)
+        self._archive = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats: Dict[str, Any] = {
+            "runs": 0,
+            "jobs_deleted": 0,
+            "orphans_removed": 0,
+            "bytes_reclaimed": 0,
+            "batches_archived": 0,
+            "bytes_archived": 0,
+            "errors": 0,
+            "last_run_at": None,
+            "last_run_seconds": None,
+            "last_error": None,
+        }
+
+    def _get_archive(self):
+        if self._archive is None:
+            if self.config.archive == ARCHIVE_S3:
+                self._archive = S3JobArchive(self.config.archive_prefix)
+            elif self.config.archive == ARCHIVE_POSTGRES:
+                self._archive = PostgresJobArchive(self.config.database_url)
+            elif self.config.archive != ARCHIVE_NONE:
+                raise ValueError(f"Unknown job archive target: {self.config.archive}")
+        return self._archive
+
+    def _candidates(self, now: float) -> List[str]:
+        """Oldest finished jobs that are expired or beyond max_jobs, up to one batch"""
+        limit = self.config.batch_size
+        cutoff = now - self.config.retention_seconds
+        overflow = 0
+        if self.config.max_jobs > 0:
+            overflow = min(int(self.client.zcard(JOBS_RECENT_ZSET)) - self.config.max_jobs, limit)
+
+        pipe = self.client.pipeline(transaction=False)
+        for status in TERMINAL_STATUSES:
+            key = JOBS_BY_STATUS_ZSET.format(status=status)
+            if overflow > 0:
+                pipe.zrange(key, 0, limit - 1, withscores=True)
+            else:
+                pipe.zrangebyscore(key, "-inf", cutoff, start=0, num=limit, withscores=True)
+        rows = sorted((score, job_id) for result in pipe.execute() for job_id, score in result)
+
+        # Everything past the cutoff, and the oldest overflow jobs even if newer
+        ids = [job_id for i, (score, job_id) in enumerate(rows) if score <= cutoff or i < overflow]
+        return [job_id.decode() if isinstance(job_id, bytes) else job_id for job_id in ids[:limit]]
+
+    def _compact_batch(self, job_ids: List[str]) -> int:
+        """
+        Archive and delete one batch of candidates
+
+        Hashes are read in one pipeline; a job whose status is no longer
+        finished is left alone, and the delete re-checks the status it was
+        archived with. Ids whose hash is already gone are dropped from the
+        recent and status indexes.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for job_id in job_ids:
+            key = JOB_HASH_PREFIX + job_id
+            pipe.hgetall(key)
+            pipe.memory_usage(key)
+        replies = pipe.execute(raise_on_error=False)
+
+        finished, orphans = [], []
+        for job_id, job, usage in zip(job_ids, replies[0::2], replies[1::2]):
+            if not isinstance(job, dict):
+                continue
+            if not job:
+                orphans.append(job_id)
+                continue
+            record = {k.decode(): v.decode() for k, v in job.items()}
+            if record.get("status") in TERMINAL_STATUSES:
+                finished.append((job_id, record, usage if isinstance(usage, int) else 0))
+
+        archive = self._get_archive()
+        records = [record for _, record, _ in finished]
+        archived = archive.write(records) if archive is not None and records else 0
+
+        pipe = self.client.pipeline(transaction=False)
+        for job_id, record, _ in finished:
+            keys = [JOB_HASH_PREFIX + job_id, JOBS_RECENT_ZSET, JOBS_BY_STATUS_ZSET.format(status=record["status"])]
+            if record.get("type"):
+                keys.append(JOBS_BY_TYPE_ZSET.format(job_type=record["type"]))
+            self._delete_job(keys=keys, args=[job_id, record["status"]], client=pipe)
+        for job_id in orphans:
+            pipe.zrem(JOBS_RECENT_ZSET, job_id)
+            for status in STATUSES:
+                pipe.zrem(JOBS_BY_STATUS_ZSET.format(status=status), job_id)
+        results = pipe.execute()[:len(finished)]
+        deleted = sum(results)
+        reclaimed = sum(usage for (_, _, usage), result in zip(finished, results) if result)
+
+        with self._lock:
+            self._stats["jobs_deleted"] += deleted
+            self._stats["orphans_removed"] += len(orphans)
+            self._stats["bytes_reclaimed"] += reclaimed
+            if archived:
+                self._stats["batches_archived"] += 1
+                self._stats["bytes_archived"] += archived
+        return deleted + len(orphans)
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        One compaction pass of up to max_batches batches
+
+        Only one backend replica compacts at a time (Redis lock), so a batch
+        is never archived twice. The lock is extended before every batch;
+        if it expired and another replica took it, the pass stops. Jobs
+        created before the status indexes existed are indexed first (once),
+        so they expire and count toward max_jobs like the others.
+        """
+        start = time.time()
+        token = uuid.uuid4().hex
+        ttl = max(int(self.config.interval), 60)
+        if not self.client.set(LOCK_KEY, token, nx=True, ex=ttl):
+            return self.stats()
+        removed = 0
+        try:
+            self.store.ensure_indexed()
+            for _ in range(self.config.max_batches):
+                if not self._extend_lock(keys=[LOCK_KEY], args=[token, ttl]):
+                    logger.warning("Job compactor lost its lock; stopping this pass")
+                    break
+                job_ids = self._candidates(time.time())
+                if not job_ids:
+                    break
+                removed_now = self._compact_batch(job_ids)
+                removed += removed_now
+                if removed_now == 0:
+                    break
+            error = None
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Job compaction failed: {e}")
+        finally:
+            try:
+                self._release_lock(keys=[LOCK_KEY], args=[token])
+            except Exception as e:
+                # The lock expires on its own
+                logger.warning(f"Could not release job compactor lock: {e}")
+
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["last_run_at"] = start
+            self._stats["last_run_seconds"] = round(time.time() - start, 3)
+            self._stats["last_error"] = error
+            if error:
+                self._stats["errors"] += 1
+        if removed:
+            logger.info(f"Job compaction removed {removed} records in {time.time() - start:.2f}s")
+        return self.stats()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.config.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Job compactor error: {e}")
+
+    def start(self) -> None:
+        """Run the compactor every interval seconds in a daemon thread"""
+        if not self.config.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="eye-job-compactor", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Job compactor started (retention={self.config.retention_seconds:.0f}s, "
+            f"max_jobs={self.config.max_jobs}, archive={self.config.archive})"
+        )
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+# Global instance
+_job_compactor: Optional[JobCompactor] = None
+
+
+def get_job_compactor() -> JobCompactor:
+    """Get global job compactor instance"""
+    global _job_compactor
+    if _job_compactor is None:
+        _job_compactor = JobCompactor()
+    return _job_compactor
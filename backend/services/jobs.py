@@ -1,46 +1,108 @@
 import os
+import json
 import time
 import uuid
+import logging
 from typing import Optional, List, Dict, Tuple
 import redis
 
+from orchestrator.workers.job_events import SOURCE_JOBS, job_owner, publish_event
+from orchestrator.workers.job_index import (
+    INDEX_STATUS_SCRIPT,
+    JOB_HASH_KEY,
+    JOB_STATUSES,
+    JOBS_BY_STATUS_PREFIX,
+    JOBS_BY_STATUS_ZSET,
+    JOBS_BY_TYPE_ZSET,
+    JOBS_INDEXED_KEY,
+    JOBS_RECENT_ZSET,
+    SET_STATUS_SCRIPT,
+    index_key,
+    set_status_keys,
+)
+
+logger = logging.getLogger(__name__)
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
-JOB_HASH_KEY = "eye:job:{job_id}"
-JOBS_RECENT_ZSET = "eye:jobs:recent"
 QUEUE_KEY = os.getenv("EYE_QUEUE_KEY", "eye:jobs")
+# Upper bound on index entries one page request examines past its offset
+MAX_PAGE_SCAN = int(os.getenv("EYE_JOBS_MAX_PAGE_SCAN", "5000"))
+# Jobs per MULTI/EXEC block in bulk creation
+CREATE_CHUNK = int(os.getenv("EYE_JOBS_CREATE_CHUNK", "1000"))
 
 STATUS_QUEUED = "QUEUED"
 STATUS_RUNNING = "RUNNING"
 STATUS_SUCCEEDED = "SUCCEEDED"
 STATUS_FAILED = "FAILED"
+STATUSES = JOB_STATUSES
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
 
 
 class JobsStore:
     def __init__(self, url: str = REDIS_URL):
         self.client = redis.Redis.from_url(url)
+        self._set_status = self.client.register_script(SET_STATUS_SCRIPT)
+        self._index_status = self.client.register_script(INDEX_STATUS_SCRIPT)
 
     def create_job(self, job_type: str, payload: dict) -> str:
-        job_id = str(uuid.uuid4())
-        now = int(time.time())
-        key = JOB_HASH_KEY.format(job_id=job_id)
-        self.client.hset(
-            key,
-            mapping={
-                "id": job_id,
-                "type": job_type,
-                "status": STATUS_QUEUED,
-                "created_at": str(now),
-            },
-        )
-        # keep recent list
-        self.client.zadd(JOBS_RECENT_ZSET, {job_id: now})
-        # enqueue lightweight envelope
-        self.client.lpush(QUEUE_KEY, __import__("json").dumps({"id": job_id, "type": job_type, "payload": payload}))
-        return job_id
-
-    def set_status(self, job_id: str, status: str) -> None:
+        return self.create_jobs([(job_type, payload)])[0]
+
+    def create_jobs(self, jobs: List[Tuple[str, dict]]) -> List[str]:
+        """
+        Create and enqueue jobs atomically
+
+        Each chunk of CREATE_CHUNK jobs is one MULTI/EXEC round-trip: job
+        hashes, index entries, queue envelopes and QUEUED events are written
+        together or not at all.
+
+        Returns:
+            Job ids, in input order
+        """
+        job_ids: List[str] = []
+        for start in range(0, len(jobs), CREATE_CHUNK):
+            chunk = jobs[start:start + CREATE_CHUNK]
+            now = int(time.time())
+            ids = [str(uuid.uuid4()) for _ in chunk]
+            by_type: Dict[str, Dict[str, int]] = {}
+            envelopes = []
+            pipe = self.client.pipeline(transaction=True)
+            for job_id, (job_type, payload) in zip(ids, chunk):
+                mapping = {
+                    "id": job_id,
+                    "type": job_type,
+                    "status": STATUS_QUEUED,
+                    "created_at": str(now),
+                }
+                owner = job_owner({"payload": payload})
+                if owner:
+                    mapping["user_id"] = owner
+                pipe.hset(JOB_HASH_KEY.format(job_id=job_id), mapping=mapping)
+                publish_event(pipe, SOURCE_JOBS, job_id, STATUS_QUEUED, owner, type=job_type)
+                by_type.setdefault(job_type, {})[job_id] = now
+                # lightweight envelope
+                envelopes.append(json.dumps({"id": job_id, "type": job_type, "payload": payload}))
+            # keep recent list and the type/status indexes
+            scores = {job_id: now for job_id in ids}
+            pipe.zadd(JOBS_RECENT_ZSET, scores)
+            pipe.zadd(JOBS_BY_STATUS_ZSET.format(status=STATUS_QUEUED), scores)
+            for job_type, members in by_type.items():
+                pipe.zadd(JOBS_BY_TYPE_ZSET.format(job_type=job_type), members)
+            pipe.lpush(QUEUE_KEY, *envelopes)
+            pipe.execute()
+            job_ids.extend(ids)
+        return job_ids
+
+    def set_status(self, job_id: str, status: str, owner: Optional[str] = None) -> bool:
+        """Update a job's status; False if the job does not exist"""
         key = JOB_HASH_KEY.format(job_id=job_id)
-        self.client.hset(key, mapping={"status": status})
+        pipe = self.client.pipeline(transaction=True)
+        self._set_status(keys=set_status_keys(key), args=[job_id, status, JOBS_BY_STATUS_PREFIX], client=pipe)
+        publish_event(pipe, SOURCE_JOBS, job_id, status, owner)
+        updated, _ = pipe.execute()
+        return bool(updated)
 
     def get_job(self, job_id: str) -> Optional[Dict[str, str]]:
         key = JOB_HASH_KEY.format(job_id=job_id)
@@ -50,14 +112,126 @@ class JobsStore:
         return {k.decode(): v.decode() for k, v in data.items()}
 
     def list_recent(self, limit: int = 20, offset: int = 0) -> List[Dict[str, str]]:
-        ids = self.client.zrevrange(JOBS_RECENT_ZSET, offset, offset + limit - 1)
-        jobs: List[Dict[str, str]] = []
-        for raw_id in ids:
-            job_id = raw_id.decode()
-            job = self.get_job(job_id)
-            if job:
-                jobs.append(job)
+        jobs, _ = self.list_page(limit=limit, offset=offset)
         return jobs
 
+    def list_page(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        job_type: Optional[str] = None,
+        status: Optional[str] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """
+        One page of jobs, newest first
+
+        Entries come from the smallest index covering the filters; with both
+        filters the type is checked against the type index, so only the
+        returned jobs' hashes are read (one pipeline per chunk). Unfiltered
+        pages skip the offset in Redis; filtered ones do not count skipped
+        entries toward MAX_PAGE_SCAN.
+
+        Args:
+            cursor: next_cursor from the previous page
+            job_type, status: optional filters, served from the secondary indexes
+
+        Returns:
+            Jobs and the cursor for the next page (None at the end)
+        """
+        max_score, last_id = "+inf", ""
+        if cursor:
+            score, sep, last_id = cursor.partition(":")
+            if not sep or not last_id:
+                raise ValueError("Invalid cursor")
+            max_score = str(float(score))
+        index = index_key(job_type, status)
+        type_index = JOBS_BY_TYPE_ZSET.format(job_type=job_type) if job_type and status else None
+
+        skip, start = offset, 0
+        if type_index is None and not last_id:
+            skip, start = 0, offset
+        chunk = max(limit * 2, 50)
+        jobs: List[Dict[str, str]] = []
+        scanned, position = 0, None
+        while len(jobs) < limit and scanned < MAX_PAGE_SCAN:
+            rows = self.client.zrevrangebyscore(index, max_score, "-inf", start=start, num=chunk, withscores=True)
+            if not rows:
+                return jobs, None
+            members = [_text(member) for member, _ in rows]
+            matches = self.client.zmscore(type_index, members) if type_index else [0] * len(members)
+            page_ids = []
+            for member, (_, score), match in zip(members, rows, matches):
+                start += 1
+                # Equal scores come back in reverse member order; skip those already returned
+                if last_id and score == float(max_score) and member >= last_id:
+                    continue
+                if skip > 0:
+                    skip -= match is not None
+                    continue
+                scanned += 1
+                position = f"{score}:{member}"
+                if match is not None:
+                    page_ids.append(member)
+                if len(jobs) + len(page_ids) >= limit or scanned >= MAX_PAGE_SCAN:
+                    break
+            jobs.extend(self._get_jobs(page_ids))
+        return jobs, position
+
+    def _get_jobs(self, job_ids: List[str]) -> List[Dict[str, str]]:
+        """Job hashes in one pipeline, dropping ids whose hash is gone"""
+        if not job_ids:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(JOB_HASH_KEY.format(job_id=job_id))
+        return [{_text(k): _text(v) for k, v in data.items()} for data in pipe.execute() if data]
+
+    def reindex(self, batch: int = 500) -> int:
+        """Build the type/status indexes for jobs created before they existed"""
+        indexed = 0
+        start = 0
+        while True:
+            rows = self.client.zrange(JOBS_RECENT_ZSET, start, start + batch - 1, withscores=True)
+            if not rows:
+                return indexed
+            pipe = self.client.pipeline(transaction=False)
+            rows = [(_text(job_id), score) for job_id, score in rows]
+            for job_id, _ in rows:
+                pipe.hget(JOB_HASH_KEY.format(job_id=job_id), "type")
+            types = pipe.execute()
+            typed = [(job_id, score, _text(job_type)) for (job_id, score), job_type in zip(rows, types) if job_type]
+            pipe = self.client.pipeline(transaction=False)
+            for job_id, score, job_type in typed:
+                pipe.zadd(JOBS_BY_TYPE_ZSET.format(job_type=job_type), {job_id: score})
+            # The status is read in the script, so a concurrent change is not undone
+            for job_id, score in rows:
+                self._index_status(
+                    keys=set_status_keys(JOB_HASH_KEY.format(job_id=job_id)),
+                    args=[job_id, JOBS_BY_STATUS_PREFIX, score],
+                    client=pipe,
+                )
+            indexed += sum(pipe.execute()[len(typed):])
+            start += batch
+
+    def ensure_indexed(self) -> int:
+        """
+        Run reindex once: JOBS_INDEXED_KEY records that it has finished
+
+        Returns:
+            Jobs indexed by this call (0 if already done or on failure)
+        """
+        try:
+            if self.client.exists(JOBS_INDEXED_KEY):
+                return 0
+            indexed = self.reindex()
+            self.client.set(JOBS_INDEXED_KEY, int(time.time()))
+        except redis.RedisError as e:
+            logger.warning(f"Indexing existing jobs failed: {e}")
+            return 0
+        if indexed:
+            logger.info(f"Indexed {indexed} existing jobs by type and status")
+        return indexed
+
     def queue_length(self) -> int:
         return int(self.client.llen(QUEUE_KEY))
@@ -7,31 +7,68 @@ This service handles the complete pipeline for processing uploaded images:
 3. Embedding generation
 4. FAISS indexing
 
+Jobs go through a durable Redis queue (see orchestrator/workers/reliable_queue)
+and their state lives in Redis hashes with a TTL, so queued work survives
+restarts and any number of backend replicas or dedicated workers
+(python -m services.memory_processing_service) can consume it, each running
+a configurable number of concurrent consumers.
+
 Author: Anurag Atulya — EYE for Humanity
 """
 
+import os
 import asyncio
 import base64
 import httpx
 import json
+import signal
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from datetime import datetime
 import uuid
 
+import redis
+import redis.asyncio as aioredis
+
+from orchestrator.workers.job_events import SOURCE_MEMORY, publish_event
+from orchestrator.workers.reliable_queue import Delivery, ReliableQueue
+from services.jobs import REDIS_URL
+
 logger = logging.getLogger(__name__)
 
+MEMORY_JOB_KEY = "eye:memory:job:{job_id}"
+# Job fields kept in the Redis hash; pipeline outputs go to the memory record
+STATE_FIELDS = ("job_id", "memory_id", "image_uuid", "user_id", "status", "step", "attempt",
+                "created_at", "started_at", "completed_at", "error")
+
+
+@dataclass
+class MemoryProcessingConfig:
+    """Memory processing queue configuration"""
+    redis_url: str = REDIS_URL
+    queue_key: str = os.getenv("EYE_MEMORY_QUEUE_KEY", "eye:memory:jobs")
+    concurrency: int = int(os.getenv("EYE_MEMORY_WORKER_CONCURRENCY", "2"))
+    # Set to false on the backend when a separate worker deployment consumes
+    run_consumers: bool = os.getenv("EYE_MEMORY_CONSUMERS_ENABLED", "true").lower() == "true"
+    job_ttl: int = int(os.getenv("EYE_MEMORY_JOB_TTL", str(7 * 24 * 3600)))
+    poll_timeout: float = float(os.getenv("EYE_MEMORY_POLL_TIMEOUT", "5"))
+    drain_timeout: float = float(os.getenv("EYE_MEMORY_DRAIN_TIMEOUT", "30"))
+
+
 @dataclass
 class ProcessingJob:
     """Memory processing job"""
     job_id: str
     memory_id: str
     image_uuid: str
-    image_data: bytes
     user_tags: List[str]
     user_notes: Optional[str]
+    user_id: Optional[str] = None
     status: str = "queued"
+    step: Optional[str] = None
+    attempt: int = 0
     created_at: datetime = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
@@ -40,173 +77,293 @@ class ProcessingJob:
     llm_description: Optional[str] = None
     embedding: Optional[List[float]] = None
 
+    def state(self) -> Dict[str, str]:
+        """Hash fields for the job state (unset fields are left out)"""
+        fields = {}
+        for name in STATE_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                fields[name] = value.isoformat() if isinstance(value, datetime) else str(value)
+        return fields
+
+    @classmethod
+    def from_state(cls, fields: Dict[str, str]) -> "ProcessingJob":
+        def when(name):
+            return datetime.fromisoformat(fields[name]) if fields.get(name) else None
+
+        return cls(
+            job_id=fields["job_id"],
+            memory_id=fields.get("memory_id", ""),
+            image_uuid=fields.get("image_uuid", ""),
+            user_tags=[],
+            user_notes=None,
+            user_id=fields.get("user_id"),
+            status=fields.get("status", "queued"),
+            step=fields.get("step"),
+            attempt=int(fields.get("attempt") or 0),
+            created_at=when("created_at"),
+            started_at=when("started_at"),
+            completed_at=when("completed_at"),
+            error=fields.get("error"),
+        )
+
+
 class MemoryProcessingService:
     """Service for processing memory images through the complete pipeline"""
     
-    def __init__(self):
-        self.processing_queue: asyncio.Queue = asyncio.Queue()
-        self.active_jobs: Dict[str, ProcessingJob] = {}
-        self.completed_jobs: Dict[str, ProcessingJob] = {}
+    def __init__(self, config: Optional[MemoryProcessingConfig] = None):
+        self.config = config or MemoryProcessingConfig()
+        self.redis = aioredis.Redis.from_url(self.config.redis_url)
+        # The reliable queue is synchronous; its calls run on a small thread pool
+        self.queue = ReliableQueue(redis.Redis.from_url(self.config.redis_url), self.config.queue_key)
+        self._queue_executor: Optional[ThreadPoolExecutor] = None
+        self._consumers: List[asyncio.Task] = []
         self.http_client: Optional[httpx.AsyncClient] = None
         self.is_running = False
         
-    async def initialize(self):
-        """Initialize the processing service"""
-        self.http_client = httpx.AsyncClient(timeout=30.0)
-        self.is_running = True
+    async def initialize(self, run_consumers: Optional[bool] = None):
+        """Initialize the processing service and start consumers (idempotent)"""
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(timeout=30.0)
+        if run_consumers is None:
+            run_consumers = self.config.run_consumers
+        if not run_consumers or self.is_running:
+            return
         
-        # Start the processing worker
-        asyncio.create_task(self._process_queue())
+        self.is_running = True
+        # Consumers block in BLMOVE; the extra threads keep acks from queueing behind them
+        self._queue_executor = ThreadPoolExecutor(max_workers=2 * self.config.concurrency,
+                                                  thread_name_prefix="eye-memory-queue")
+        try:
+            recovered = await self._queue_call(self.queue.recover)
+            if recovered:
+                logger.info(f"Requeued {recovered} memory jobs left in flight by a previous run")
+        except Exception as e:
+            logger.error(f"Could not recover in-flight memory jobs: {e}")
+        self.queue.start_heartbeat()
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.config.concurrency)]
+        logger.info(f"Memory processing consumers started as {self.queue.consumer_id} "
+                    f"(concurrency={self.config.concurrency})")
         
     async def close(self):
-        """Close the processing service"""
+        """Stop consuming, wait for running jobs, then close clients"""
         self.is_running = False
+        if self._consumers:
+            _, pending = await asyncio.wait(self._consumers, timeout=self.config.drain_timeout)
+            for task in pending:
+                # Its job stays on the processing list and is reclaimed later
+                task.cancel()
+            self._consumers = []
+            self.queue.stop_heartbeat()
+        if self._queue_executor:
+            self._queue_executor.shutdown(wait=False)
+            self._queue_executor = None
         if self.http_client:
             await self.http_client.aclose()
+            self.http_client = None
+        await self.redis.close()
+    
+    async def _queue_call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._queue_executor, fn, *args)
+    
+    async def _save(self, job: ProcessingJob, pipe=None):
+        """Write the job state (with TTL) and publish the transition"""
+        target = pipe if pipe is not None else self.redis.pipeline(transaction=True)
+        key = MEMORY_JOB_KEY.format(job_id=job.job_id)
+        target.hset(key, mapping=job.state())
+        cleared = [name for name in STATE_FIELDS if getattr(job, name) is None]
+        if cleared:
+            target.hdel(key, *cleared)
+        target.expire(key, self.config.job_ttl)
+        publish_event(target, SOURCE_MEMORY, job.job_id, job.status, job.user_id,
+                      memory_id=job.memory_id, step=job.step, error=job.error)
+        if pipe is None:
+            await target.execute()
     
     async def queue_memory_processing(
         self,
         memory_id: str,
         image_uuid: str,
-        image_data: bytes,
         user_tags: List[str],
-        user_notes: Optional[str] = None
+        user_notes: Optional[str] = None,
+        user_id: Optional[str] = None
     ) -> str:
-        """Queue a memory for processing"""
+        """Queue a memory for processing; state and queue entry are written atomically"""
         job_id = str(uuid.uuid4())
         
         job = ProcessingJob(
             job_id=job_id,
             memory_id=memory_id,
             image_uuid=image_uuid,
-            image_data=image_data,
             user_tags=user_tags,
             user_notes=user_notes,
+            user_id=user_id,
             created_at=datetime.utcnow()
         )
         
-        self.active_jobs[job_id] = job
-        await self.processing_queue.put(job)
+        pipe = self.redis.pipeline(transaction=True)
+        await self._save(job, pipe)
+        pipe.lpush(self.config.queue_key, json.dumps({
+            "id": job_id,
+            "memory_id": memory_id,
+            "image_uuid": image_uuid,
+            "user_tags": user_tags,
+            "user_notes": user_notes,
+            "user_id": user_id,
+            "created_at": job.created_at.isoformat(),
+        }))
+        await pipe.execute()
         
         logger.info(f"Queued memory processing job {job_id} for memory {memory_id}")
         return job_id
     
     async def get_job_status(self, job_id: str) -> Optional[ProcessingJob]:
         """Get the status of a processing job"""
-        if job_id in self.active_jobs:
-            return self.active_jobs[job_id]
-        elif job_id in self.completed_jobs:
-            return self.completed_jobs[job_id]
-        return None
+        data = await self.redis.hgetall(MEMORY_JOB_KEY.format(job_id=job_id))
+        if not data:
+            return None
+        return ProcessingJob.from_state({k.decode(): v.decode() for k, v in data.items()})
     
-    async def _process_queue(self):
-        """Background worker to process the queue"""
+    async def _consume(self):
+        """One consumer: receive, process, ack or nack"""
         while self.is_running:
             try:
-                # Wait for a job with timeout
-                job = await asyncio.wait_for(self.processing_queue.get(), timeout=1.0)
-                
-                # Process the job
-                await self._process_job(job)
-                
-            except asyncio.TimeoutError:
-                # No jobs in queue, continue
-                continue
+                delivery = await self._queue_call(self.queue.receive, self.config.poll_timeout)
             except Exception as e:
-                logger.error(f"Error in processing queue: {e}")
+                logger.error(f"Memory queue receive failed: {e}")
                 await asyncio.sleep(1)
+                continue
+            if delivery is None:
+                continue
+            if not self.is_running:
+                await self._settle(self.queue.release, [delivery])
+                break
+            await self._handle(delivery)
     
-    async def _process_job(self, job: ProcessingJob):
-        """Process a single memory job through the complete pipeline"""
+    async def _settle(self, fn, *args):
+        """ack/nack/release; if Redis fails the message stays on the processing list and is reclaimed"""
         try:
-            logger.info(f"Starting processing job {job.job_id}")
-            job.status = "processing"
-            job.started_at = datetime.utcnow()
-            
-            # Step 1: YOLO-E Object Detection
-            logger.info(f"Running YOLO-E detection for job {job.job_id}")
-            yolo_results = await self._run_yolo_detection(job.image_data)
-            job.yolo_results = yolo_results
-            
-            # Step 2: LLM Processing with System Prompt
-            logger.info(f"Running LLM processing for job {job.job_id}")
-            llm_description = await self._run_llm_processing(job.image_data, yolo_results)
-            job.llm_description = llm_description
-            
-            # Step 3: Generate Embedding
-            logger.info(f"Generating embedding for job {job.job_id}")
-            embedding = await self._generate_embedding(llm_description)
-            job.embedding = embedding
-            
-            # Step 4: Update Database
-            logger.info(f"Updating database for job {job.job_id}")
-            await self._update_memory_record(job)
-            
-            # Mark as completed
-            job.status = "completed"
-            job.completed_at = datetime.utcnow()
-            
-            # Move to completed jobs
-            self.completed_jobs[job.job_id] = job
-            del self.active_jobs[job.job_id]
-            
-            logger.info(f"Completed processing job {job.job_id}")
-            
+            await self._queue_call(fn, *args)
+        except Exception as e:
+            logger.error(f"Memory queue {fn.__name__} failed: {e}")
+    
+    async def _handle(self, delivery: Delivery):
+        payload = delivery.job
+        created_at = payload.get("created_at")
+        job = ProcessingJob(
+            job_id=payload["id"],
+            memory_id=payload["memory_id"],
+            image_uuid=payload["image_uuid"],
+            user_tags=payload.get("user_tags") or [],
+            user_notes=payload.get("user_notes"),
+            user_id=payload.get("user_id"),
+            attempt=delivery.attempt,
+            created_at=datetime.fromisoformat(created_at) if created_at else datetime.utcnow()
+        )
+        try:
+            await self._process_job(job)
         except Exception as e:
-            logger.error(f"Error processing job {job.job_id}: {e}")
-            job.status = "failed"
+            logger.error(f"Error processing job {job.job_id} (attempt {job.attempt}): {e}")
+            retry = self.queue.will_retry(delivery)
+            job.status = "queued" if retry else "failed"
             job.error = str(e)
-            job.completed_at = datetime.utcnow()
-            
-            # Move to completed jobs (failed)
-            self.completed_jobs[job.job_id] = job
-            del self.active_jobs[job.job_id]
+            job.completed_at = None if retry else datetime.utcnow()
+            try:
+                await self._save(job)
+            except Exception as save_error:
+                logger.error(f"Could not record failure of job {job.job_id}: {save_error}")
+            await self._settle(self.queue.nack, delivery, str(e))
+            return
+        await self._settle(self.queue.ack, delivery)
+    
+    async def _load_image(self, job: ProcessingJob) -> bytes:
+        """Fetch the uploaded image through the memory API"""
+        response = await self.http_client.get(f"http://backend:8001/api/v1/memory/image/{job.image_uuid}")
+        response.raise_for_status()
+        return response.content
+    
+    async def _process_job(self, job: ProcessingJob):
+        """Process a single memory job through the complete pipeline; raises on failure"""
+        logger.info(f"Starting processing job {job.job_id}")
+        job.status = "processing"
+        job.started_at = datetime.utcnow()
+        job.step = "detection"
+        await self._save(job)
+        
+        image_data = await self._load_image(job)
+        
+        # Step 1: YOLO-E Object Detection
+        logger.info(f"Running YOLO-E detection for job {job.job_id}")
+        yolo_results = await self._run_yolo_detection(image_data)
+        job.yolo_results = yolo_results
+        job.step = "description"
+        await self._save(job)
+        
+        # Step 2: LLM Processing with System Prompt
+        logger.info(f"Running LLM processing for job {job.job_id}")
+        llm_description = await self._run_llm_processing(image_data, yolo_results)
+        job.llm_description = llm_description
+        job.step = "embedding"
+        await self._save(job)
+        
+        # Step 3: Generate Embedding
+        logger.info(f"Generating embedding for job {job.job_id}")
+        embedding = await self._generate_embedding(llm_description)
+        job.embedding = embedding
+        
+        # Step 4: Update Database
+        logger.info(f"Updating database for job {job.job_id}")
+        await self._update_memory_record(job)
+        
+        # Mark as completed
+        job.status = "completed"
+        job.step = None
+        job.error = None
+        job.completed_at = datetime.utcnow()
+        await self._save(job)
+        
+        logger.info(f"Completed processing job {job.job_id}")
     
     async def _run_yolo_detection(self, image_data: bytes) -> Dict[str, Any]:
-        """Run YOLO-E object detection on the image"""
-        try:
-            # Create a temporary file-like object for the image data
-            import io
-            
-            # Call YOLO-E inference endpoint with file upload
-            files = {"file": ("image.jpg", io.BytesIO(image_data), "image/jpeg")}
-            data = {
-                "model_path": "yoloe-11s-seg-pf.pt",
-                "confidence_threshold": 0.5,
-                "iou_threshold": 0.45,
-                "use_gpu": "true"
-            }
-            
+        """Run YOLO-E object detection on the image; raises so the job is retried"""
+        # Create a temporary file-like object for the image data
+        import io
+        
+        # Call YOLO-E inference endpoint with file upload
+        data = {
+            "model_path": "yoloe-11s-seg-pf.pt",
+            "confidence_threshold": 0.5,
+            "iou_threshold": 0.45,
+            "use_gpu": "true"
+        }
+        
+        # Back off and retry while the inference queue is saturated
+        for attempt in range(3):
             response = await self.http_client.post(
                 "http://backend:8001/api/v1/yolo-e/infer/single",
-                files=files,
+                files={"file": ("image.jpg", io.BytesIO(image_data), "image/jpeg")},
                 data=data
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "detections": result.get("detections", []),
-                    "objects": result.get("objects", []),
-                    "confidence_scores": result.get("confidence_scores", []),
-                    "model_used": result.get("model", "yoloe-11s-seg-pf.pt")
-                }
-            else:
-                logger.warning(f"YOLO-E detection failed: {response.status_code}")
-                return {"detections": [], "objects": [], "confidence_scores": [], "model_used": "none"}
-                
-        except Exception as e:
-            logger.error(f"YOLO-E detection error: {e}")
-            return {"detections": [], "objects": [], "confidence_scores": [], "model_used": "none", "error": str(e)}
+            if response.status_code != 503:
+                break
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+        
+        response.raise_for_status()
+        result = response.json()
+        return {
+            "detections": result.get("detections", []),
+            "objects": result.get("objects", []),
+            "confidence_scores": result.get("confidence_scores", []),
+            "model_used": result.get("model", "yoloe-11s-seg-pf.pt")
+        }
     
     async def _run_llm_processing(self, image_data: bytes, yolo_results: Dict[str, Any]) -> str:
-        """Run LLM processing with system prompt and YOLO results"""
-        try:
-            # Convert image to base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # Create comprehensive system prompt
-            system_prompt = """You are EYE AI, an advanced memory analysis system. Your task is to analyze images and provide comprehensive descriptions that will help users find and understand their memories.
+        """Run LLM processing with system prompt and YOLO results; raises so the job is retried"""
+        # Convert image to base64
+        image_base64 = base64.b64encode(image_data).decode('utf-8')
+        
+        # Create comprehensive system prompt
+        system_prompt = """You are EYE AI, an advanced memory analysis system. Your task is to analyze images and provide comprehensive descriptions that will help users find and understand their memories.
 
 For each image, provide:
 1. A detailed visual description of what you see
@@ -217,50 +374,43 @@ For each image, provide:
 
 Be specific, descriptive, and helpful for memory search and retrieval. Focus on details that would help someone remember this moment."""
 
-            # Create user prompt with YOLO results
-            detected_objects = yolo_results.get("objects", [])
-            yolo_context = ""
-            if detected_objects:
-                yolo_context = f"\n\nYOLO-E detected objects: {', '.join(detected_objects)}"
-            
-            user_prompt = f"What do you see in this image? Please provide a comprehensive description that captures the visual content, objects, people, setting, mood, and any notable details.{yolo_context}"
-            
-            # Call Ollama vision chat using the correct API format
-            messages = [
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user", 
-                    "content": user_prompt,
-                    "images": [image_base64]
-                }
-            ]
-            
-            response = await self.http_client.post(
-                "http://ollama:11434/api/chat",
-                json={
-                    "model": "llava:7b",
-                    "messages": messages,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "top_p": 0.9
-                    }
+        # Create user prompt with YOLO results
+        detected_objects = yolo_results.get("objects", [])
+        yolo_context = ""
+        if detected_objects:
+            yolo_context = f"\n\nYOLO-E detected objects: {', '.join(detected_objects)}"
+        
+        user_prompt = f"What do you see in this image? Please provide a comprehensive description that captures the visual content, objects, people, setting, mood, and any notable details.{yolo_context}"
+        
+        # Call Ollama vision chat using the correct API format
+        messages = [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user", 
+                "content": user_prompt,
+                "images": [image_base64]
+            }
+        ]
+        
+        response = await self.http_client.post(
+            "http://ollama:11434/api/chat",
+            json={
+                "model": "llava:7b",
+                "messages": messages,
+                "stream": False,
+                "options": {
+                    "temperature": 0.3,
+                    "top_p": 0.9
                 }
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("message", {}).get("content", "No description available")
-            else:
-                logger.warning(f"LLM processing failed: {response.status_code}")
-                return "Failed to generate description"
-                
-        except Exception as e:
-            logger.error(f"LLM processing error: {e}")
-            return f"Error generating description: {str(e)}"
+            }
+        )
+        
+        response.raise_for_status()
+        result = response.json()
+        return result.get("message", {}).get("content", "No description available")
     
     async def _generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for the processed text"""
@@ -287,35 +437,30 @@ Be specific, descriptive, and helpful for memory search and retrieval. Focus on
             return [0.0] * 384
     
     async def _update_memory_record(self, job: ProcessingJob):
-        """Update the memory record in the database with processing results"""
-        try:
-            # This would update the database record with:
-            # - AI description (from LLM)
-            # - Detected objects (from YOLO-E)
-            # - Embedding vector
-            # - Processing status
-            
-            # For now, we'll use a simple HTTP call to update the record
-            update_data = {
-                "ai_description": job.llm_description,
-                "detected_objects": job.yolo_results.get("objects", []),
-                "scene_context": "Processed with YOLO-E + LLM pipeline",
-                "emotional_context": "Analyzed for memory context",
-                "processing_status": "completed",
-                "embedding": job.embedding
-            }
-            
-            # Call memory service to update the record
-            response = await self.http_client.patch(
-                f"http://backend:8001/api/v1/memory/memories/{job.memory_id}",
-                json=update_data
-            )
-            
-            if response.status_code != 200:
-                logger.warning(f"Failed to update memory record: {response.status_code}")
-                
-        except Exception as e:
-            logger.error(f"Error updating memory record: {e}")
+        """Update the memory record in the database with processing results; raises on failure"""
+        # This would update the database record with:
+        # - AI description (from LLM)
+        # - Detected objects (from YOLO-E)
+        # - Embedding vector
+        # - Processing status
+        
+        # For now, we'll use a simple HTTP call to update the record
+        update_data = {
+            "ai_description": job.llm_description,
+            "detected_objects": job.yolo_results.get("objects", []),
+            "scene_context": "Processed with YOLO-E + LLM pipeline",
+            "emotional_context": "Analyzed for memory context",
+            "processing_status": "completed",
+            "embedding": job.embedding
+        }
+        
+        # Call memory service to update the record
+        response = await self.http_client.patch(
+            f"http://backend:8001/api/v1/memory/memories/{job.memory_id}",
+            json=update_data
+        )
+        
+        response.raise_for_status()
 
 # Global instance
 _memory_processing_service: Optional[MemoryProcessingService] = None
@@ -333,3 +478,20 @@ async def cleanup_memory_processing_service():
     if _memory_processing_service:
         await _memory_processing_service.close()
         _memory_processing_service = None
+
+
+async def _run_worker():
+    """Consume memory jobs until SIGTERM/SIGINT (separate worker deployment)"""
+    service = get_memory_processing_service()
+    await service.initialize(run_consumers=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    logger.info("Memory worker draining")
+    await cleanup_memory_processing_service()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[memory-worker] %(message)s")
+    asyncio.run(_run_worker())
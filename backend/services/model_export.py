@@ -0,0 +1,362 @@
+"""
+YOLO-E Model Export Service
+
+CPU-oriented runtime formats for YOLO-E weights:
+1. ONNX export of base and trained .pt weights (dynamic batch)
+2. INT8 dynamic quantization of the ONNX graph
+3. Artifacts are cached next to the original weights and rebuilt when the
+   .pt file is newer; they are written to a temp file and renamed into place
+4. Inference requests start missing exports in the background instead of
+   waiting for them
+5. Accuracy/latency comparison report across backends
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import json
+import time
+import logging
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from engines.tiling import box_iou
+from services.yolo_e_registry import load_yolo_model
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised when the packages for an export backend are not installed"""
+
+
+class ExportInProgress(RuntimeError):
+    """Raised while an artifact is being built in the background"""
+
+    def __init__(self, backend: str, retry_after: int):
+        super().__init__(f"{backend} export in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class ModelExportConfig:
+    """Model export configuration"""
+    image_size: int = int(os.getenv("EYE_EXPORT_IMAGE_SIZE", "640"))
+    opset: int = int(os.getenv("EYE_EXPORT_OPSET", "0"))  # 0 lets ultralytics choose
+    dynamic_batch: bool = os.getenv("EYE_EXPORT_DYNAMIC_BATCH", "true").lower() == "true"
+    simplify: bool = os.getenv("EYE_EXPORT_SIMPLIFY", "true").lower() == "true"
+    retry_after: int = int(os.getenv("EYE_EXPORT_RETRY_AFTER", "30"))  # seconds, while exporting
+
+
+def artifact_path(model_path: str, backend: str) -> str:
+    """Location of a backend's artifact next to the original weights"""
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of: {', '.join(BACKENDS)}")
+    stem, _ = os.path.splitext(model_path)
+    return {
+        "torch": model_path,
+        "onnx": f"{stem}.onnx",
+        "onnx-int8": f"{stem}.int8.onnx",
+    }[backend]
+
+
+def _is_current(artifact: str, source: str) -> bool:
+    """An artifact is reusable when it exists and is not older than its source"""
+    try:
+        return os.path.getmtime(artifact) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def _match_detections(reference: Dict[str, np.ndarray], candidate: Dict[str, np.ndarray], iou: float = 0.5) -> Dict[str, int]:
+    """Greedy same-class matching of candidate boxes against reference boxes"""
+    matched = 0
+    used = np.zeros(len(candidate["boxes"]), dtype=bool)
+    for box, cls in zip(reference["boxes"], reference["classes"]):
+        candidates = np.where((candidate["classes"] == cls) & ~used)[0]
+        if candidates.size == 0:
+            continue
+        ious = box_iou(box, candidate["boxes"][candidates])
+        best = int(np.argmax(ious))
+        if ious[best] >= iou:
+            used[candidates[best]] = True
+            matched += 1
+    return {"reference": len(reference["boxes"]), "candidate": len(candidate["boxes"]), "matched": matched}
+
+
+class ModelExporter:
+    """Builds and caches ONNX / INT8 artifacts for YOLO-E weights"""
+
+    def __init__(self, config: Optional[ModelExportConfig] = None, loader=None):
+        self.config = config or ModelExportConfig()
+        self._loader = loader or load_yolo_model
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _lock_for(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def ensure(self, model_path: str, backend: str) -> str:
+        """
+        Return the weights file for a backend, exporting it if missing or stale
+
+        Args:
+            model_path: Original .pt weights
+            backend: "torch", "onnx" or "onnx-int8"
+
+        Returns:
+            Path to load with ultralytics
+        """
+        target = artifact_path(model_path, backend)
+        if backend == "torch":
+            return target
+        with self._lock_for(target):
+            if _is_current(target, model_path):
+                return target
+            if backend == "onnx":
+                return self._export_onnx(model_path, target)
+            onnx_path = self.ensure(model_path, "onnx")
+            return self._quantize_int8(onnx_path, target)
+
+    def ensure_background(self, model_path: str, backend: str) -> str:
+        """
+        Like ensure, but never waits for an export
+
+        Returns:
+            Path to load with ultralytics when the artifact is current
+
+        Raises:
+            ExportInProgress: The export was started (or is still running);
+                retry after the hinted delay
+        """
+        target = artifact_path(model_path, backend)
+        if backend == "torch" or _is_current(target, model_path):
+            return target
+        with self._locks_guard:
+            future = self._pending.get(target)
+            if future is not None and future.done():
+                del self._pending[target]
+                error = future.exception()
+                if error is not None:
+                    # Report the failure once; the next request retries
+                    raise error
+                if _is_current(target, model_path):
+                    return target
+                future = None
+            started = None
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="eye-model-export")
+                started = self._executor.submit(self.ensure, model_path, backend)
+                self._pending[target] = started
+        if started is not None:
+            # Outside the guard: the callback runs inline if the export already finished
+            started.add_done_callback(lambda done: self._forget(target, done))
+        raise ExportInProgress(backend, self.config.retry_after)
+
+    def _forget(self, target: str, future: Future) -> None:
+        """Drop a finished export; failures stay until a request reports them"""
+        if future.exception() is None:
+            with self._locks_guard:
+                if self._pending.get(target) is future:
+                    del self._pending[target]
+
+    def _export_onnx(self, model_path: str, target: str) -> str:
+        try:
+            import onnx  # noqa: F401
+        except ImportError:
+            raise BackendUnavailable("ONNX export requires the onnx package")
+
+        start = time.time()
+        # ultralytics writes <stem>.onnx next to the weights it loaded, so
+        # export from a temp-named link and rename the result into place:
+        # readers never see a partially written target
+        stem = f"{os.path.splitext(target)[0]}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_weights = stem + os.path.splitext(model_path)[1]
+        tmp_onnx = stem + ".onnx"
+        try:
+            os.link(model_path, tmp_weights)
+        except OSError:
+            shutil.copy2(model_path, tmp_weights)
+        try:
+            # A private instance: export fuses layers in place
+            model = self._loader(tmp_weights)
+            kwargs = {
+                "format": "onnx",
+                "imgsz": self.config.image_size,
+                "dynamic": self.config.dynamic_batch,
+                "simplify": self.config.simplify,
+            }
+            if self.config.opset:
+                kwargs["opset"] = self.config.opset
+            exported = str(model.export(**kwargs))
+            os.replace(exported, target)
+        finally:
+            for path in (tmp_weights, tmp_onnx):
+                if os.path.exists(path):
+                    os.remove(path)
+        logger.info(f"Exported {os.path.basename(model_path)} to ONNX in {time.time() - start:.1f}s")
+        return target
+
+    def _quantize_int8(self, onnx_path: str, target: str) -> str:
+        try:
+            import onnx
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise BackendUnavailable("INT8 quantization requires the onnx and onnxruntime packages")
+
+        start = time.time()
+        tmp_path = f"{os.path.splitext(target)[0]}.{os.getpid()}.tmp.onnx"
+        try:
+            quantize_dynamic(onnx_path, tmp_path, weight_type=QuantType.QInt8)
+
+            # ultralytics reads names, stride and task from the model metadata
+            source = onnx.load(onnx_path)
+            quantized = onnx.load(tmp_path)
+            present = {prop.key for prop in quantized.metadata_props}
+            for prop in source.metadata_props:
+                if prop.key not in present:
+                    quantized.metadata_props.add(key=prop.key, value=prop.value)
+            onnx.save(quantized, tmp_path)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"Quantized {os.path.basename(onnx_path)} to INT8 in {time.time() - start:.1f}s")
+        return target
+
+    def list_artifacts(self, model_path: str) -> Dict[str, Any]:
+        """Artifact status for each backend"""
+        artifacts = {}
+        for backend in BACKENDS:
+            path = artifact_path(model_path, backend)
+            exists = os.path.exists(path)
+            artifacts[backend] = {
+                "path": path,
+                "exists": exists,
+                "current": exists and (backend == "torch" or _is_current(path, model_path)),
+                "size_mb": round(os.path.getsize(path) / (1024 * 1024), 2) if exists else None,
+            }
+        return artifacts
+
+    def compare(
+        self,
+        model_path: str,
+        images: List[np.ndarray],
+        backends: Sequence[str] = BACKENDS,
+        runs: int = 3,
+        confidence_threshold: float = 0.25,
+        iou_threshold: float = 0.45,
+    ) -> Dict[str, Any]:
+        """
+        Accuracy/latency comparison across backends
+
+        Every backend runs the same images on CPU. Latency is per image,
+        measured over `runs` passes after one warm-up pass. Accuracy is the
+        agreement with the torch output: same-class matches at IoU >= 0.5.
+        The report is also saved next to the weights as <stem>.backends.json.
+
+        Args:
+            model_path: Original .pt weights
+            images: Decoded BGR sample images
+            backends: Backends to compare; torch is always the reference
+            runs: Timed passes per backend
+
+        Returns:
+            Report with per-backend latency, size and agreement
+        """
+        backends = ["torch"] + [b for b in backends if b != "torch"]
+        outputs: Dict[str, List[Dict[str, np.ndarray]]] = {}
+        report: Dict[str, Any] = {
+            "model_path": model_path,
+            "images": len(images),
+            "runs": runs,
+            "image_size": self.config.image_size,
+            "backends": {},
+        }
+
+        for backend in backends:
+            path = self.ensure(model_path, backend)
+            model = self._loader(path)
+            predict = lambda image: model(
+                image,
+                device="cpu",
+                imgsz=self.config.image_size,
+                conf=confidence_threshold,
+                iou=iou_threshold,
+                verbose=False,
+            )[0]
+
+            for image in images:
+                predict(image)
+
+            latencies = []
+            results = []
+            for _ in range(max(1, runs)):
+                results = []
+                for image in images:
+                    start = time.perf_counter()
+                    results.append(predict(image))
+                    latencies.append((time.perf_counter() - start) * 1000.0)
+
+            outputs[backend] = []
+            for result in results:
+                data = result.boxes.data.cpu().numpy() if result.boxes is not None else np.zeros((0, 6))
+                outputs[backend].append({"boxes": data[:, :4], "classes": data[:, -1].astype(np.int64)})
+
+            latency = np.asarray(latencies)
+            report["backends"][backend] = {
+                "path": path,
+                "size_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+                "latency_ms": {
+                    "mean": round(float(latency.mean()), 2),
+                    "p50": round(float(np.percentile(latency, 50)), 2),
+                    "p95": round(float(np.percentile(latency, 95)), 2),
+                },
+                "images_per_second": round(1000.0 / float(latency.mean()), 2),
+                "detections": int(sum(len(o["boxes"]) for o in outputs[backend])),
+            }
+
+        reference_latency = report["backends"]["torch"]["latency_ms"]["mean"]
+        for backend in backends:
+            counts = [_match_detections(ref, cand) for ref, cand in zip(outputs["torch"], outputs[backend])]
+            reference = sum(c["reference"] for c in counts)
+            candidate = sum(c["candidate"] for c in counts)
+            matched = sum(c["matched"] for c in counts)
+            entry = report["backends"][backend]
+            entry["speedup"] = round(reference_latency / entry["latency_ms"]["mean"], 2)
+            entry["agreement"] = {
+                "recall": round(matched / reference, 4) if reference else 1.0,
+                "precision": round(matched / candidate, 4) if candidate else 1.0,
+            }
+
+        report_path = f"{os.path.splitext(model_path)[0]}.backends.json"
+        try:
+            with open(report_path, "w") as f:
+                json.dump(report, f, indent=2)
+            report["report_path"] = report_path
+        except OSError as e:
+            logger.warning(f"Could not save backend comparison report: {e}")
+        return report
+
+
+# Global instance
+_model_exporter: Optional[ModelExporter] = None
+
+
+def get_model_exporter() -> ModelExporter:
+    """Get the global model exporter instance"""
+    global _model_exporter
+    if _model_exporter is None:
+        _model_exporter = ModelExporter()
+    return _model_exporter
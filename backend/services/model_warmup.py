@@ -0,0 +1,261 @@
+"""
+YOLO-E Startup Warm-up
+
+Preloads models listed in config/eye.yaml (ml.yolo_e.warmup) when the
+backend starts, so the first real request does not pay for the ultralytics
+import, the weight load and the first-call graph setup:
+1. Each model is loaded into every inference worker's registry (exported first for ONNX backends)
+2. Synthetic inferences run at every configured batch size
+3. Readiness is reported only after warm-up has finished; in strict mode
+   models that fail are retried with exponential backoff until they warm
+
+With EYE_INFERENCE_EXECUTOR=process, inference runs in worker processes
+that each keep their own registry, so warm-up runs in every worker process
+(see InferenceExecutor.broadcast); with EYE_INFERENCE_EXECUTOR=pool the
+model's engine pool is started, loading it in every pool worker. /ready
+also stays 503 while a restarted worker process is re-warming.
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.inference_executor import get_inference_executor
+from services.model_export import get_model_exporter
+from services.yolo_e_batcher import BatchKey
+from services.yolo_e_inference import DEFAULT_IMAGE_SIZE, predict_batch
+from services.yolo_e_registry import get_model_registry, resolve_base_model_path
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.getenv("EYE_CONFIG_PATH", "/app/config/eye.yaml")
+
+STATE_PENDING = "pending"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+@dataclass
+class WarmupModel:
+    """One model to preload"""
+    name: str
+    device: str = "cpu"
+    backend: str = "torch"
+    batch_sizes: List[int] = field(default_factory=lambda: [1])
+
+
+@dataclass
+class WarmupConfig:
+    """Warm-up configuration"""
+    enabled: bool = True
+    models: List[WarmupModel] = field(default_factory=list)
+    image_size: int = DEFAULT_IMAGE_SIZE
+    iterations: int = 2
+    strict: bool = False  # stay not-ready (and keep retrying) while any model fails to warm
+    retry_delay: float = 5.0  # first strict-mode retry, doubled per attempt
+    retry_max_delay: float = 300.0
+    max_attempts: int = 0  # per model; 0 retries until it warms
+    confidence_threshold: float = 0.5
+    iou_threshold: float = 0.45
+
+
+def load_warmup_config(config_path: str = CONFIG_PATH) -> WarmupConfig:
+    """
+    Read ml.yolo_e.warmup from eye.yaml
+
+    A missing file or section disables warm-up. EYE_WARMUP_ENABLED=false
+    turns it off without editing the file.
+    """
+    try:
+        import yaml
+        with open(config_path, "r") as f:
+            yolo_e = (yaml.safe_load(f) or {}).get("ml", {}).get("yolo_e", {})
+    except FileNotFoundError:
+        logger.info(f"No config at {config_path}; model warm-up disabled")
+        return WarmupConfig(enabled=False)
+    except Exception as e:
+        logger.error(f"Error loading warm-up config: {e}")
+        return WarmupConfig(enabled=False)
+
+    section = yolo_e.get("warmup") or {}
+    default_batches = section.get("batch_sizes") or [1, yolo_e.get("batch_size", 8)]
+    models = [
+        WarmupModel(
+            name=entry["name"] if isinstance(entry, dict) else str(entry),
+            device=entry.get("device", "cpu") if isinstance(entry, dict) else "cpu",
+            backend=entry.get("backend", "torch") if isinstance(entry, dict) else "torch",
+            batch_sizes=list(entry.get("batch_sizes", default_batches)) if isinstance(entry, dict) else list(default_batches),
+        )
+        for entry in section.get("models", [])
+    ]
+    return WarmupConfig(
+        enabled=bool(section.get("enabled", False)) and os.getenv("EYE_WARMUP_ENABLED", "true").lower() == "true",
+        models=models,
+        image_size=int(section.get("image_size", DEFAULT_IMAGE_SIZE)),
+        iterations=int(section.get("iterations", 2)),
+        strict=bool(section.get("strict", False)),
+        retry_delay=float(section.get("retry_delay", 5.0)),
+        retry_max_delay=float(section.get("retry_max_delay", 300.0)),
+        max_attempts=int(section.get("max_attempts", 0)),
+        confidence_threshold=float(yolo_e.get("confidence_threshold", 0.5)),
+        iou_threshold=float(yolo_e.get("iou_threshold", 0.45)),
+    )
+
+
+class ModelWarmup:
+    """Runs the warm-up phase and tracks readiness"""
+
+    def __init__(self, config: Optional[WarmupConfig] = None):
+        self.config = config or load_warmup_config()
+        self.state = STATE_PENDING
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.results: List[Dict[str, Any]] = []
+        self.next_retry_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == STATE_READY
+
+    def run(self) -> None:
+        """
+        Preload and warm every configured model (blocking)
+
+        In strict mode this returns only once every model has warmed, the
+        per-model attempt limit is reached, or stop() is called.
+        """
+        with self._lock:
+            if self.state in (STATE_WARMING, STATE_READY):
+                return
+            self.state = STATE_WARMING
+            self.started_at = time.time()
+
+        if not self.config.enabled or not self.config.models:
+            self._finish(failed=False)
+            return
+
+        self.results = [self._warm_or_fail(model, 1) for model in self.config.models]
+        attempt = 1
+        while self.config.strict and self._failed_models():
+            if self.config.max_attempts and attempt >= self.config.max_attempts:
+                break
+            delay = min(self.config.retry_delay * (2 ** (attempt - 1)), self.config.retry_max_delay)
+            self.next_retry_at = time.time() + delay
+            logger.warning(f"Retrying warm-up of {len(self._failed_models())} model(s) in {delay:.0f}s")
+            if self._stop.wait(delay):
+                break
+            attempt += 1
+            for index in self._failed_models():
+                self.results[index] = self._warm_or_fail(self.config.models[index], attempt)
+        self.next_retry_at = None
+        self._finish(failed=bool(self._failed_models()) and self.config.strict)
+
+    def stop(self) -> None:
+        """Stop retrying failed models"""
+        self._stop.set()
+
+    def _failed_models(self) -> List[int]:
+        return [i for i, result in enumerate(self.results) if result["status"] == STATE_FAILED]
+
+    def _warm_or_fail(self, model: WarmupModel, attempt: int) -> Dict[str, Any]:
+        try:
+            result = self._warm_model(model)
+        except Exception as e:
+            logger.error(f"Warm-up failed for {model.name} (attempt {attempt}): {e}")
+            result = {"model": model.name, "backend": model.backend, "status": STATE_FAILED, "error": str(e)}
+        result["attempts"] = attempt
+        return result
+
+    def _warm_model(self, model: WarmupModel) -> Dict[str, Any]:
+        model_path = model.name if os.path.isabs(model.name) else resolve_base_model_path(model.name)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+
+        start = time.time()
+        device = model.device
+        if model.backend != "torch":
+            model_path = get_model_exporter().ensure(model_path, model.backend)
+            device = "cpu"
+
+        key = BatchKey(
+            model_path=model_path,
+            device=device,
+            confidence_threshold=self.config.confidence_threshold,
+            iou_threshold=self.config.iou_threshold,
+        )
+        # Every inference worker loads and warms its own copy
+        workers = get_inference_executor().broadcast(
+            warm_worker, key, model.batch_sizes, self.config.image_size, self.config.iterations
+        )
+
+        logger.info(f"Warmed {os.path.basename(model_path)} on {device} in {len(workers)} worker(s) "
+                    f"in {time.time() - start:.1f}s")
+        return {
+            "model": model.name,
+            "model_path": model_path,
+            "device": device,
+            "backend": model.backend,
+            "status": STATE_READY,
+            "workers": len(workers),
+            "load_time": max(w["load_time"] for w in workers),
+            "batch_times": workers[0]["batch_times"],
+        }
+
+    def _finish(self, failed: bool) -> None:
+        self.finished_at = time.time()
+        self.state = STATE_FAILED if failed else STATE_READY
+        logger.info(f"Model warm-up finished: {self.state}")
+
+    def status(self) -> Dict[str, Any]:
+        cold_workers = get_inference_executor().cold_workers()
+        return {
+            "state": self.state,
+            "ready": self.ready and not cold_workers,
+            "cold_workers": cold_workers,
+            "enabled": self.config.enabled,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+            "next_retry_at": self.next_retry_at,
+            "models": self.results,
+        }
+
+
+def warm_worker(key: BatchKey, batch_sizes: List[int], image_size: int, iterations: int) -> Dict[str, Any]:
+    """Load a model into this worker's registry and run synthetic batches"""
+    start = time.time()
+    get_model_registry().warm(key.model_path, key.device)
+    load_time = time.time() - start
+
+    batch_times = {}
+    for batch_size in batch_sizes:
+        images = [np.zeros((image_size, image_size, 3), dtype=np.uint8) for _ in range(batch_size)]
+        timings = []
+        for _ in range(max(1, iterations)):
+            batch_start = time.time()
+            predict_batch(key, images)
+            timings.append(time.time() - batch_start)
+        batch_times[str(batch_size)] = [round(t, 3) for t in timings]
+    return {"load_time": round(load_time, 3), "batch_times": batch_times}
+
+
+# Global instance
+_model_warmup: Optional[ModelWarmup] = None
+
+
+def get_model_warmup() -> ModelWarmup:
+    """Get the global model warm-up instance"""
+    global _model_warmup
+    if _model_warmup is None:
+        _model_warmup = ModelWarmup()
+    return _model_warmup
@@ -3,29 +3,40 @@ import json
 from typing import Optional
 import redis
 
+from orchestrator.workers.reliable_queue import Delivery, ReliableQueue
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 QUEUE_KEY = os.getenv("EYE_QUEUE_KEY", "eye:jobs")
+CONSUMER_ID = os.getenv("EYE_API_CONSUMER_ID", "api")
 
 class QueueClient:
     def __init__(self, url: str = REDIS_URL, queue_key: str = QUEUE_KEY):
         self.client = redis.Redis.from_url(url)
         self.queue_key = queue_key
+        # Jobs taken through the API stay on the "api" processing list until
+        # acked, and are reclaimed by the workers if never acked
+        self.queue = ReliableQueue(self.client, queue_key, consumer_id=CONSUMER_ID)
 
     def enqueue(self, payload: dict) -> int:
-        data = json.dumps(payload)
-        return self.client.lpush(self.queue_key, data)
+        return self.queue.enqueue(payload)
 
     def dequeue(self, block: bool = False, timeout: int = 1) -> Optional[dict]:
-        if block:
-            item = self.client.brpop(self.queue_key, timeout=timeout)
-            if item is None:
-                return None
-            _, data = item
-        else:
-            data = self.client.rpop(self.queue_key)
-            if data is None:
-                return None
-        try:
-            return json.loads(data)
-        except Exception:
+        delivery = self.queue.receive(timeout=timeout, block=block)
+        if delivery is None:
             return None
+        return {"job": delivery.job, "receipt": delivery.raw.decode(), "attempt": delivery.attempt}
+
+    def ack(self, receipt: str) -> bool:
+        return self.queue.ack(self._delivery(receipt))
+
+    def nack(self, receipt: str, error: str) -> int:
+        return self.queue.nack(self._delivery(receipt), error)
+
+    def stats(self) -> dict:
+        return self.queue.stats()
+
+    def dead_letters(self, limit: int = 100) -> list:
+        return self.queue.dead_letters(limit)
+
+    def _delivery(self, receipt: str) -> Delivery:
+        return Delivery(raw=receipt.encode(), job=json.loads(receipt), attempt=0)
@@ -0,0 +1,150 @@
+"""
+Text Prompt Embedding Cache
+
+Caches YOLO-E text prompt embeddings (get_text_pe) per model and normalized
+class list, so custom vocabularies do not rerun the text encoder:
+1. In-process LRU tier
+2. Persistent on-disk tier shared across restarts and replicas
+3. Keys include the weights file's size and mtime, so retrained weights
+   never reuse stale embeddings
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.yolo_e_registry import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TextEmbeddingCacheConfig:
+    """Text embedding cache configuration"""
+    max_entries: int = int(os.getenv("EYE_TEXT_PE_CACHE_SIZE", "256"))
+    disk_dir: str = os.getenv("EYE_TEXT_PE_CACHE_DIR", "/app/storage/cache/text_pe")
+    disk_enabled: bool = os.getenv("EYE_TEXT_PE_DISK_CACHE", "true").lower() == "true"
+
+
+def normalize_class_list(classes: Sequence[str]) -> Tuple[str, ...]:
+    """Strip, collapse whitespace and drop duplicates while keeping order (order sets class ids)"""
+    seen = set()
+    normalized = []
+    for name in classes:
+        name = " ".join(name.split())
+        if name and name not in seen:
+            seen.add(name)
+            normalized.append(name)
+    return tuple(normalized)
+
+
+class TextEmbeddingCache:
+    """Two-tier (memory, disk) cache of text prompt embeddings"""
+
+    def __init__(self, config: Optional[TextEmbeddingCacheConfig] = None):
+        self.config = config or TextEmbeddingCacheConfig()
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def cache_key(self, model_path: str, classes: Sequence[str]) -> str:
+        payload = model_fingerprint(model_path) + "\n" + "\n".join(normalize_class_list(classes))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_or_compute(
+        self,
+        model_path: str,
+        classes: Sequence[str],
+        compute: Callable[[List[str]], Any],
+    ) -> Any:
+        """
+        Return cached embeddings for a class list, computing them on a miss
+
+        Args:
+            model_path: Weights the embeddings belong to
+            classes: Class names (normalized before lookup)
+            compute: Called with the normalized class list on a miss
+
+        Returns:
+            Text prompt embeddings tensor
+        """
+        key = self.cache_key(model_path, classes)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key]
+
+        embeddings = self._load_from_disk(key)
+        if embeddings is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            embeddings = compute(list(normalize_class_list(classes)))
+            self._save_to_disk(key, embeddings)
+
+        with self._lock:
+            self._entries[key] = embeddings
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+        return embeddings
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.config.disk_dir, f"{key}.pt")
+
+    def _load_from_disk(self, key: str) -> Optional[Any]:
+        if not self.config.disk_enabled:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            import torch
+            return torch.load(path, map_location="cpu")
+        except Exception as e:
+            logger.warning(f"Discarding unreadable text embedding cache file {path}: {e}")
+            return None
+
+    def _save_to_disk(self, key: str, embeddings: Any) -> None:
+        if not self.config.disk_enabled:
+            return
+        try:
+            import torch
+            os.makedirs(self.config.disk_dir, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save(embeddings.detach().cpu(), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to persist text embeddings: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.config.max_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_dir": self.config.disk_dir if self.config.disk_enabled else None,
+        }
+
+
+# Global instance
+_text_embedding_cache: Optional[TextEmbeddingCache] = None
+
+
+def get_text_embedding_cache() -> TextEmbeddingCache:
+    """Get the global text embedding cache instance"""
+    global _text_embedding_cache
+    if _text_embedding_cache is None:
+        _text_embedding_cache = TextEmbeddingCache()
+    return _text_embedding_cache
@@ -0,0 +1,187 @@
+"""
+YOLO-E Micro-Batching Scheduler
+
+Collects concurrent single-image inference requests that share a model,
+thresholds and class set, and runs them as one forward pass:
+1. A batch is flushed when it reaches max_batch_size or max_wait_ms expires
+2. Each caller gets back only the result for its own image
+3. Batch size and wait time are tunable per model
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BatchKey(NamedTuple):
+    """Requests with equal keys can share a forward pass"""
+    model_path: str
+    device: str
+    confidence_threshold: float
+    iou_threshold: float
+    classes: Tuple[str, ...] = ()
+
+
+@dataclass
+class BatchPolicy:
+    """Latency/throughput tradeoff for one model"""
+    max_batch_size: int = int(os.getenv("EYE_YOLO_E_MAX_BATCH", "8"))
+    max_wait_ms: float = float(os.getenv("EYE_YOLO_E_BATCH_WAIT_MS", "10"))
+
+
+def _load_policies_from_env() -> Dict[str, BatchPolicy]:
+    """
+    Per-model policies from EYE_YOLO_E_BATCH_POLICIES, e.g.
+    {"yoloe-11s-seg.pt": {"max_batch_size": 16, "max_wait_ms": 20}}
+    """
+    raw = os.getenv("EYE_YOLO_E_BATCH_POLICIES", "")
+    if not raw:
+        return {}
+    try:
+        return {name: BatchPolicy(**values) for name, values in json.loads(raw).items()}
+    except Exception as e:
+        logger.error(f"Invalid EYE_YOLO_E_BATCH_POLICIES: {e}")
+        return {}
+
+
+@dataclass
+class _PendingItem:
+    item: Any
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class InferenceBatcher:
+    """
+    Groups single-image requests into batches per BatchKey
+
+    The runner receives a key and a list of inputs and must return one result
+    per input, in order. By default it runs inline on the event loop; pass an
+    execute(fn, *args) coroutine to run batches on an executor.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[BatchKey, List[Any]], List[Any]],
+        default_policy: Optional[BatchPolicy] = None,
+        policies: Optional[Dict[str, BatchPolicy]] = None,
+        execute: Optional[Callable[..., Awaitable[List[Any]]]] = None,
+        idle_timeout: float = 30.0,
+    ):
+        self.runner = runner
+        self.default_policy = default_policy or BatchPolicy()
+        self.policies: Dict[str, BatchPolicy] = policies if policies is not None else _load_policies_from_env()
+        self.execute = execute
+        self.idle_timeout = idle_timeout
+        self._queues: Dict[BatchKey, asyncio.Queue] = {}
+        self._workers: Dict[BatchKey, asyncio.Task] = {}
+        self.batches_run = 0
+        self.items_run = 0
+        self.max_batch_seen = 0
+
+    def policy_for(self, key: BatchKey) -> BatchPolicy:
+        """Look up a policy by model file name, then full path, then default"""
+        return (
+            self.policies.get(os.path.basename(key.model_path))
+            or self.policies.get(key.model_path)
+            or self.default_policy
+        )
+
+    def set_policy(self, model_name: str, policy: BatchPolicy) -> None:
+        self.policies[model_name] = policy
+
+    async def submit(self, key: BatchKey, item: Any) -> Any:
+        """Queue one input and wait for its result"""
+        loop = asyncio.get_running_loop()
+        pending = _PendingItem(item=item, future=loop.create_future(), enqueued_at=time.time())
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[key] = queue
+        await queue.put(pending)
+
+        worker = self._workers.get(key)
+        if worker is None or worker.done():
+            self._workers[key] = asyncio.create_task(self._worker(key, queue))
+
+        return await pending.future
+
+    async def _collect(self, queue: asyncio.Queue, policy: BatchPolicy) -> List[_PendingItem]:
+        """Wait for the first item, then fill the batch until full or the wait expires"""
+        first = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+        batch = [first]
+        deadline = first.enqueued_at + policy.max_wait_ms / 1000.0
+        while len(batch) < policy.max_batch_size:
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self, key: BatchKey, queue: asyncio.Queue) -> None:
+        """Run batches for one key sequentially; exits after idle_timeout"""
+        while True:
+            try:
+                batch = await self._collect(queue, self.policy_for(key))
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    self._queues.pop(key, None)
+                    self._workers.pop(key, None)
+                    return
+                continue
+
+            # Skip callers that went away while waiting
+            batch = [p for p in batch if not p.future.done()]
+            if not batch:
+                continue
+
+            try:
+                results = await self._run(key, [p.item for p in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch runner returned {len(results)} results for {len(batch)} inputs")
+                for pending, result in zip(batch, results):
+                    if not pending.future.done():
+                        pending.future.set_result(result)
+            except Exception as e:
+                logger.error(f"Batch inference failed for {os.path.basename(key.model_path)}: {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+            self.batches_run += 1
+            self.items_run += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+    async def _run(self, key: BatchKey, items: List[Any]) -> List[Any]:
+        if self.execute is None:
+            return self.runner(key, items)
+        return await self.execute(self.runner, key, items)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_keys": len(self._workers),
+            "queued": sum(q.qsize() for q in self._queues.values()),
+            "batches_run": self.batches_run,
+            "items_run": self.items_run,
+            "avg_batch_size": round(self.items_run / self.batches_run, 2) if self.batches_run else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "default_policy": asdict(self.default_policy),
+            "policies": {name: asdict(policy) for name, policy in self.policies.items()},
+        }
@@ -0,0 +1,266 @@
+"""
+YOLO-E Inference Service
+
+Shared inference path for the YOLO-E endpoints: resolves the model through
+the registry, applies text vocabularies and runs batched forward passes.
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import copy
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from engines.base import EngineCapabilities, EngineNode
+from engines.tiling import TileSpec, merge_tile_detections, slice_tiles, tile_grid
+from services.image_decoder import DecodedImage
+from services.inference_executor import PooledCall, get_inference_executor, register_pooled
+from services.text_embedding_cache import get_text_embedding_cache, normalize_class_list
+from services.yolo_e_batcher import BatchKey, InferenceBatcher
+from services.yolo_e_registry import get_model_registry
+
+logger = logging.getLogger(__name__)
+
+# Model input size used for decode-time downscaling
+DEFAULT_IMAGE_SIZE = 640
+
+# Tiles per forward pass in sliced inference
+TILE_BATCH_SIZE = int(os.getenv("EYE_YOLO_E_TILE_BATCH", "16"))
+
+
+def normalize_classes(custom_classes: str) -> List[str]:
+    """Parse a comma-separated class list"""
+    return list(normalize_class_list(custom_classes.split(",")))
+
+
+def apply_text_classes(model, model_path: str, class_list: List[str]) -> None:
+    """Configure a model for a custom text vocabulary using cached embeddings"""
+    try:
+        # Text embeddings come from the cache; the encoder only runs on a miss
+        text_pe = get_text_embedding_cache().get_or_compute(model_path, class_list, model.get_text_pe)
+        model.set_classes(class_list, text_pe)
+    except AttributeError:
+        # Fallback if get_text_pe is not available
+        model.set_classes(class_list)
+
+
+def clone_base_model(model_path: str, device: str) -> Any:
+    """
+    Copy the resident base model for a new vocabulary head
+
+    Cloning skips reading the weights from disk. The predictor holds
+    device state and a lock that cannot be copied, so it is detached
+    while the copy is made.
+    """
+    with get_model_registry().use(model_path, device) as base, base.lock:
+        predictor = getattr(base.model, "predictor", None)
+        base.model.predictor = None
+        try:
+            return copy.deepcopy(base.model)
+        finally:
+            base.model.predictor = predictor
+
+
+def predict_batch(key: BatchKey, sources: List[Any]) -> List[Any]:
+    """
+    Run one forward pass over a batch of images
+
+    Args:
+        key: Model, device, thresholds and class set shared by the batch
+        sources: Decoded BGR arrays (or image paths)
+
+    Returns:
+        One ultralytics Results object per source, in order
+    """
+    variant = ""
+    setup = None
+    load = None
+    if key.classes:
+        # set_classes mutates the model, so each vocabulary gets its own
+        # head cloned from the base model instead of changing the shared one
+        class_list = list(normalize_class_list(key.classes))
+        variant = "text:" + ",".join(class_list)
+        setup = lambda m: apply_text_classes(m, key.model_path, class_list)
+        load = lambda: clone_base_model(key.model_path, key.device)
+
+    with get_model_registry().use(key.model_path, key.device, variant, setup, load) as entry, entry.lock:
+        results = entry.model(
+            sources,
+            device=key.device,
+            conf=key.confidence_threshold,
+            iou=key.iou_threshold,
+            batch=len(sources),
+            verbose=False,
+        )
+    return list(results)
+
+
+def empty_detection_columns() -> Dict[str, list]:
+    return {"class_ids": [], "class_names": [], "confidence_scores": [], "bounding_boxes": []}
+
+
+def _boxes_data(result) -> np.ndarray:
+    """Boxes as one (N, 6+) array: x1, y1, x2, y2, [track_id,] conf, cls"""
+    if result is None or result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 6))
+    # One device transfer for all boxes instead of one per box
+    return np.asarray(result.boxes.data.cpu().numpy(), dtype=np.float64)
+
+
+def _columns_from_arrays(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, names) -> Dict[str, list]:
+    class_ids = classes.astype(np.int64).tolist()
+    return {
+        "class_ids": class_ids,
+        "class_names": [names[cls] if cls in names else f"class_{cls}" for cls in class_ids],
+        "confidence_scores": scores.tolist(),
+        "bounding_boxes": boxes.tolist(),
+    }
+
+
+def extract_detection_columns(result, scale: Tuple[float, float] = (1.0, 1.0)) -> Dict[str, list]:
+    """
+    Convert an ultralytics Results object into columnar detections
+
+    Boxes, confidences and classes come off the device in a single
+    transfer (boxes.data) and are scaled and converted as whole arrays.
+
+    Args:
+        result: Results for one image
+        scale: (x, y) factors mapping model-input coordinates back to the
+            original image when it was downscaled during decode
+
+    Returns:
+        Dict of parallel lists: class_ids, class_names, confidence_scores
+        and bounding_boxes ([x1, y1, x2, y2])
+    """
+    data = _boxes_data(result)
+    if len(data) == 0:
+        return empty_detection_columns()
+    sx, sy = scale
+    return _columns_from_arrays(data[:, :4] * np.array([sx, sy, sx, sy]), data[:, -2], data[:, -1], result.names)
+
+
+def columns_to_detections(columns: Dict[str, list]) -> List[Dict[str, Any]]:
+    """Expand columnar detections into the per-detection dict format"""
+    return [
+        {"class_id": cls, "class_name": name, "confidence": conf, "bbox": bbox}
+        for cls, name, conf, bbox in zip(
+            columns["class_ids"],
+            columns["class_names"],
+            columns["confidence_scores"],
+            columns["bounding_boxes"],
+        )
+    ]
+
+
+def extract_detections(result, scale: Tuple[float, float] = (1.0, 1.0)) -> List[Dict[str, Any]]:
+    """Convert an ultralytics Results object into detection dicts"""
+    return columns_to_detections(extract_detection_columns(result, scale))
+
+
+def detect_batch(key: BatchKey, images: List[DecodedImage]) -> List[Dict[str, list]]:
+    """
+    Run a batch and return columnar detections per image
+
+    Returns only picklable data so it can run in a process pool.
+    """
+    results = predict_batch(key, [image.array for image in images])
+    return [extract_detection_columns(result, image.scale) for result, image in zip(results, images)]
+
+
+class DetectionEngine(EngineNode):
+    """
+    detect_batch as an engine-pool engine (EYE_INFERENCE_EXECUTOR=pool)
+
+    Decoded arrays arrive through the pool's shared memory; the batch key
+    and the images' original sizes come as keyword arguments.
+    """
+    name = "yolo_e_detect"
+    capabilities = EngineCapabilities(max_batch_size=TILE_BATCH_SIZE, supports_arrays=True,
+                                      preferred_input_size=DEFAULT_IMAGE_SIZE)
+
+    def __init__(self, device: str = "cpu"):
+        self.device = device
+
+    def load(self, weights_path: str) -> None:
+        get_model_registry().warm(weights_path, self.device)
+
+    def infer(self, input_path: str) -> Dict[str, Any]:
+        raise NotImplementedError("DetectionEngine runs on decoded arrays")
+
+    def infer_batch(self, inputs: List[np.ndarray], key: BatchKey,
+                    original_sizes: List[Tuple[int, int]]) -> List[Dict[str, list]]:
+        images = [DecodedImage(array=array, original_size=tuple(size)) for array, size in zip(inputs, original_sizes)]
+        return detect_batch(key, images)
+
+
+def _split_detect_batch(key: BatchKey, images: List[DecodedImage]) -> Tuple[str, str, List[np.ndarray], Dict[str, Any]]:
+    return (
+        key.model_path,
+        key.device,
+        [image.array for image in images],
+        {"key": key, "original_sizes": [image.original_size for image in images]},
+    )
+
+
+register_pooled(detect_batch, PooledCall(engine=DetectionEngine, split=_split_detect_batch))
+
+
+def detect_tiled(key: BatchKey, image: DecodedImage, spec: TileSpec) -> Dict[str, list]:
+    """
+    Sliced inference for high-resolution images
+
+    The decoded image is cut into overlapping tiles that are views into its
+    buffer, so no pixels are copied. Tiles run in batches of
+    TILE_BATCH_SIZE. Boxes are mapped back to image coordinates and merged
+    across tiles with NMS or WBF. When spec.include_full_image is set, the
+    whole image also runs once at model input size so that objects larger
+    than a tile are kept.
+
+    Args:
+        key: Model, device, thresholds and class set
+        image: Image decoded without downscaling
+        spec: Tile size, overlap and merge method
+
+    Returns:
+        Columnar detections in original image coordinates
+    """
+    height, width = image.array.shape[:2]
+    grid = tile_grid(width, height, spec.tile_size, spec.overlap)
+    sources = slice_tiles(image.array, grid)
+    offsets = [(x0, y0) for x0, y0, _, _ in grid]
+    if spec.include_full_image and len(grid) > 1:
+        sources.append(image.array)
+        offsets.append((0, 0))
+
+    results = []
+    for i in range(0, len(sources), TILE_BATCH_SIZE):
+        results.extend(predict_batch(key, sources[i:i + TILE_BATCH_SIZE]))
+
+    data = [_boxes_data(result) for result in results]
+    boxes, scores, classes = merge_tile_detections(
+        [d[:, :4] for d in data],
+        [d[:, -2] for d in data],
+        [d[:, -1] for d in data],
+        offsets,
+        spec,
+    )
+    if len(boxes) == 0:
+        return empty_detection_columns()
+    sx, sy = image.scale
+    return _columns_from_arrays(boxes * np.array([sx, sy, sx, sy]), scores, classes, results[0].names)
+
+
+# Global instance
+_inference_batcher: Optional[InferenceBatcher] = None
+
+
+def get_inference_batcher() -> InferenceBatcher:
+    """Get the global micro-batching scheduler"""
+    global _inference_batcher
+    if _inference_batcher is None:
+        _inference_batcher = InferenceBatcher(detect_batch, execute=get_inference_executor().run)
+    return _inference_batcher
@@ -0,0 +1,349 @@
+"""
+YOLO-E Model Registry
+
+Process-wide cache of loaded YOLO-E models keyed by (weights path, device, variant):
+1. Each model is loaded once and shared by every request in the process
+2. LRU eviction keeps the resident set under a configurable memory budget
+3. Reference counting keeps a model alive while requests are using it
+
+Author: Anurag Atulya — EYE for Humanity
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_WEIGHTS_DIR = "/app/storage/weights/yolo_e/base"
+TRAINED_WEIGHTS_DIR = "/app/storage/weights/yolo_e/trained"
+
+ModelKey = Tuple[str, str, str]
+
+
+@dataclass
+class ModelRegistryConfig:
+    """Model registry configuration"""
+    memory_budget_mb: float = float(os.getenv("EYE_YOLO_E_MODEL_BUDGET_MB", "4096"))
+    max_models: int = int(os.getenv("EYE_YOLO_E_MAX_MODELS", "8"))
+
+
+@dataclass
+class LoadedModel:
+    """A model resident in the registry"""
+    model_path: str
+    device: str
+    model: Any
+    size_bytes: int
+    load_time: float
+    variant: str = ""
+    fingerprint: str = ""
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    refcount: int = 0
+    hits: int = 0
+    # ultralytics predictors are not thread-safe; one forward pass at a time per instance
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def key(self) -> ModelKey:
+        return (self.model_path, self.device, self.variant)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model_path": self.model_path,
+            "model_name": os.path.basename(self.model_path),
+            "device": self.device,
+            "variant": self.variant,
+            "size_mb": round(self.size_bytes / (1024 * 1024), 2),
+            "load_time": round(self.load_time, 3),
+            "loaded_at": self.loaded_at,
+            "last_used": self.last_used,
+            "in_use": self.refcount,
+            "hits": self.hits,
+        }
+
+
+def resolve_device(use_gpu: bool) -> str:
+    """Map the API's use_gpu flag to an ultralytics device string"""
+    return "cuda" if use_gpu else "cpu"
+
+
+def resolve_base_model_path(model_path: str) -> str:
+    """Resolve a base model file name to its location in the weights store"""
+    return os.path.join(BASE_WEIGHTS_DIR, model_path)
+
+
+def model_fingerprint(model_path: str) -> str:
+    """Identify a weights file version by path, size and mtime"""
+    try:
+        stat = os.stat(model_path)
+        return f"{model_path}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return model_path
+
+
+def load_yolo_model(model_path: str) -> Any:
+    """Load YOLO weights with ultralytics"""
+    # Disable GUI dependencies for OpenCV before ultralytics imports it
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    os.environ['DISPLAY'] = ':99'
+    os.environ['OPENCV_VIDEOIO_PRIORITY_MSMF'] = '0'
+
+    from ultralytics import YOLO
+
+    return YOLO(model_path)
+
+
+def _estimate_model_bytes(model: Any, model_path: str) -> int:
+    """Estimate resident size from parameters and buffers, falling back to file size"""
+    try:
+        module = getattr(model, "model", None)
+        tensors = list(module.parameters()) + list(module.buffers())
+        size = sum(t.numel() * t.element_size() for t in tensors)
+        if size > 0:
+            return int(size)
+    except Exception:
+        pass
+    try:
+        return os.path.getsize(model_path)
+    except OSError:
+        return 0
+
+
+class ModelRegistry:
+    """
+    Thread-safe LRU registry of loaded YOLO-E models
+
+    Models are acquired for the duration of a request and released afterwards.
+    Only models with no active users are eligible for eviction.
+    """
+
+    def __init__(self, config: Optional[ModelRegistryConfig] = None, loader=None):
+        self.config = config or ModelRegistryConfig()
+        self._loader = loader or load_yolo_model
+        self._models: "OrderedDict[ModelKey, LoadedModel]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Per-key load lock and the number of callers holding or waiting on it;
+        # removed when the last one is done so the dict only holds loads in progress
+        self._load_locks: Dict[ModelKey, List[Any]] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def budget_bytes(self) -> int:
+        return int(self.config.memory_budget_mb * 1024 * 1024)
+
+    @property
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._models.values())
+
+    def acquire(
+        self,
+        model_path: str,
+        device: str = "cpu",
+        variant: str = "",
+        setup: Optional[Callable[[Any], None]] = None,
+        load: Optional[Callable[[], Any]] = None,
+    ) -> LoadedModel:
+        """
+        Get a loaded model, loading it on first use, and pin it until released
+
+        Args:
+            model_path: Absolute path to the model weights
+            device: Device the model will run on
+            variant: Distinguishes separately configured copies of the same
+                weights (e.g. a custom text vocabulary)
+            setup: Called once on a freshly loaded model before it is shared
+            load: Builds the model instead of reading model_path (e.g. by
+                cloning an already resident entry)
+
+        Returns:
+            The registry entry holding the model
+        """
+        key = (model_path, device, variant)
+        fingerprint = model_fingerprint(model_path)
+        with self._lock:
+            self._drop_stale(model_path, fingerprint)
+            entry = self._pin(key)
+            if entry is not None:
+                return entry
+            slot = self._load_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+
+        # Load outside the registry lock so other models stay available;
+        # the per-key lock makes concurrent requests for the same model wait
+        # for a single load instead of each reading the weights.
+        try:
+            with slot[0]:
+                return self._load(key, fingerprint, setup, load)
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0 and self._load_locks.get(key) is slot:
+                    del self._load_locks[key]
+
+    def _load(
+        self,
+        key: ModelKey,
+        fingerprint: str,
+        setup: Optional[Callable[[Any], None]],
+        load: Optional[Callable[[], Any]],
+    ) -> LoadedModel:
+        """Load and register a model; the caller holds the key's load lock"""
+        model_path, device, variant = key
+        with self._lock:
+            entry = self._pin(key)
+            if entry is not None:
+                return entry
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+
+        logger.info(f"Loading YOLO-E model {model_path} on {device}")
+        start_time = time.time()
+        model = load() if load is not None else self._loader(model_path)
+        if setup is not None:
+            setup(model)
+        load_time = time.time() - start_time
+
+        entry = LoadedModel(
+            model_path=model_path,
+            device=device,
+            model=model,
+            size_bytes=_estimate_model_bytes(model, model_path),
+            load_time=load_time,
+            variant=variant,
+            fingerprint=fingerprint,
+            refcount=1,
+        )
+        with self._lock:
+            self._models[key] = entry
+            self.loads += 1
+            self._evict_if_needed()
+        logger.info(f"Loaded YOLO-E model {model_path} in {load_time:.2f}s")
+        return entry
+
+    def release(self, entry: LoadedModel) -> None:
+        """Unpin a model acquired with acquire()"""
+        with self._lock:
+            entry.refcount = max(0, entry.refcount - 1)
+            entry.last_used = time.time()
+            self._evict_if_needed()
+
+    @contextmanager
+    def use(
+        self,
+        model_path: str,
+        device: str = "cpu",
+        variant: str = "",
+        setup: Optional[Callable[[Any], None]] = None,
+        load: Optional[Callable[[], Any]] = None,
+    ) -> Iterator[LoadedModel]:
+        """Context manager that acquires a model and releases it on exit"""
+        entry = self.acquire(model_path, device, variant, setup, load)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    def warm(self, model_path: str, device: str = "cpu") -> LoadedModel:
+        """Load a model into the registry without keeping it pinned"""
+        entry = self.acquire(model_path, device)
+        self.release(entry)
+        return entry
+
+    def unload(self, model_path: str, device: Optional[str] = None) -> int:
+        """
+        Drop idle models for a weights path, optionally limited to one device
+
+        Returns:
+            Number of entries removed
+        """
+        removed = 0
+        with self._lock:
+            for key, entry in list(self._models.items()):
+                if entry.model_path != model_path or (device and entry.device != device):
+                    continue
+                if entry.refcount > 0:
+                    continue
+                del self._models[key]
+                removed += 1
+        return removed
+
+    def is_loaded(self, model_path: str, device: str = "cpu", variant: str = "") -> bool:
+        with self._lock:
+            return (model_path, device, variant) in self._models
+
+    def list_loaded(self) -> List[Dict[str, Any]]:
+        """List resident models, most recently used first"""
+        with self._lock:
+            return [entry.to_dict() for entry in reversed(self._models.values())]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded_models": len(self._models),
+                "resident_mb": round(self.resident_bytes / (1024 * 1024), 2),
+                "budget_mb": self.config.memory_budget_mb,
+                "max_models": self.config.max_models,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    def _drop_stale(self, model_path: str, fingerprint: str) -> None:
+        """Forget entries whose weights file changed on disk (e.g. retrained models)"""
+        for key, entry in list(self._models.items()):
+            if entry.model_path == model_path and entry.fingerprint != fingerprint:
+                # In-flight users keep their reference; the next acquire reloads
+                del self._models[key]
+                logger.info(f"Weights changed on disk, dropping {model_path} ({entry.device}) from registry")
+
+    def _pin(self, key: ModelKey) -> Optional[LoadedModel]:
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        entry.refcount += 1
+        entry.hits += 1
+        entry.last_used = time.time()
+        self._models.move_to_end(key)
+        return entry
+
+    def _over_budget(self) -> bool:
+        return (
+            self.resident_bytes > self.budget_bytes
+            or len(self._models) > self.config.max_models
+        )
+
+    def _evict_if_needed(self) -> None:
+        """Evict least recently used idle models until back under budget"""
+        for key in list(self._models.keys()):
+            if not self._over_budget():
+                return
+            entry = self._models[key]
+            if entry.refcount > 0:
+                continue
+            del self._models[key]
+            self.evictions += 1
+            logger.info(f"Evicted YOLO-E model {entry.model_path} ({entry.device}) from registry")
+
+
+# Global instance
+_model_registry: Optional[ModelRegistry] = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get the global model registry instance"""
+    global _model_registry
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                _model_registry = ModelRegistry()
+    return _model_registry
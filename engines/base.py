@@ -1,8 +1,35 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Union
+import os
+import tempfile
+
+import numpy as np
+
+# An engine input: image file path, encoded image bytes, or an RGB HWC uint8 array
+EngineInput = Union[str, bytes, np.ndarray]
+
+
+@dataclass(frozen=True)
+class EngineCapabilities:
+    """What an engine can do natively, so callers can batch without special-casing it"""
+    max_batch_size: int = 1
+    supports_arrays: bool = False  # decoded arrays and bytes are used without a file round-trip
+    preferred_input_size: Optional[int] = None  # square model input, if any
+
+
+def describe_input(item: EngineInput) -> str:
+    """Printable label for an engine input"""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, np.ndarray):
+        return f"<array {'x'.join(str(d) for d in item.shape)}>"
+    return f"<bytes {len(item)}>"
+
 
 class EngineNode(ABC):
     name: str = "base"
+    capabilities: EngineCapabilities = EngineCapabilities()
 
     @abstractmethod
     def load(self, weights_path: str) -> None:
@@ -11,3 +38,43 @@ class EngineNode(ABC):
     @abstractmethod
     def infer(self, input_path: str) -> Dict[str, Any]:
         ...
+
+    def infer_batch(self, inputs: Sequence[EngineInput], **kwargs) -> List[Dict[str, Any]]:
+        """
+        Run inference on a batch of paths, encoded bytes or RGB arrays
+
+        The default loops over infer(); engines that can batch or take
+        arrays override this and advertise it in capabilities. Bytes and
+        arrays are written to a temporary file for engines that only read
+        paths.
+
+        Returns:
+            One result per input, in order; a failed input gets an "error"
+            entry instead of raising
+        """
+        results = []
+        for item in inputs:
+            try:
+                if isinstance(item, str):
+                    result = self.infer(item)
+                else:
+                    result = self._infer_via_file(item)
+            except Exception as e:
+                result = {"input": describe_input(item), "detections": [], "error": str(e)}
+            results.append(result)
+        return results
+
+    def _infer_via_file(self, item: Union[bytes, np.ndarray]) -> Dict[str, Any]:
+        suffix = ".png" if isinstance(item, np.ndarray) else ".img"
+        fd, path = tempfile.mkstemp(prefix="eye-engine-", suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if isinstance(item, np.ndarray):
+                    from PIL import Image
+                    Image.fromarray(item).save(f, format="PNG")
+                else:
+                    f.write(item)
+            result = self.infer(path)
+        finally:
+            os.remove(path)
+        return {**result, "input": describe_input(item)}
@@ -0,0 +1,221 @@
+"""
+Streaming output and checkpointing for long batch runs
+Results are written incrementally (JSONL, or Parquet when pyarrow is
+installed) and completed images are recorded in a checkpoint so that a
+rerun skips them. Images that fail get an error row but are not recorded,
+so a rerun tries them again (readers keep the last row per image).
+"""
+import os
+import json
+import time
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+MANIFEST_FILE = "manifest.json"
+DONE_FILE = "checkpoint.done"
+
+
+def path_digest(path: str) -> int:
+    """Stable 64-bit key for an image path"""
+    return int.from_bytes(hashlib.blake2b(path.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class Checkpoint:
+    """
+    Set of completed images, kept as a sorted uint64 array of path digests
+    (8 bytes per image) and backed by an append-only file
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.done_path = os.path.join(output_dir, DONE_FILE)
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+        self._done = np.zeros(0, dtype=np.uint64)
+        if os.path.exists(self.done_path):
+            self._done = np.unique(np.fromfile(self.done_path, dtype=np.uint64))
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def is_done(self, path: str) -> bool:
+        if len(self._done) == 0:
+            return False
+        digest = np.uint64(path_digest(path))
+        index = np.searchsorted(self._done, digest)
+        return bool(index < len(self._done) and self._done[index] == digest)
+
+    def mark_done(self, paths: Iterable[str]) -> None:
+        """Record images whose results are already durable in the output"""
+        digests = np.fromiter((path_digest(p) for p in paths), dtype=np.uint64)
+        if digests.size == 0:
+            return
+        with open(self.done_path, "ab") as f:
+            digests.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Atomically replace the run manifest"""
+        manifest = {**manifest, "updated_at": time.time()}
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+class ResultWriter:
+    """
+    Incremental per-image result writer
+
+    JSONL appends one line per image and is durable after each flush.
+    Parquet writes numbered part files; a part is only durable once it is
+    closed, so the images in it are reported by flush() only then. Rows
+    with an error are written but never reported as durable, so they are
+    not checkpointed.
+
+    On resume, output written after the last committed state (a partial
+    JSONL tail or an unclosed Parquet part) is discarded.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        output_format: str = "auto",
+        rows_per_part: int = 10000,
+        committed: Optional[Dict[str, Any]] = None,
+    ):
+        if output_format == "auto":
+            output_format = "parquet" if pq is not None else "jsonl"
+        if output_format == "parquet" and pq is None:
+            raise RuntimeError("Parquet output requires pyarrow")
+        if output_format not in ("jsonl", "parquet"):
+            raise ValueError("output_format must be auto, jsonl or parquet")
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.rows_per_part = rows_per_part
+        self.files: List[str] = []
+        self._jsonl = None
+        self._writer = None
+        self._part_path: Optional[str] = None  # open Parquet part, not yet durable
+        self._part_rows = 0
+        self._pending: List[str] = []
+        self._jsonl_offset = 0
+        os.makedirs(output_dir, exist_ok=True)
+        self._restore(committed or {})
+
+    def _restore(self, committed: Dict[str, Any]) -> None:
+        jsonl_path = os.path.join(self.output_dir, "results.jsonl")
+        if self.output_format == "jsonl":
+            self._jsonl_offset = committed.get("jsonl_offset", 0)
+            if os.path.exists(jsonl_path):
+                with open(jsonl_path, "r+b") as f:
+                    f.truncate(self._jsonl_offset)
+                if self._jsonl_offset:
+                    self.files.append(jsonl_path)
+            return
+        keep = set(committed.get("files", []))
+        for name in sorted(os.listdir(self.output_dir)):
+            path = os.path.join(self.output_dir, name)
+            if name.startswith("results-") and name.endswith(".parquet"):
+                if path in keep:
+                    self.files.append(path)
+                else:
+                    os.remove(path)
+
+    def state(self) -> Dict[str, Any]:
+        """Committed output state, stored in the manifest"""
+        files = [f for f in self.files if f != self._part_path]
+        return {"output_format": self.output_format, "files": files, "jsonl_offset": self._jsonl_offset}
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        if self.output_format == "jsonl":
+            if self._jsonl is None:
+                path = os.path.join(self.output_dir, "results.jsonl")
+                self._jsonl = open(path, "a")
+                if path not in self.files:
+                    self.files.append(path)
+            for row in rows:
+                self._jsonl.write(json.dumps(row) + "\n")
+        else:
+            if self._writer is None:
+                self._part_path = self._next_part_path()
+                self._writer = pq.ParquetWriter(self._part_path, _parquet_schema())
+                self.files.append(self._part_path)
+            self._writer.write_table(pa.Table.from_pylist([_parquet_row(r) for r in rows], schema=_parquet_schema()))
+            self._part_rows += len(rows)
+        self._pending.extend(row["image_path"] for row in rows if not row.get("error"))
+
+    def flush(self, force: bool = False) -> List[str]:
+        """
+        Make written rows durable where possible
+
+        Returns:
+            Paths of successfully processed images whose results are now
+            safely on disk
+        """
+        if self.output_format == "jsonl":
+            if self._jsonl is not None:
+                self._jsonl.flush()
+                os.fsync(self._jsonl.fileno())
+                self._jsonl_offset = self._jsonl.tell()
+        elif self._writer is not None and (force or self._part_rows >= self.rows_per_part):
+            self._writer.close()
+            self._writer = None
+            self._part_path = None
+            self._part_rows = 0
+        else:
+            return []
+        durable, self._pending = self._pending, []
+        return durable
+
+    def close(self) -> List[str]:
+        durable = self.flush(force=True)
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+        return durable
+
+    def _next_part_path(self) -> str:
+        existing = [name for name in os.listdir(self.output_dir) if name.startswith("results-") and name.endswith(".parquet")]
+        return os.path.join(self.output_dir, f"results-{len(existing):05d}.parquet")
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("image_path", pa.string()),
+        ("class_ids", pa.list_(pa.int32())),
+        ("class_names", pa.list_(pa.string())),
+        ("confidences", pa.list_(pa.float32())),
+        ("boxes", pa.list_(pa.list_(pa.float32()))),
+        ("error", pa.string()),
+    ])
+
+
+def _parquet_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    detections = row.get("detections") or []
+    return {
+        "image_path": row["image_path"],
+        "class_ids": [d["class_id"] for d in detections],
+        "class_names": [d["class_name"] for d in detections],
+        "confidences": [d["confidence"] for d in detections],
+        "boxes": [d["bbox"] for d in detections],
+        "error": row.get("error"),
+    }
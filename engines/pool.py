@@ -0,0 +1,489 @@
+"""
+Multi-process engine pool
+Runs one engine in N worker processes, each with the model loaded once.
+Image arrays and encoded bytes reach the workers through a per-worker
+shared-memory slot instead of being pickled; results come back on a
+per-worker pipe, so a worker that dies mid-send cannot block the others
+(a shared multiprocessing.Queue would stay write-locked). Workers are
+checked for liveness on a fixed timer; a crashed worker's batch is retried
+once and the worker is restarted with exponential backoff. A worker that
+keeps failing (e.g. its model does not load) is given up after
+max_restarts, and the pool reports itself degraded.
+"""
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from dataclasses import dataclass
+from multiprocessing import connection, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .base import EngineInput, EngineNode, describe_input
+
+logger = logging.getLogger(__name__)
+
+SLOT_ALIGN = 64
+MAX_ATTEMPTS = 2
+RESTART_DELAY = 1.0  # first restart delay, doubled per consecutive failure
+MAX_RESTART_DELAY = 60.0
+LIVENESS_INTERVAL = 0.5  # seconds between worker liveness checks
+NO_WORKERS = (-2, -2)  # idle-queue marker: every worker has been given up
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised for a batch whose worker died (after the retry)"""
+
+
+class NoWorkersAvailable(RuntimeError):
+    """Raised when every worker has exceeded its restart limit"""
+
+
+def _pack(inputs: Sequence[EngineInput], buf) -> List[tuple]:
+    """
+    Copy arrays and bytes into a shared-memory buffer
+
+    Returns small descriptors to send instead of the data. Paths are sent
+    as-is; items that do not fit in the slot are sent inline (pickled).
+    """
+    items, offset = [], 0
+    for item in inputs:
+        if isinstance(item, str):
+            items.append(("path", item))
+            continue
+        data = item if isinstance(item, np.ndarray) else np.frombuffer(item, dtype=np.uint8)
+        if offset + data.nbytes > len(buf):
+            items.append(("inline", item))
+            continue
+        np.ndarray(data.shape, dtype=data.dtype, buffer=buf, offset=offset)[...] = data
+        kind = "array" if isinstance(item, np.ndarray) else "bytes"
+        items.append((kind, offset, data.shape, data.dtype.str))
+        offset += -(-data.nbytes // SLOT_ALIGN) * SLOT_ALIGN
+    return items
+
+
+def _unpack(items: List[tuple], buf) -> List[EngineInput]:
+    """Rebuild inputs from descriptors; arrays are views into the slot"""
+    inputs = []
+    for item in items:
+        kind = item[0]
+        if kind in ("path", "inline"):
+            inputs.append(item[1])
+        elif kind == "array":
+            _, offset, shape, dtype = item
+            inputs.append(np.ndarray(shape, dtype=np.dtype(dtype), buffer=buf, offset=offset))
+        else:
+            _, offset, shape, _ = item
+            inputs.append(bytes(buf[offset:offset + shape[0]]))
+    return inputs
+
+
+def _worker_main(index: int, generation: int, factory: Callable[[], EngineNode], weights_path: str,
+                 threads: int, cpus: Optional[List[int]], shm_name: str, requests, results) -> None:
+    """Worker process: pin threads, load the engine once, then serve batches"""
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        engine = factory()
+        engine.load(weights_path)
+    except Exception as e:
+        results.send(("failed", index, generation, None, str(e)))
+        shm.close()
+        return
+    results.send(("ready", index, generation, None, None))
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        task_id, items, kwargs = message
+        inputs = _unpack(items, shm.buf)
+        try:
+            results.send(("done", index, generation, task_id, engine.infer_batch(inputs, **kwargs)))
+        except Exception as e:
+            results.send(("error", index, generation, task_id, str(e)))
+        # Views into the slot must be released before it is reused or closed
+        del inputs
+    shm.close()
+
+
+@dataclass
+class _Task:
+    id: int
+    inputs: List[EngineInput]
+    kwargs: Dict[str, Any]
+    future: Future
+    attempts: int = 0
+
+
+class _Worker:
+    def __init__(self, index: int, cpus: Optional[List[int]], slot_bytes: int):
+        self.index = index
+        self.cpus = cpus
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_bytes)
+        self.process = None
+        self.requests = None
+        self.results = None  # read end of this worker's result pipe
+        self.generation = 0
+        self.task: Optional[_Task] = None
+        self.ready = False
+        self.started_at = 0.0
+        self.restarts = 0
+        self.batches = 0
+        self.failures = 0  # consecutive exits without a successful load
+        self.restart_at: Optional[float] = None
+        self.gave_up = False
+        self.last_error: Optional[str] = None
+
+
+class EnginePool:
+    """
+    Pool of worker processes running the same engine
+
+    Args:
+        factory: Picklable callable returning an unloaded EngineNode (e.g.
+            the node class, or functools.partial(YOLOENode, config))
+        weights_path: Passed to load() in every worker
+        num_workers: Worker processes (default: one per 4 available CPUs)
+        threads_per_worker: torch/BLAS threads per worker (default: CPUs / workers)
+        pin_cpus: Give each worker its own contiguous set of CPUs
+        batch_size: Inputs per dispatched batch
+        slot_bytes: Shared-memory slot per worker; inputs that do not fit
+            are pickled instead
+        max_restarts: Consecutive failed restarts before a worker is given up
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], EngineNode],
+        weights_path: str,
+        num_workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        pin_cpus: bool = True,
+        batch_size: int = 16,
+        slot_bytes: int = 64 * 1024 * 1024,
+        start_timeout: float = 300.0,
+        max_restarts: int = 5,
+    ):
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.factory = factory
+        self.weights_path = weights_path
+        self.num_workers = num_workers or max(1, len(cpus) // 4)
+        self.threads_per_worker = threads_per_worker or max(1, len(cpus) // self.num_workers)
+        self.batch_size = batch_size
+        self.slot_bytes = slot_bytes
+        self.start_timeout = start_timeout
+        self.max_restarts = max_restarts
+
+        self._cpu_sets: List[Optional[List[int]]] = [None] * self.num_workers
+        if pin_cpus and len(cpus) >= self.num_workers:
+            per_worker = len(cpus) // self.num_workers
+            self._cpu_sets = [cpus[i * per_worker:(i + 1) * per_worker] for i in range(self.num_workers)]
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._tasks: "queue.Queue[Optional[_Task]]" = queue.Queue()
+        self._idle: "queue.Queue[tuple]" = queue.Queue()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._exhausted = False
+
+    def __enter__(self) -> "EnginePool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Start the workers and wait until every model is loaded"""
+        if self._running:
+            return
+        self._workers = [_Worker(i, self._cpu_sets[i], self.slot_bytes) for i in range(self.num_workers)]
+        for worker in self._workers:
+            self._spawn(worker)
+
+        deadline = time.time() + self.start_timeout
+        while not all(worker.ready for worker in self._workers):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self._shutdown()
+                raise RuntimeError("Engine pool workers did not become ready in time")
+            messages = self._receive(min(remaining, 1.0))
+            if not messages and any(not w.process.is_alive() and not w.ready for w in self._workers):
+                self._shutdown()
+                raise RuntimeError("Engine pool worker exited during start-up")
+            for kind, index, generation, _, error in messages:
+                if kind == "failed":
+                    self._shutdown()
+                    raise RuntimeError(f"Engine pool worker {index} failed to load: {error}")
+                if kind == "ready":
+                    self._mark_ready(self._workers[index], generation)
+
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name="engine-pool-dispatch", daemon=True),
+            threading.Thread(target=self._collect_loop, name="engine-pool-collect", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Engine pool started: {self.num_workers} workers x {self.threads_per_worker} threads")
+
+    def submit(self, inputs: Sequence[EngineInput], **kwargs) -> Future:
+        """Queue one batch; the future resolves to the engine's infer_batch output"""
+        if not self._running:
+            raise RuntimeError("Engine pool is not running")
+        if self._exhausted:
+            raise NoWorkersAvailable("Every engine pool worker has failed; the pool is degraded")
+        task = _Task(id=next(self._ids), inputs=list(inputs), kwargs=kwargs, future=Future())
+        self._tasks.put(task)
+        return task.future
+
+    def infer_batch(self, inputs: Sequence[EngineInput], **kwargs) -> List[Dict[str, Any]]:
+        """
+        Split inputs into batches across the workers and gather results in order
+
+        A batch that fails as a whole (e.g. its worker crashed twice) gets
+        an "error" entry for each of its inputs.
+        """
+        inputs = list(inputs)
+        batches = [inputs[i:i + self.batch_size] for i in range(0, len(inputs), self.batch_size)]
+        futures = [self.submit(batch, **kwargs) for batch in batches]
+        results = []
+        for batch, future in zip(batches, futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                results.extend({"input": describe_input(item), "detections": [], "error": str(e)} for item in batch)
+        return results
+
+    @property
+    def degraded(self) -> bool:
+        """True once any worker has been given up"""
+        return any(worker.gave_up for worker in self._workers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": [
+                    {
+                        "index": w.index,
+                        "pid": w.process.pid if w.process else None,
+                        "alive": bool(w.process and w.process.is_alive()),
+                        "busy": w.task is not None,
+                        "cpus": w.cpus,
+                        "restarts": w.restarts,
+                        "batches": w.batches,
+                        "gave_up": w.gave_up,
+                        "restart_at": w.restart_at,
+                        "last_error": w.last_error,
+                    }
+                    for w in self._workers
+                ],
+                "degraded": self.degraded,
+                "queued": self._tasks.qsize(),
+                "threads_per_worker": self.threads_per_worker,
+            }
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the workers; queued and in-flight batches fail"""
+        if not self._running:
+            return
+        self._running = False
+        self._tasks.put(None)
+        self._idle.put((-1, -1))
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._shutdown(timeout)
+
+    # Internals
+
+    def _spawn(self, worker: _Worker) -> None:
+        worker.generation += 1
+        worker.ready = False
+        worker.started_at = time.time()
+        worker.requests = self._ctx.Queue()
+        if worker.results is not None:
+            worker.results.close()
+        worker.results, writer = self._ctx.Pipe(duplex=False)
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, worker.generation, self.factory, self.weights_path, self.threads_per_worker,
+                  worker.cpus, worker.shm.name, worker.requests, writer),
+            name=f"engine-pool-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        # The child holds the only write end, so its exit reads as EOF
+        writer.close()
+
+    def _receive(self, timeout: float) -> List[tuple]:
+        """Messages from any worker, waiting up to timeout for the first"""
+        readers = {w.results: w for w in self._workers if w.results is not None}
+        messages = []
+        for reader in connection.wait(list(readers), timeout):
+            try:
+                messages.append(reader.recv())
+            except (EOFError, OSError):
+                # The worker exited; the liveness check restarts it
+                reader.close()
+                readers[reader].results = None
+        return messages
+
+    def _mark_ready(self, worker: _Worker, generation: int) -> None:
+        if generation == worker.generation:
+            worker.ready = True
+            worker.failures = 0
+            self._idle.put((worker.index, generation))
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            while True:
+                index, generation = self._idle.get()
+                if (index, generation) == NO_WORKERS:
+                    # Left in place so every later task fails the same way
+                    self._idle.put(NO_WORKERS)
+                    task.future.set_exception(NoWorkersAvailable("Every engine pool worker has failed"))
+                    break
+                if index < 0:
+                    task.future.set_exception(RuntimeError("Engine pool closed"))
+                    return
+                with self._lock:
+                    worker = self._workers[index]
+                    if generation != worker.generation or worker.task is not None or not worker.ready:
+                        continue  # stale entry from a dead or restarted worker
+                    task.attempts += 1
+                    worker.task = task
+                    try:
+                        items = _pack(task.inputs, worker.shm.buf)
+                        worker.requests.put((task.id, items, task.kwargs))
+                    except Exception as e:
+                        worker.task = None
+                        self._idle.put((index, generation))
+                        task.future.set_exception(e)
+                    break
+
+    def _collect_loop(self) -> None:
+        next_check = time.time() + LIVENESS_INTERVAL
+        while self._running:
+            # Liveness runs on its own timer: a steady stream of results
+            # from healthy workers must not hide a dead one
+            if time.time() >= next_check:
+                self._check_workers()
+                next_check = time.time() + LIVENESS_INTERVAL
+            for message in self._receive(max(0.0, next_check - time.time())):
+                self._handle_result(*message)
+
+    def _handle_result(self, kind: str, index: int, generation: int, task_id: Optional[int], payload: Any) -> None:
+        with self._lock:
+            worker = self._workers[index]
+            if generation != worker.generation:
+                return
+            if kind == "ready":
+                self._mark_ready(worker, generation)
+                return
+            if kind == "failed":
+                # The worker exits next; _check_workers schedules the restart
+                worker.last_error = payload
+                logger.error(f"Engine pool worker {index} failed to reload: {payload}")
+                return
+            task, worker.task = worker.task, None
+            worker.batches += 1
+            self._idle.put((index, generation))
+        if task is None or task.id != task_id:
+            return
+        if kind == "done":
+            task.future.set_result(payload)
+        else:
+            task.future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self) -> None:
+        """Handle dead workers and start the restarts that are due"""
+        now = time.time()
+        with self._lock:
+            for worker in self._workers:
+                if worker.gave_up or worker.process is None:
+                    continue
+                if worker.restart_at is None:
+                    if worker.process.is_alive():
+                        continue
+                    self._on_exit(worker, now)
+                if worker.restart_at is not None and now >= worker.restart_at:
+                    worker.restart_at = None
+                    worker.restarts += 1
+                    self._spawn(worker)
+            if self._workers and not self._exhausted and all(w.gave_up for w in self._workers):
+                self._exhausted = True
+                logger.error("Every engine pool worker has been given up; the pool is degraded")
+                self._idle.put(NO_WORKERS)
+
+    def _on_exit(self, worker: _Worker, now: float) -> None:
+        """Fail or retry the dead worker's batch and schedule its restart"""
+        task, worker.task = worker.task, None
+        worker.ready = False
+        worker.failures += 1
+        exitcode = worker.process.exitcode
+        if task is not None and not task.future.done():
+            if task.attempts < MAX_ATTEMPTS:
+                self._tasks.put(task)
+            else:
+                task.future.set_exception(WorkerCrashed(f"Worker {worker.index} crashed while running this batch"))
+
+        if worker.failures > self.max_restarts:
+            worker.gave_up = True
+            logger.error(
+                f"Engine pool worker {worker.index} exited with code {exitcode} after "
+                f"{worker.failures} consecutive failures; giving up on it"
+            )
+            return
+        delay = min(RESTART_DELAY * 2 ** (worker.failures - 1), MAX_RESTART_DELAY)
+        worker.restart_at = now + delay
+        logger.warning(f"Engine pool worker {worker.index} exited with code {exitcode}; restarting in {delay:.1f}s")
+
+    def _shutdown(self, timeout: float = 10.0) -> None:
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.requests.put(None)
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            if worker.task is not None and not worker.task.future.done():
+                worker.task.future.set_exception(RuntimeError("Engine pool closed"))
+                worker.task = None
+            if worker.results is not None:
+                worker.results.close()
+                worker.results = None
+            worker.shm.close()
+            worker.shm.unlink()
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None and not task.future.done():
+                task.future.set_exception(RuntimeError("Engine pool closed"))
+        self._workers = []
@@ -0,0 +1,70 @@
+"""
+Torch-free image decoding and letterboxing
+Safe to run in spawned worker processes: imports only PIL and numpy
+"""
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+PAD_VALUE = 114
+EXIF_ORIENTATION = 0x0112
+
+
+def decode_letterboxed(path: str, size: int) -> Tuple[np.ndarray, float, Tuple[int, int], int, int]:
+    """
+    Decode an image file straight into a size x size letterboxed RGB array
+
+    Large JPEGs are decoded at reduced scale (draft mode) when that still
+    leaves at least the target resolution.
+
+    Returns:
+        HWC uint8 array, resize ratio, (left, top) padding and the original
+        (EXIF-oriented) width and height
+    """
+    with Image.open(path) as image:
+        width, height = image.size
+        if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+        ratio = min(size / width, size / height)
+        new_width, new_height = max(1, round(width * ratio)), max(1, round(height * ratio))
+
+        if image.format == "JPEG" and ratio < 0.5:
+            image.draft("RGB", (int(image.size[0] * ratio), int(image.size[1] * ratio)))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        if image.size != (new_width, new_height):
+            image = image.resize((new_width, new_height), Image.BILINEAR)
+
+        left, top = (size - new_width) // 2, (size - new_height) // 2
+        canvas = Image.new("RGB", (size, size), (PAD_VALUE, PAD_VALUE, PAD_VALUE))
+        canvas.paste(image, (left, top))
+        return np.asarray(canvas), ratio, (left, top), width, height
+
+
+def load_letterboxed_batch(paths: List[str], size: int) -> Dict[str, Any]:
+    """
+    Decode and letterbox a batch of images (runs in a worker process)
+
+    Returns:
+        batch: (N, size, size, 3) uint8 array or None if nothing decoded
+        metas: (path, ratio, pad, width, height) per decoded image
+        errors: path -> message for images that failed to decode
+        decode: seconds spent
+    """
+    start = time.time()
+    arrays, metas, errors = [], [], {}
+    for path in paths:
+        try:
+            array, ratio, pad, width, height = decode_letterboxed(path, size)
+        except Exception as e:
+            errors[path] = str(e)
+            continue
+        arrays.append(array)
+        metas.append((path, ratio, pad, width, height))
+    return {
+        "batch": np.stack(arrays) if arrays else None,
+        "metas": metas,
+        "errors": errors,
+        "decode": time.time() - start,
+    }
@@ -0,0 +1,165 @@
+"""
+Incremental image discovery
+Lazy os.scandir walk with hash sharding and an optional on-disk index of
+(path, size, mtime) so rescans only return new or changed files
+"""
+import os
+import sqlite3
+import hashlib
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'})
+
+
+@dataclass
+class ScanEntry:
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def shard_of(relative_path: str, num_shards: int) -> int:
+    """Stable shard for a path relative to the scan root"""
+    digest = hashlib.blake2b(relative_path.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % num_shards
+
+
+def walk_images(
+    root: str,
+    extensions: Iterable[str] = IMAGE_EXTENSIONS,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    follow_symlinks: bool = False,
+) -> Iterator[os.DirEntry]:
+    """
+    Yield image directory entries under root as they are found
+
+    Directories are walked depth-first with entries in name order, so the
+    output order is deterministic without collecting and sorting the tree.
+    With num_shards > 1 only entries whose relative path hashes to
+    shard_index are yielded, so workers can split one tree without
+    coordinating.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError("shard_index must be in [0, num_shards)")
+    extensions = frozenset(e.lower() for e in extensions)
+    root = os.path.abspath(root)
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    subdirs.append(entry.path)
+                    continue
+                if not entry.is_file(follow_symlinks=follow_symlinks):
+                    continue
+            except OSError:
+                continue
+            if os.path.splitext(entry.name)[1].lower() not in extensions:
+                continue
+            if num_shards > 1 and shard_of(os.path.relpath(entry.path, root), num_shards) != shard_index:
+                continue
+            yield entry
+        # Reversed so the stack pops subdirectories in name order
+        stack.extend(reversed(subdirs))
+
+
+def iter_image_paths(root: str, **kwargs) -> Iterator[str]:
+    """Lazily yield image paths under root (see walk_images for options)"""
+    for entry in walk_images(root, **kwargs):
+        yield entry.path
+
+
+class ScanIndex:
+    """
+    SQLite index of files seen by earlier scans
+
+    A scan records every file it yields. Changes are committed only when
+    the scan has been fully consumed, so an interrupted scan and its
+    consumer see the same files again on the next run. Files missing from
+    a completed full scan are pruned. Use one index file per shard.
+    """
+
+    def __init__(self, index_path: str):
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.index_path = index_path
+        self.conn = sqlite3.connect(index_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, scan_id INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS scans (scan_id INTEGER PRIMARY KEY AUTOINCREMENT, root TEXT)")
+        self.conn.commit()
+
+    def scan(self, root: str, **kwargs) -> Iterator[ScanEntry]:
+        """
+        Yield only files that are new or whose size or mtime changed
+
+        Args:
+            root: Directory to scan
+            **kwargs: Passed to walk_images (extensions, sharding, symlinks)
+        """
+        cursor = self.conn.execute("INSERT INTO scans (root) VALUES (?)", (os.path.abspath(root),))
+        scan_id = cursor.lastrowid
+        for entry in walk_images(root, **kwargs):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            row = self.conn.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (entry.path,)).fetchone()
+            self.conn.execute(
+                "INSERT INTO files (path, size, mtime_ns, scan_id) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, scan_id = excluded.scan_id",
+                (entry.path, stat.st_size, stat.st_mtime_ns, scan_id),
+            )
+            if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+                yield ScanEntry(entry.path, stat.st_size, stat.st_mtime_ns)
+
+        # Only a full, unsharded scan knows which files disappeared
+        if kwargs.get("num_shards", 1) == 1:
+            prefix = os.path.join(os.path.abspath(root), "")
+            self.conn.execute(
+                "DELETE FROM files WHERE scan_id != ? AND substr(path, 1, ?) = ?",
+                (scan_id, len(prefix), prefix),
+            )
+        self.conn.commit()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def scan_images(
+    root: str,
+    index_path: Optional[str] = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
+) -> Iterator[str]:
+    """
+    Image paths under root, lazily
+
+    With index_path, only files that are new or changed since the last
+    completed scan are returned.
+    """
+    if not index_path:
+        yield from iter_image_paths(root, shard_index=shard_index, num_shards=num_shards)
+        return
+    index = ScanIndex(index_path)
+    try:
+        for entry in index.scan(root, shard_index=shard_index, num_shards=num_shards):
+            yield entry.path
+    finally:
+        index.close()
@@ -0,0 +1,166 @@
+"""
+Sliced (tiled) inference helpers
+Cuts high-resolution images into overlapping tiles and merges per-tile boxes
+back into full-image detections with NMS or weighted box fusion
+"""
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+TileBox = Tuple[int, int, int, int]  # x0, y0, x1, y1 in image pixels
+
+MERGE_METHODS = ("nms", "wbf")
+
+
+@dataclass(frozen=True)
+class TileSpec:
+    """How to slice an image and merge the results"""
+    tile_size: int = 640
+    overlap: float = 0.2
+    merge: str = "nms"  # "nms" or "wbf"
+    merge_iou: float = 0.5
+    include_full_image: bool = True  # extra downscaled pass for objects larger than a tile
+
+    def validate(self) -> None:
+        if self.tile_size < 32:
+            raise ValueError("tile_size must be at least 32")
+        if not 0.0 <= self.overlap < 1.0:
+            raise ValueError("tile overlap must be in [0, 1)")
+        if self.merge not in MERGE_METHODS:
+            raise ValueError(f"merge must be one of: {', '.join(MERGE_METHODS)}")
+
+    def cache_tag(self) -> str:
+        return f"tiled:{self.tile_size}:{self.overlap:.3f}:{self.merge}:{self.merge_iou:.3f}:{int(self.include_full_image)}"
+
+
+def _axis_starts(length: int, tile: int, stride: int) -> List[int]:
+    """Tile origins along one axis; the last tile is clamped to the edge"""
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(width: int, height: int, tile_size: int = 640, overlap: float = 0.2) -> List[TileBox]:
+    """
+    Overlapping tile boxes covering an image
+
+    All tiles are tile_size square unless the image is smaller than a tile
+    along an axis, so a batch of tiles shares one input shape.
+    """
+    stride = max(1, int(round(tile_size * (1.0 - overlap))))
+    return [
+        (x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+        for y0 in _axis_starts(height, tile_size, stride)
+        for x0 in _axis_starts(width, tile_size, stride)
+    ]
+
+
+def slice_tiles(image: np.ndarray, grid: List[TileBox]) -> List[np.ndarray]:
+    """Tiles as views into the decoded buffer (no pixel copies)"""
+    return [image[y0:y1, x0:x1] for x0, y0, x1, y1 in grid]
+
+
+def box_iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """IoU of one xyxy box against an (N, 4) array"""
+    x0 = np.maximum(box[0], boxes[:, 0])
+    y0 = np.maximum(box[1], boxes[:, 1])
+    x1 = np.minimum(box[2], boxes[:, 2])
+    y1 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def _class_offset(boxes: np.ndarray, classes: np.ndarray) -> np.ndarray:
+    """Shift each class into its own coordinate range so one pass is class-aware"""
+    span = float(boxes.max()) + 1.0 if len(boxes) else 0.0
+    return boxes + (classes.astype(np.float64) * span)[:, None]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Class-aware greedy NMS; returns kept indices, highest score first"""
+    shifted = _class_offset(boxes, classes)
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        if order.size == 1:
+            break
+        rest = order[1:]
+        order = rest[box_iou(shifted[best], shifted[rest]) <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def weighted_box_fusion(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    classes: np.ndarray,
+    iou_threshold: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Class-aware weighted box fusion
+
+    Overlapping boxes of a class are averaged with their scores as weights.
+    A fused box keeps the best member score: an object seen in only one
+    tile is not less certain than one seen in several.
+    """
+    shifted = _class_offset(boxes, classes)
+    order = np.argsort(-scores)
+    fused_boxes, fused_scores, fused_classes = [], [], []
+    while order.size:
+        best = order[0]
+        members = order[box_iou(shifted[best], shifted[order]) > iou_threshold]
+        members = np.union1d(members, [best])
+        weights = scores[members]
+        fused_boxes.append((boxes[members] * weights[:, None]).sum(axis=0) / weights.sum())
+        fused_scores.append(weights.max())
+        fused_classes.append(classes[best])
+        order = np.setdiff1d(order, members, assume_unique=True)
+        order = order[np.argsort(-scores[order])]
+    return (
+        np.asarray(fused_boxes, dtype=np.float64).reshape(-1, 4),
+        np.asarray(fused_scores, dtype=np.float64),
+        np.asarray(fused_classes, dtype=np.int64),
+    )
+
+
+def merge_tile_detections(
+    tile_boxes: List[np.ndarray],
+    tile_scores: List[np.ndarray],
+    tile_classes: List[np.ndarray],
+    offsets: List[Tuple[int, int]],
+    spec: TileSpec,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Map per-tile detections to image coordinates and merge duplicates
+
+    Args:
+        tile_boxes: (N_i, 4) xyxy boxes in tile coordinates, one array per tile
+        tile_scores: (N_i,) confidences
+        tile_classes: (N_i,) class ids
+        offsets: (x0, y0) origin of each tile in the image
+        spec: Merge method and IoU threshold
+
+    Returns:
+        boxes (N, 4), scores (N,), classes (N,) sorted by score
+    """
+    shifted = [
+        np.asarray(b, dtype=np.float64).reshape(-1, 4) + np.array([x0, y0, x0, y0], dtype=np.float64)
+        for b, (x0, y0) in zip(tile_boxes, offsets)
+    ]
+    boxes = np.concatenate(shifted) if shifted else np.zeros((0, 4))
+    scores = np.concatenate([np.asarray(s, dtype=np.float64).reshape(-1) for s in tile_scores]) if tile_scores else np.zeros(0)
+    classes = np.concatenate([np.asarray(c, dtype=np.int64).reshape(-1) for c in tile_classes]) if tile_classes else np.zeros(0, dtype=np.int64)
+    if len(boxes) == 0:
+        return boxes, scores, classes
+
+    if spec.merge == "wbf":
+        return weighted_box_fusion(boxes, scores, classes, spec.merge_iou)
+    keep = nms(boxes, scores, classes, spec.merge_iou)
+    return boxes[keep], scores[keep], classes[keep]
+
@@ -2,17 +2,24 @@
 YOLO-E Engine Node
 High-performance object detection with 4000+ base classes and few-shot learning capabilities
 """
+import io
 import os
-import json
+import time
 import logging
-from typing import Any, Dict, List, Optional, Union
-from pathlib import Path
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import torch
-import torchvision.transforms as transforms
-from PIL import Image
+import torch.nn.functional as F
+from PIL import Image, ImageOps
 import numpy as np
 
-from .base import EngineNode
+from .base import EngineCapabilities, EngineInput, EngineNode, describe_input
+from .batch_output import DONE_FILE, MANIFEST_FILE, Checkpoint, ResultWriter
+from .preprocess import load_letterboxed_batch
+from .scanner import scan_images
+from .tiling import TileSpec, merge_tile_detections, slice_tiles, tile_grid
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +47,17 @@ class YOLOENode(EngineNode):
         self.batch_size = self.config.get('batch_size', 8)
         self.confidence_threshold = self.config.get('confidence_threshold', 0.5)
         self.iou_threshold = self.config.get('iou_threshold', 0.45)
+        self.image_size = self.config.get('image_size', 640)
+        
+        # Decodes and letterboxes the next batch while the current one runs
+        self.prefetch_enabled = self.config.get('prefetch', True)
+        self._prefetch_pool: Optional[ThreadPoolExecutor] = None
+        
+        self.capabilities = EngineCapabilities(
+            max_batch_size=self.batch_size,
+            supports_arrays=True,
+            preferred_input_size=self.image_size
+        )
         
         logger.info(f"YOLO-E Node initialized on device: {self.device}")
     
@@ -54,8 +72,7 @@ class YOLOENode(EngineNode):
         try:
             logger.info(f"Loading YOLO-E model from: {weights_path}")
             
-            # Initialize YOLO-E model (placeholder for actual implementation)
-            # In real implementation, this would load the actual YOLO-E model
+            # Initialize YOLO-E model
             self.model = self._initialize_yolo_e_model(weights_path)
             
             # Load class mappings for 4000+ classes
@@ -77,7 +94,9 @@ class YOLOENode(EngineNode):
         
         Args:
             input_path: Single image path or list of image paths
-            **kwargs: Additional inference parameters
+            **kwargs: Additional inference parameters; tiled=True runs sliced
+                inference (tile_size, tile_overlap, tile_merge) on a single
+                high-resolution image
             
         Returns:
             Dictionary containing detection results
@@ -87,7 +106,9 @@ class YOLOENode(EngineNode):
         
         try:
             # Handle single image or batch processing
-            if isinstance(input_path, str):
+            if isinstance(input_path, str) and kwargs.get('tiled'):
+                return self._infer_tiled(input_path, **kwargs)
+            elif isinstance(input_path, str):
                 return self._infer_single(input_path, **kwargs)
             elif isinstance(input_path, list):
                 return self._infer_batch(input_path, **kwargs)
@@ -98,6 +119,29 @@ class YOLOENode(EngineNode):
             logger.error(f"Inference failed: {str(e)}")
             raise RuntimeError(f"Inference error: {str(e)}")
     
+    def infer_batch(self, inputs: List[EngineInput], **kwargs) -> List[Dict[str, Any]]:
+        """
+        Batched inference on image paths, encoded bytes or RGB arrays
+        
+        Bytes and arrays are decoded in memory; no temporary files are written.
+        
+        Returns:
+            One result per input, in order; inputs that fail to decode get an
+            "error" entry and no detections
+        """
+        if not self.loaded:
+            raise RuntimeError("Model not loaded. Call load() first.")
+        
+        inputs = list(inputs)
+        run = self._run_batches(inputs, **kwargs)
+        results = []
+        for index, item in enumerate(inputs):
+            result = {"input": describe_input(item), "detections": run["detections"][index]}
+            if index in run["errors"]:
+                result["error"] = run["errors"][index]
+            results.append(result)
+        return results
+    
     def train_few_shot(self, dataset_config: Dict[str, Any], **kwargs) -> Dict[str, Any]:
         """
         Train YOLO-E model with few-shot learning on custom dataset
@@ -133,60 +177,146 @@ class YOLOENode(EngineNode):
             raise RuntimeError(f"Training error: {str(e)}")
     
     def batch_process_images(self, image_directory: str, output_directory: str, 
-                           batch_size: int = 16) -> Dict[str, Any]:
+                           batch_size: int = 16, workers: Optional[int] = None,
+                           output_format: str = "auto", resume: bool = True,
+                           shard_index: int = 0, num_shards: int = 1) -> Dict[str, Any]:
         """
         Process large batches of images efficiently
         
+        Decoding and letterboxing are spread over a process pool. Only a small
+        window of batches is in flight, so memory use does not grow with the
+        directory size. Results are written as they complete. Completed images
+        are recorded in a checkpoint, so a rerun skips them; images that failed
+        to decode get an error row and are retried by the next run.
+        
         Args:
             image_directory: Directory containing images to process
-            output_directory: Directory to save results
+            output_directory: Directory to save results and the checkpoint
             batch_size: Number of images to process in each batch
+            workers: Decode processes (default: CPU count - 1)
+            output_format: "jsonl", "parquet" or "auto" (Parquet when pyarrow is installed)
+            resume: Skip images recorded in an existing checkpoint; False starts over
+            shard_index: This worker's shard when num_shards workers split the directory
+            num_shards: Number of workers sharing the directory (hash of relative path)
             
         Returns:
-            Processing statistics and results
+            Processing statistics and output file locations
         """
         try:
             logger.info(f"Starting batch processing of images in: {image_directory}")
+            start_time = time.time()
             
-            # Get all image files
-            image_paths = self._get_image_paths(image_directory)
-            total_images = len(image_paths)
+            os.makedirs(output_directory, exist_ok=True)
+            if not resume:
+                self._clear_batch_output(output_directory)
+            checkpoint = Checkpoint(output_directory)
+            manifest = checkpoint.load_manifest()
+            writer = ResultWriter(output_directory, output_format, committed=manifest.get("output"))
             
-            if total_images == 0:
-                return {"status": "no_images_found", "processed": 0}
+            counts = {"seen": 0, "skipped": 0}
+            # Failed images are retried on every run, so failures are counted per run
+            stats = {"processed": manifest.get("processed_images", 0), "failed": 0}
+            timings = {"decode": 0.0, "forward": 0.0, "postprocess": 0.0, "write": 0.0, "decode_wait": 0.0}
             
-            # Process in batches
-            processed_count = 0
-            results = []
+            def pending_paths() -> Iterator[str]:
+                for path in self._get_image_paths(image_directory, shard_index, num_shards):
+                    counts["seen"] += 1
+                    if checkpoint.is_done(path):
+                        counts["skipped"] += 1
+                        continue
+                    yield path
             
-            for i in range(0, total_images, batch_size):
-                batch_paths = image_paths[i:i + batch_size]
-                batch_results = self._infer_batch(batch_paths)
-                results.extend(batch_results.get('detections', []))
-                processed_count += len(batch_paths)
-                
-                # Save intermediate results
-                self._save_batch_results(batch_results, output_directory, i)
-                
-                logger.info(f"Processed batch {i//batch_size + 1}: {processed_count}/{total_images} images")
+            workers = workers or max(1, (os.cpu_count() or 2) - 1)
+            window = workers * 2
+            # spawn: decode workers import only PIL/numpy, never a forked torch runtime
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                in_flight = deque()
+                for batch_paths in self._chunked(pending_paths(), batch_size):
+                    in_flight.append(pool.submit(load_letterboxed_batch, batch_paths, self.image_size))
+                    if len(in_flight) >= window:
+                        self._process_prepared_batch(in_flight.popleft(), writer, checkpoint, manifest, stats, timings)
+                while in_flight:
+                    self._process_prepared_batch(in_flight.popleft(), writer, checkpoint, manifest, stats, timings)
             
-            # Save final results
+            durable = writer.close()
             final_results = {
-                "total_images": total_images,
-                "processed_images": processed_count,
-                "results": results,
-                "status": "completed"
+                **manifest,
+                "image_directory": image_directory,
+                "total_images": counts["seen"],
+                "skipped_images": counts["skipped"],
+                "processed_images": stats["processed"],
+                "failed_images": stats["failed"],
+                "output": writer.state(),
+                "status": "completed",
+                "processing_time": time.time() - start_time,
+                "timings": {stage: round(seconds, 4) for stage, seconds in timings.items()}
             }
+            checkpoint.write_manifest(final_results)
+            checkpoint.mark_done(durable)
             
-            self._save_final_results(final_results, output_directory)
-            
-            logger.info(f"Batch processing completed: {processed_count}/{total_images} images processed")
+            logger.info(f"Batch processing completed: {stats['processed']} images processed, {counts['skipped']} already done")
             return final_results
             
         except Exception as e:
             logger.error(f"Batch processing failed: {str(e)}")
             raise RuntimeError(f"Batch processing error: {str(e)}")
     
+    def _process_prepared_batch(self, future, writer: ResultWriter, checkpoint: Checkpoint,
+                                manifest: Dict[str, Any], stats: Dict[str, int],
+                                timings: Dict[str, float]) -> None:
+        """Run one decoded batch, write its rows and advance the checkpoint"""
+        wait_start = time.time()
+        prepared = future.result()
+        timings["decode_wait"] += time.time() - wait_start
+        timings["decode"] += prepared["decode"]
+        
+        rows = [{"image_path": path, "detections": [], "error": error} for path, error in prepared["errors"].items()]
+        if prepared["batch"] is not None:
+            start = time.time()
+            batch = torch.from_numpy(prepared["batch"]).permute(0, 3, 1, 2).float().div_(255.0)
+            results = self._forward(batch)
+            timings["forward"] += time.time() - start
+            
+            start = time.time()
+            for result, (path, ratio, pad, width, height) in zip(results, prepared["metas"]):
+                rows.append({"image_path": path, "detections": self._to_detections(*self._postprocess(result, ratio, pad, width, height))})
+            timings["postprocess"] += time.time() - start
+        
+        start = time.time()
+        writer.write(rows)
+        stats["processed"] += len(prepared["metas"])
+        stats["failed"] += len(prepared["errors"])
+        durable = writer.flush()
+        if durable:
+            # Manifest first: a crash before mark_done re-runs these images rather than losing them
+            manifest.update({
+                "processed_images": stats["processed"],
+                "failed_images": stats["failed"],
+                "output": writer.state(),
+                "status": "running"
+            })
+            checkpoint.write_manifest(manifest)
+            checkpoint.mark_done(durable)
+        timings["write"] += time.time() - start
+    
+    @staticmethod
+    def _chunked(paths: Iterable[str], size: int) -> Iterator[List[str]]:
+        chunk = []
+        for path in paths:
+            chunk.append(path)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def _clear_batch_output(self, output_dir: str) -> None:
+        """Remove the checkpoint and results of a previous run"""
+        for name in os.listdir(output_dir):
+            if name in (DONE_FILE, MANIFEST_FILE, "results.jsonl") or (name.startswith("results-") and name.endswith(".parquet")):
+                os.remove(os.path.join(output_dir, name))
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the loaded model"""
         return {
@@ -202,48 +332,260 @@ class YOLOENode(EngineNode):
         }
     
     def _initialize_yolo_e_model(self, weights_path: str):
-        """Initialize YOLO-E model (placeholder implementation)"""
-        # TODO: Implement actual YOLO-E model loading
-        # This would load the YOLO-E model architecture and weights
+        """Load YOLO-E weights with ultralytics"""
+        # Disable GUI dependencies for OpenCV before ultralytics imports it
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+        os.environ['OPENCV_VIDEOIO_PRIORITY_MSMF'] = '0'
+        
+        from ultralytics import YOLO
+        
         logger.info("Initializing YOLO-E model architecture")
-        return {"model": "yolo_e_placeholder", "weights": weights_path}
+        return YOLO(weights_path)
     
     def _load_class_mappings(self) -> Dict[int, str]:
-        """Load class mappings for 4000+ classes"""
-        # TODO: Load actual class mappings from YOLO-E model
-        # This would load the comprehensive class vocabulary
+        """Load class mappings from the model vocabulary"""
         logger.info("Loading YOLO-E class mappings")
+        names = getattr(self.model, 'names', None)
+        if names:
+            return dict(names) if isinstance(names, dict) else dict(enumerate(names))
         return {i: f"class_{i}" for i in range(self.max_classes)}
     
     def _initialize_preprocessor(self):
-        """Initialize image preprocessing pipeline"""
-        return transforms.Compose([
-            transforms.Resize((640, 640)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        ])
+        """Initialize image preprocessing pipeline (letterbox to a square model input)"""
+        return self._letterbox
+    
+    def _letterbox(self, image: np.ndarray) -> Tuple[torch.Tensor, float, Tuple[int, int]]:
+        """
+        Resize an RGB HWC array to fit image_size, keeping aspect ratio, and pad
+        
+        Returns:
+            CHW float tensor in [0, 1], resize ratio and (left, top) padding
+        """
+        height, width = image.shape[:2]
+        size = self.image_size
+        ratio = min(size / height, size / width)
+        new_height, new_width = max(1, int(round(height * ratio))), max(1, int(round(width * ratio)))
+        
+        # from_numpy keeps strided views (e.g. tiles) without a copy
+        tensor = torch.from_numpy(image).permute(2, 0, 1).float().div_(255.0)
+        if (new_height, new_width) != (height, width):
+            tensor = F.interpolate(tensor[None], size=(new_height, new_width), mode="bilinear", align_corners=False)[0]
+        
+        pad_w, pad_h = size - new_width, size - new_height
+        left, top = pad_w // 2, pad_h // 2
+        tensor = F.pad(tensor, (left, pad_w - left, top, pad_h - top), value=114 / 255.0)
+        return tensor, ratio, (left, top)
+    
+    def _decode(self, source: EngineInput) -> np.ndarray:
+        """Decode an image path or encoded bytes into an RGB HWC array (arrays pass through)"""
+        if isinstance(source, np.ndarray):
+            if source.ndim == 2:
+                source = np.repeat(source[:, :, None], 3, axis=2)
+            if source.ndim != 3 or source.shape[2] != 3 or source.dtype != np.uint8:
+                raise ValueError("Arrays must be RGB HWC uint8")
+            # torch cannot wrap read-only buffers
+            return source if source.flags.writeable else source.copy()
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            # np.array (not asarray) gives a writable buffer torch can wrap
+            return np.array(ImageOps.exif_transpose(image).convert("RGB"))
+    
+    def _prepare_batch(self, chunk: List[Tuple[int, EngineInput]]) -> Dict[str, Any]:
+        """Decode and letterbox one batch of (index, input) pairs (runs on the prefetch thread)"""
+        decode_time = 0.0
+        preprocess_time = 0.0
+        tensors, metas, errors = [], [], {}
+        for index, source in chunk:
+            start = time.time()
+            try:
+                image = self._decode(source)
+            except Exception as e:
+                errors[index] = str(e)
+                continue
+            decode_time += time.time() - start
+            
+            start = time.time()
+            tensor, ratio, pad = self.preprocessor(image)
+            preprocess_time += time.time() - start
+            tensors.append(tensor)
+            metas.append((index, ratio, pad, image.shape[1], image.shape[0]))
+        
+        start = time.time()
+        batch = torch.stack(tensors) if tensors else None
+        preprocess_time += time.time() - start
+        return {"batch": batch, "metas": metas, "errors": errors,
+                "decode": decode_time, "preprocess": preprocess_time}
+    
+    def _forward(self, batch: torch.Tensor, **kwargs) -> List[Any]:
+        """One forward pass (plus NMS) over a stacked BCHW tensor"""
+        return self.model.predict(
+            batch,
+            device=str(self.device),
+            conf=kwargs.get('confidence_threshold', self.confidence_threshold),
+            iou=kwargs.get('iou_threshold', self.iou_threshold),
+            verbose=False
+        )
+    
+    def _postprocess(self, result, ratio: float, pad: Tuple[int, int], width: int, height: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Map letterboxed boxes back to original image coordinates"""
+        if result.boxes is None or len(result.boxes) == 0:
+            return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=np.int64)
+        data = result.boxes.data.cpu().numpy().astype(np.float64)
+        left, top = pad
+        boxes = (data[:, :4] - np.array([left, top, left, top])) / ratio
+        boxes = np.clip(boxes, 0, [width, height, width, height])
+        return boxes, data[:, -2], data[:, -1].astype(np.int64)
+    
+    def _to_detections(self, boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {
+                "class_id": cls,
+                "class_name": self.class_mappings.get(cls, f"class_{cls}"),
+                "confidence": score,
+                "bbox": box
+            }
+            for box, score, cls in zip(boxes.tolist(), scores.tolist(), classes.tolist())
+        ]
     
     def _infer_single(self, image_path: str, **kwargs) -> Dict[str, Any]:
         """Perform inference on single image"""
-        # TODO: Implement actual single image inference
+        result = self._infer_batch([image_path], **kwargs)
+        if image_path in result["errors"]:
+            raise ValueError(f"Could not decode {image_path}: {result['errors'][image_path]}")
         return {
             "input_path": image_path,
-            "detections": [],
-            "processing_time": 0.1,
-            "model_info": self.get_model_info()
+            "detections": result["detections"][0],
+            "processing_time": result["processing_time"],
+            "timings": result["timings"],
+            "model_info": result["model_info"]
         }
     
     def _infer_batch(self, image_paths: List[str], **kwargs) -> Dict[str, Any]:
-        """Perform batch inference on multiple images"""
-        # TODO: Implement actual batch inference
+        """
+        Perform batch inference on multiple images
+        
+        Returns:
+            Detections per input path (empty for images that failed to
+            decode, listed under errors) and per-stage timings in seconds
+        """
+        start_time = time.time()
+        run = self._run_batches(image_paths, **kwargs)
         return {
             "input_paths": image_paths,
-            "detections": [[] for _ in image_paths],
-            "batch_size": len(image_paths),
-            "processing_time": 0.1 * len(image_paths),
+            "detections": run["detections"],
+            "errors": {image_paths[index]: message for index, message in run["errors"].items()},
+            "batch_size": run["batch_size"],
+            "processing_time": time.time() - start_time,
+            "timings": run["timings"],
             "model_info": self.get_model_info()
         }
     
+    def _run_batches(self, inputs: List[EngineInput], **kwargs) -> Dict[str, Any]:
+        """
+        Inputs are processed in chunks of batch_size. Each chunk is stacked
+        into one tensor and runs as one forward pass. Decoding and
+        letterboxing of the next chunk happen on a prefetch thread while
+        the current chunk is running.
+        
+        Returns:
+            Detections per input index, errors by index and per-stage timings
+        """
+        batch_size = kwargs.get('batch_size', self.batch_size)
+        indexed = list(enumerate(inputs))
+        chunks = [indexed[i:i + batch_size] for i in range(0, len(indexed), batch_size)]
+        timings = {"decode": 0.0, "preprocess": 0.0, "forward": 0.0, "postprocess": 0.0, "prefetch_wait": 0.0}
+        detections: List[List[Dict[str, Any]]] = [[] for _ in indexed]
+        errors: Dict[int, str] = {}
+        
+        pool = self._get_prefetch_pool()
+        pending = pool.submit(self._prepare_batch, chunks[0]) if pool and chunks else None
+        for index, chunk in enumerate(chunks):
+            wait_start = time.time()
+            prepared = pending.result() if pending else self._prepare_batch(chunk)
+            timings["prefetch_wait"] += time.time() - wait_start
+            if pool and index + 1 < len(chunks):
+                pending = pool.submit(self._prepare_batch, chunks[index + 1])
+            
+            timings["decode"] += prepared["decode"]
+            timings["preprocess"] += prepared["preprocess"]
+            errors.update(prepared["errors"])
+            if prepared["batch"] is None:
+                continue
+            
+            start = time.time()
+            results = self._forward(prepared["batch"], **kwargs)
+            timings["forward"] += time.time() - start
+            
+            start = time.time()
+            for result, (index, ratio, pad, width, height) in zip(results, prepared["metas"]):
+                detections[index] = self._to_detections(*self._postprocess(result, ratio, pad, width, height))
+            timings["postprocess"] += time.time() - start
+        
+        return {
+            "detections": detections,
+            "errors": errors,
+            "batch_size": batch_size,
+            "timings": {stage: round(seconds, 4) for stage, seconds in timings.items()}
+        }
+    
+    def _get_prefetch_pool(self) -> Optional[ThreadPoolExecutor]:
+        if not self.prefetch_enabled:
+            return None
+        if self._prefetch_pool is None:
+            self._prefetch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="yolo-e-prefetch")
+        return self._prefetch_pool
+    
+    def _infer_tiled(self, image_path: str, **kwargs) -> Dict[str, Any]:
+        """Perform sliced inference on a high-resolution image"""
+        start_time = time.time()
+        
+        spec = TileSpec(
+            tile_size=kwargs.get('tile_size', 640),
+            overlap=kwargs.get('tile_overlap', 0.2),
+            merge=kwargs.get('tile_merge', 'nms'),
+            merge_iou=kwargs.get('tile_merge_iou', 0.5),
+            include_full_image=kwargs.get('include_full_image', True)
+        )
+        spec.validate()
+        
+        # Decode once; tiles are views into this buffer
+        pixels = self._decode(image_path)
+        height, width = pixels.shape[:2]
+        grid = tile_grid(width, height, spec.tile_size, spec.overlap)
+        sources = slice_tiles(pixels, grid)
+        offsets = [(x0, y0) for x0, y0, _, _ in grid]
+        if spec.include_full_image and len(grid) > 1:
+            sources.append(pixels)
+            offsets.append((0, 0))
+        
+        # Tiles run batch_size at a time
+        outputs = self._predict_arrays(sources, **kwargs)
+        boxes, scores, classes = merge_tile_detections(
+            [o[0] for o in outputs], [o[1] for o in outputs], [o[2] for o in outputs], offsets, spec
+        )
+        
+        return {
+            "input_path": image_path,
+            "detections": self._to_detections(boxes, scores, classes),
+            "tiles": len(grid),
+            "image_size": [width, height],
+            "processing_time": time.time() - start_time,
+            "model_info": self.get_model_info()
+        }
+    
+    def _predict_arrays(self, images: List[np.ndarray], **kwargs) -> List[tuple]:
+        """Run decoded images batch_size at a time; returns (boxes, scores, classes) per image"""
+        batch_size = kwargs.get('batch_size', self.batch_size)
+        outputs = []
+        for i in range(0, len(images), batch_size):
+            chunk = images[i:i + batch_size]
+            prepared = [self.preprocessor(image) for image in chunk]
+            results = self._forward(torch.stack([tensor for tensor, _, _ in prepared]), **kwargs)
+            outputs.extend(
+                self._postprocess(result, ratio, pad, image.shape[1], image.shape[0])
+                for result, (_, ratio, pad), image in zip(results, prepared, chunk)
+            )
+        return outputs
+    
     def _perform_few_shot_training(self, dataset_config: Dict[str, Any], 
                                  epochs: int, learning_rate: float, 
                                  batch_size: int) -> Dict[str, Any]:
@@ -258,29 +600,7 @@ class YOLOENode(EngineNode):
             "metrics": {"accuracy": 0.95, "loss": 0.05}
         }
     
-    def _get_image_paths(self, directory: str) -> List[str]:
-        """Get all image file paths from directory"""
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
-        image_paths = []
-        
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if Path(file).suffix.lower() in image_extensions:
-                    image_paths.append(os.path.join(root, file))
-        
-        return sorted(image_paths)
-    
-    def _save_batch_results(self, results: Dict[str, Any], output_dir: str, batch_id: int):
-        """Save batch processing results"""
-        output_file = os.path.join(output_dir, f"batch_{batch_id}_results.json")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
-    
-    def _save_final_results(self, results: Dict[str, Any], output_dir: str):
-        """Save final processing results"""
-        output_file = os.path.join(output_dir, "final_results.json")
-        
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
+    def _get_image_paths(self, directory: str, shard_index: int = 0, num_shards: int = 1,
+                         index_path: Optional[str] = None) -> Iterator[str]:
+        """Lazily yield image file paths from directory (optionally one shard, or only new/changed files)"""
+        return scan_images(directory, index_path=index_path, shard_index=shard_index, num_shards=num_shards)
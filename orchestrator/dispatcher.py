@@ -1,11 +1,183 @@
-from typing import Dict, Any
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+EWMA_ALPHA = 0.2
+DEFAULT_LATENCY = 1.0  # seconds, until a worker has reported one
+DEFAULT_COLD_LOAD = 5.0  # seconds, until a cold load has been observed
+
+
+@dataclass
+class WorkerState:
+    worker_id: str
+    engine_name: str
+    queue_depth: int = 0
+    latency_ewma: Optional[float] = None
+    loaded_models: Set[str] = field(default_factory=set)
+    last_seen: float = field(default_factory=time.time)
+    picks: int = 0
+
 
 class Dispatcher:
-    def __init__(self):
+    """
+    Routes task types to engines, and tasks to the least loaded worker
+
+    Workers report queue depth and loaded models; completions feed a
+    per-worker latency EWMA. A worker's cost is its expected wait,
+    (queue_depth + 1) * latency, plus the cold-load time if it does not
+    have the requested model loaded yet.
+    """
+
+    def __init__(self, heartbeat_timeout: float = 30.0, history: int = 100):
         self.routes: Dict[str, str] = {}
+        self.workers: Dict[str, WorkerState] = {}
+        self.heartbeat_timeout = heartbeat_timeout
+        self.cold_load_ewma: Optional[float] = None
+        self.counters: Dict[str, int] = {"decisions": 0, "affinity_hits": 0, "cold_routes": 0, "no_worker": 0}
+        self.decisions: deque = deque(maxlen=history)
+        self._lock = threading.Lock()
 
     def register(self, task_type: str, engine_name: str) -> None:
         self.routes[task_type] = engine_name
 
     def resolve(self, task_type: str) -> str:
         return self.routes.get(task_type, "ultra_node")
+
+    def add_worker(self, worker_id: str, engine_name: str, loaded_models: Optional[List[str]] = None) -> None:
+        with self._lock:
+            self.workers[worker_id] = WorkerState(worker_id, engine_name, loaded_models=set(loaded_models or []))
+
+    def remove_worker(self, worker_id: str) -> None:
+        with self._lock:
+            self.workers.pop(worker_id, None)
+
+    def heartbeat(self, worker_id: str, queue_depth: Optional[int] = None,
+                  loaded_models: Optional[List[str]] = None) -> None:
+        """Live load report from a worker"""
+        with self._lock:
+            worker = self.workers.get(worker_id)
+            if worker is None:
+                return
+            worker.last_seen = time.time()
+            if queue_depth is not None:
+                worker.queue_depth = queue_depth
+            if loaded_models is not None:
+                worker.loaded_models = set(loaded_models)
+
+    def mark_loaded(self, worker_id: str, model: str) -> None:
+        """Record a model a worker loaded outside select/complete (e.g. preloaded)"""
+        with self._lock:
+            worker = self.workers.get(worker_id)
+            if worker is not None:
+                worker.loaded_models.add(model)
+
+    def select(self, task_type: str, model: Optional[str] = None) -> Optional[str]:
+        """
+        Pick a worker for one task and count it as queued there
+
+        Returns:
+            Worker id, or None when no live worker runs the task's engine
+        """
+        engine_name = self.resolve(task_type)
+        now = time.time()
+        with self._lock:
+            candidates = [
+                w for w in self.workers.values()
+                if w.engine_name == engine_name and now - w.last_seen <= self.heartbeat_timeout
+            ]
+            self.counters["decisions"] += 1
+            if not candidates:
+                self.counters["no_worker"] += 1
+                self.decisions.append({"at": now, "task_type": task_type, "engine": engine_name,
+                                       "model": model, "worker": None, "candidates": {}})
+                return None
+
+            scores = {w.worker_id: self._cost(w, model) for w in candidates}
+            # Ties go to the worker picked least often
+            chosen = min(candidates, key=lambda w: (scores[w.worker_id], w.picks, w.worker_id))
+            warm = model is None or model in chosen.loaded_models
+            self.counters["affinity_hits" if warm else "cold_routes"] += 1
+            chosen.queue_depth += 1
+            chosen.picks += 1
+            self.decisions.append({
+                "at": now,
+                "task_type": task_type,
+                "engine": engine_name,
+                "model": model,
+                "worker": chosen.worker_id,
+                "warm": warm,
+                "candidates": {worker_id: round(cost, 4) for worker_id, cost in scores.items()},
+            })
+            return chosen.worker_id
+
+    def complete(self, worker_id: str, latency: float, model: Optional[str] = None,
+                 cold_load_time: Optional[float] = None) -> None:
+        """Record a finished task: frees its queue slot and updates latency and loaded models"""
+        with self._lock:
+            worker = self.workers.get(worker_id)
+            if worker is None:
+                return
+            worker.last_seen = time.time()
+            worker.queue_depth = max(0, worker.queue_depth - 1)
+            worker.latency_ewma = _ewma(worker.latency_ewma, latency)
+            if model is not None:
+                worker.loaded_models.add(model)
+            if cold_load_time is not None:
+                self.cold_load_ewma = _ewma(self.cold_load_ewma, cold_load_time)
+
+    def _cost(self, worker: WorkerState, model: Optional[str]) -> float:
+        latency = worker.latency_ewma if worker.latency_ewma is not None else self._fleet_latency(worker.engine_name)
+        cost = (worker.queue_depth + 1) * latency
+        if model is not None and model not in worker.loaded_models:
+            cost += self.cold_load_ewma if self.cold_load_ewma is not None else DEFAULT_COLD_LOAD
+        return cost
+
+    def _fleet_latency(self, engine_name: str) -> float:
+        """Mean latency of the engine's other workers, for workers with no history yet"""
+        known = [w.latency_ewma for w in self.workers.values()
+                 if w.engine_name == engine_name and w.latency_ewma is not None]
+        return sum(known) / len(known) if known else DEFAULT_LATENCY
+
+    def metrics(self) -> Dict[str, Any]:
+        """Routing counters, per-worker inputs and recent decisions"""
+        now = time.time()
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "cold_load_ewma": self.cold_load_ewma,
+                "workers": {
+                    w.worker_id: {
+                        "engine": w.engine_name,
+                        "queue_depth": w.queue_depth,
+                        "latency_ewma": w.latency_ewma,
+                        "loaded_models": sorted(w.loaded_models),
+                        "picks": w.picks,
+                        "stale": now - w.last_seen > self.heartbeat_timeout,
+                    }
+                    for w in self.workers.values()
+                },
+                "recent_decisions": list(self.decisions),
+            }
+
+    def render_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        snapshot = self.metrics()
+        lines: List[str] = []
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE eye_dispatcher_{name}_total counter")
+            lines.append(f"eye_dispatcher_{name}_total {value}")
+        gauges: List[Tuple[str, str]] = [("queue_depth", "queue_depth"), ("latency_ewma_seconds", "latency_ewma"),
+                                         ("picks_total", "picks")]
+        for metric, key in gauges:
+            lines.append(f"# TYPE eye_dispatcher_worker_{metric} {'counter' if key == 'picks' else 'gauge'}")
+            for worker_id, worker in snapshot["workers"].items():
+                if worker[key] is not None:
+                    labels = f'worker="{worker_id}",engine="{worker["engine"]}"'
+                    lines.append(f"eye_dispatcher_worker_{metric}{{{labels}}} {worker[key]}")
+        return "\n".join(lines) + "\n"
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * current
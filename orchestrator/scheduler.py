@@ -1,16 +1,246 @@
-from typing import Any, Dict, Optional
-from datetime import datetime
+import json
+import time
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Lower rank runs first
+PRIORITY_CLASSES = {"interactive": 0, "prelabel": 1, "batch": 2}
+
+
+@dataclass
+class SchedulingPolicy:
+    """
+    Ordering shared by the in-memory and Redis schedulers
+
+    A job's key is its enqueue time plus its class delay, capped by its
+    deadline; the smallest key runs first. Class delays give priority
+    without starvation: a batch job that has waited longer than the
+    batch/interactive delay gap outranks a fresh interactive job (aging).
+
+    Across tenants, each served job adds quantum / weight seconds to its
+    tenant's virtual time, which is added to the tenant's head key, so a
+    busy tenant cannot crowd out a light one. A tenant that goes idle
+    rejoins at the current virtual time instead of with banked credit.
+    """
+    class_delays: Dict[str, float] = field(default_factory=lambda: {"interactive": 0.0, "prelabel": 30.0, "batch": 300.0})
+    quantum: float = 5.0
+    weights: Dict[str, float] = field(default_factory=dict)
+    default_priority: str = "batch"
+    default_tenant: str = "default"
+
+    def job_key(self, priority: str, enqueued_at: float, deadline: Optional[float] = None) -> float:
+        if priority not in self.class_delays:
+            raise ValueError(f"priority must be one of: {', '.join(self.class_delays)}")
+        key = enqueued_at + self.class_delays[priority]
+        return min(key, deadline) if deadline is not None else key
+
+    def weight(self, tenant: str) -> float:
+        return self.weights.get(tenant, 1.0)
+
+    def describe(self, payload: Dict[str, Any], priority: Optional[str], tenant: Optional[str],
+                 deadline: Optional[float]) -> Tuple[str, str, Optional[float]]:
+        """Resolve priority, tenant and deadline from arguments or the payload"""
+        return (
+            priority or payload.get("priority") or self.default_priority,
+            tenant or payload.get("tenant") or self.default_tenant,
+            deadline if deadline is not None else payload.get("deadline"),
+        )
+
 
 class Scheduler:
-    def __init__(self):
+    """
+    In-memory priority/fair scheduler
+
+    Jobs sit in per-tenant heaps keyed by the policy's job key; tenants sit
+    in a heap keyed by their head job plus virtual time. Enqueue and
+    dequeue are O(log n). Re-enqueueing a queued job id is ignored.
+    """
+
+    def __init__(self, policy: Optional[SchedulingPolicy] = None, clock: Callable[[], float] = time.time):
+        self.policy = policy or SchedulingPolicy()
+        self.clock = clock
         self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._tenant_jobs: Dict[str, List[Tuple[float, int, str]]] = {}
+        self._tenants: List[Tuple[float, int, str]] = []
+        self._tenant_version: Dict[str, int] = {}
+        self._vt: Dict[str, float] = {}
+        self._global_vt = 0.0
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any], priority: Optional[str] = None,
+                tenant: Optional[str] = None, deadline: Optional[float] = None) -> bool:
+        if job_id in self.jobs:
+            return False
+        priority, tenant, deadline = self.policy.describe(payload, priority, tenant, deadline)
+        enqueued_at = self.clock()
+        key = self.policy.job_key(priority, enqueued_at, deadline)
+        self.jobs[job_id] = {"payload": payload, "priority": priority, "tenant": tenant,
+                             "deadline": deadline, "enqueued_at": enqueued_at}
+
+        heap = self._tenant_jobs.setdefault(tenant, [])
+        if not heap:
+            self._vt[tenant] = max(self._vt.get(tenant, 0.0), self._global_vt)
+        heapq.heappush(heap, (key, next(self._seq), job_id))
+        if heap[0][2] == job_id:
+            self._push_tenant(tenant)
+        return True
+
+    def dequeue(self) -> Optional[Dict[str, Any]]:
+        while self._tenants:
+            _, version, tenant = heapq.heappop(self._tenants)
+            if version != self._tenant_version.get(tenant):
+                continue  # superseded entry
+            _, _, job_id = heapq.heappop(self._tenant_jobs[tenant])
 
-    def enqueue(self, job_id: str, payload: Dict[str, Any]) -> None:
-        self.jobs[job_id] = {"payload": payload, "enqueued_at": datetime.utcnow()}
+            self._global_vt = self._vt[tenant]
+            self._vt[tenant] += 1.0 / self.policy.weight(tenant)
+            if self._tenant_jobs[tenant]:
+                self._push_tenant(tenant)
+            else:
+                del self._tenant_jobs[tenant]
+                self._tenant_version.pop(tenant, None)
+
+            job = self.jobs.pop(job_id)
+            job["job_id"] = job_id
+            return job
+        return None
+
+    def _push_tenant(self, tenant: str) -> None:
+        version = self._tenant_version.get(tenant, 0) + 1
+        self._tenant_version[tenant] = version
+        head_key = self._tenant_jobs[tenant][0][0]
+        heapq.heappush(self._tenants, (head_key + self._vt[tenant] * self.policy.quantum, version, tenant))
+
+
+# KEYS: tenants, tenant jobs, jobs, vt, meta, weights. ARGV: job id, key, record, tenant, quantum, weight
+_ENQUEUE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[3], ARGV[1]) == 1 then return 0 end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+redis.call('HSET', KEYS[6], ARGV[4], ARGV[6])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+local vt = tonumber(redis.call('HGET', KEYS[4], ARGV[4]) or '0')
+if not redis.call('ZSCORE', KEYS[1], ARGV[4]) then
+  local floor = tonumber(redis.call('HGET', KEYS[5], 'global_vt') or '0')
+  if vt < floor then vt = floor end
+  redis.call('HSET', KEYS[4], ARGV[4], vt)
+end
+local head = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+redis.call('ZADD', KEYS[1], tonumber(head[2]) + vt * tonumber(ARGV[5]), ARGV[4])
+return 1
+"""
+
+# KEYS: tenants, the expected head tenant's jobs, jobs, vt, meta, weights. ARGV: tenant, quantum
+# Returns {tenant} instead of a job when another tenant is now at the head
+_DEQUEUE_SCRIPT = """
+local top = redis.call('ZRANGE', KEYS[1], 0, 0)
+if #top == 0 then return false end
+local tenant = top[1]
+if tenant ~= ARGV[1] then return {tenant} end
+local tenant_key = KEYS[2]
+local popped = redis.call('ZPOPMIN', tenant_key)
+local job_id = popped[1]
+local record = redis.call('HGET', KEYS[3], job_id)
+redis.call('HDEL', KEYS[3], job_id)
+local vt = tonumber(redis.call('HGET', KEYS[4], tenant) or '0')
+local weight = tonumber(redis.call('HGET', KEYS[6], tenant) or '1')
+redis.call('HSET', KEYS[5], 'global_vt', vt)
+vt = vt + 1 / weight
+redis.call('HSET', KEYS[4], tenant, vt)
+local head = redis.call('ZRANGE', tenant_key, 0, 0, 'WITHSCORES')
+if #head == 0 then
+  redis.call('ZREM', KEYS[1], tenant)
+else
+  redis.call('ZADD', KEYS[1], tonumber(head[2]) + vt * tonumber(ARGV[2]), tenant)
+end
+return {job_id, record}
+"""
+
+
+class RedisScheduler:
+    """
+    The same policy on Redis, for shared production queues
+
+    Per-tenant sorted sets hold job ids scored by job key, and a tenant
+    sorted set is scored by head key plus virtual time. Enqueue and
+    dequeue are single Lua scripts, so concurrent workers never pop the
+    same job and the tenant scores stay consistent. Every key the scripts
+    touch is passed in KEYS, and all keys share the prefix's hash tag
+    (braces are added if missing) so they live in one Redis Cluster slot.
+
+    Not yet consulted by the job queue: ReliableQueue is still FIFO.
+    Feeding workers from it needs the pop and the move onto the consumer's
+    processing list in one script (otherwise a crash in between loses the
+    job), so the scheduler keys must share the queue's hash tag; that
+    wiring is left for a follow-up.
+    """
+
+    def __init__(self, client, prefix: str = "{eye:sched}", policy: Optional[SchedulingPolicy] = None,
+                 clock: Callable[[], float] = time.time):
+        self.client = client
+        self.prefix = prefix if "{" in prefix else f"{{{prefix}}}"
+        self.policy = policy or SchedulingPolicy()
+        self.clock = clock
+        self.tenants_key = f"{self.prefix}:tenants"
+        self.jobs_key = f"{self.prefix}:jobs"
+        self.vt_key = f"{self.prefix}:vt"
+        self.meta_key = f"{self.prefix}:meta"
+        self.weights_key = f"{self.prefix}:weights"
+        self._enqueue = client.register_script(_ENQUEUE_SCRIPT)
+        self._dequeue = client.register_script(_DEQUEUE_SCRIPT)
+
+    def __len__(self) -> int:
+        return self.client.hlen(self.jobs_key)
+
+    def _tenant_key(self, tenant: str) -> str:
+        return f"{self.prefix}:tenant:{tenant}"
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any], priority: Optional[str] = None,
+                tenant: Optional[str] = None, deadline: Optional[float] = None) -> bool:
+        priority, tenant, deadline = self.policy.describe(payload, priority, tenant, deadline)
+        enqueued_at = self.clock()
+        key = self.policy.job_key(priority, enqueued_at, deadline)
+        record = json.dumps({"payload": payload, "priority": priority, "tenant": tenant,
+                             "deadline": deadline, "enqueued_at": enqueued_at})
+        added = self._enqueue(
+            keys=[self.tenants_key, self._tenant_key(tenant), self.jobs_key,
+                  self.vt_key, self.meta_key, self.weights_key],
+            args=[job_id, key, record, tenant, self.policy.quantum, self.policy.weight(tenant)],
+        )
+        return bool(added)
 
     def dequeue(self) -> Optional[Dict[str, Any]]:
-        if not self.jobs:
+        """
+        Pop the next job
+
+        The head tenant is read first so its job set can be declared in
+        KEYS; if another worker changed the head in between, the script
+        returns the new head tenant and the pop is retried with it.
+        """
+        top = self.client.zrange(self.tenants_key, 0, 0)
+        if not top:
             return None
-        job_id, job = self.jobs.popitem()
-        job["job_id"] = job_id
-        return job
+        tenant = _text(top[0])
+        while True:
+            popped = self._dequeue(
+                keys=[self.tenants_key, self._tenant_key(tenant), self.jobs_key,
+                      self.vt_key, self.meta_key, self.weights_key],
+                args=[tenant, self.policy.quantum],
+            )
+            if not popped:
+                return None
+            if len(popped) == 1:
+                tenant = _text(popped[0])
+                continue
+            job_id, record = popped
+            job = json.loads(record)
+            job["job_id"] = _text(job_id)
+            return job
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,43 @@
+"""
+Job status events
+Status and progress transitions are appended to one Redis stream by the
+workers, the jobs store and the memory pipeline. The backend tails the stream
+once per process and fans events out to SSE/WebSocket subscribers, so clients
+do not need to poll job status. Stream ids double as SSE event ids, which lets
+a reconnecting client replay what it missed (within EYE_JOB_EVENTS_MAXLEN).
+"""
+import os
+import json
+import time
+from typing import Any, Dict, Optional
+
+JOB_EVENTS_STREAM = os.getenv("EYE_JOB_EVENTS_STREAM", "eye:jobs:events")
+JOB_EVENTS_MAXLEN = int(os.getenv("EYE_JOB_EVENTS_MAXLEN", "10000"))
+
+SOURCE_JOBS = "jobs"
+SOURCE_YOLO_E = "yolo_e"
+SOURCE_MEMORY = "memory"
+
+
+def job_owner(job: Dict[str, Any]) -> Optional[str]:
+    """User a queued job belongs to, if the submitter recorded one"""
+    payload = job.get("payload")
+    owner = job.get("user_id") or (payload.get("user_id") if isinstance(payload, dict) else None)
+    return str(owner) if owner else None
+
+
+def event_fields(source: str, job_id: str, status: str, owner: Optional[str] = None, **extra: Any) -> Dict[str, str]:
+    """Stream entry for one transition; None-valued extras are left out"""
+    fields = {"source": source, "job_id": job_id, "status": status, "ts": f"{time.time():.3f}"}
+    if owner:
+        fields["user_id"] = owner
+    for name, value in extra.items():
+        if value is not None:
+            fields[name] = value if isinstance(value, str) else json.dumps(value)
+    return fields
+
+
+def publish_event(client, source: str, job_id: str, status: str, owner: Optional[str] = None, **extra: Any) -> None:
+    """Append one event; client may be a pipeline so the event ships with the status write"""
+    client.xadd(JOB_EVENTS_STREAM, event_fields(source, job_id, status, owner, **extra),
+                maxlen=JOB_EVENTS_MAXLEN, approximate=True)
@@ -0,0 +1,81 @@
+"""
+Job record keys and secondary indexes
+Each job hash is indexed in eye:jobs:recent, eye:jobs:by_type:{type} and
+eye:jobs:by_status:{status}, all scored by created_at. Status changes go
+through SET_STATUS_SCRIPT so the status index moves with the hash;
+INDEX_STATUS_SCRIPT indexes jobs written before the indexes existed;
+DELETE_JOB_SCRIPT removes a finished job together with its index entries.
+"""
+from typing import List
+
+JOB_HASH_KEY = "eye:job:{job_id}"
+JOB_HASH_PREFIX = JOB_HASH_KEY.format(job_id="")
+JOBS_RECENT_ZSET = "eye:jobs:recent"
+JOBS_BY_TYPE_ZSET = "eye:jobs:by_type:{job_type}"
+JOBS_BY_STATUS_ZSET = "eye:jobs:by_status:{status}"
+JOBS_BY_STATUS_PREFIX = JOBS_BY_STATUS_ZSET.format(status="")
+JOB_STATUSES = ("QUEUED", "RUNNING", "SUCCEEDED", "FAILED")
+# Set once every job in eye:jobs:recent has been indexed by type and status
+JOBS_INDEXED_KEY = "eye:jobs:indexed"
+
+# KEYS: job hash, then every status index (see set_status_keys).
+# ARGV: job id, status, status index prefix, then field/value pairs.
+# Returns 0 without writing when the job hash does not exist (e.g. compacted)
+SET_STATUS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local declared = {}
+for i = 2, #KEYS do declared[KEYS[i]] = true end
+local target = ARGV[3] .. ARGV[2]
+if not declared[target] then return redis.error_reply('status index not in KEYS: ' .. target) end
+local old = redis.call('HGET', KEYS[1], 'status')
+local created = redis.call('HGET', KEYS[1], 'created_at')
+redis.call('HSET', KEYS[1], 'status', ARGV[2], unpack(ARGV, 4))
+if old and old ~= ARGV[2] and declared[ARGV[3] .. old] then
+  redis.call('ZREM', ARGV[3] .. old, ARGV[1])
+end
+redis.call('ZADD', target, tonumber(created) or tonumber(redis.call('TIME')[1]), ARGV[1])
+return 1
+"""
+
+# KEYS: job hash, then every status index (see set_status_keys).
+# ARGV: job id, status index prefix, score.
+# Puts the job in the index of the status it has now and removes it from
+# the others; returns 0 when the hash is gone or has no status
+INDEX_STATUS_SCRIPT = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if not status then return 0 end
+local target = ARGV[2] .. status
+for i = 2, #KEYS do
+  if KEYS[i] == target then
+    redis.call('ZADD', KEYS[i], ARGV[3], ARGV[1])
+  else
+    redis.call('ZREM', KEYS[i], ARGV[1])
+  end
+end
+return 1
+"""
+
+# KEYS: job hash, recent zset, status index, then the type index if any.
+# ARGV: job id, expected status.
+# Deletes the job and its index entries only if it still has that status;
+# returns 1 if it was deleted
+DELETE_JOB_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') ~= ARGV[2] then return 0 end
+redis.call('DEL', KEYS[1])
+for i = 2, #KEYS do redis.call('ZREM', KEYS[i], ARGV[1]) end
+return 1
+"""
+
+
+def set_status_keys(job_key: str) -> List[str]:
+    """KEYS for SET_STATUS_SCRIPT: the job hash, then the index of every status"""
+    return [job_key] + [JOBS_BY_STATUS_ZSET.format(status=status) for status in JOB_STATUSES]
+
+
+def index_key(job_type: str = None, status: str = None) -> str:
+    """Smallest index covering the filters (status, then type, then all jobs)"""
+    if status:
+        return JOBS_BY_STATUS_ZSET.format(status=status)
+    if job_type:
+        return JOBS_BY_TYPE_ZSET.format(job_type=job_type)
+    return JOBS_RECENT_ZSET
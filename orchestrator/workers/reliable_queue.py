@@ -0,0 +1,324 @@
+"""
+Reliable Redis job queue
+Producers keep LPUSHing JSON envelopes onto the queue list. Consumers move
+each message atomically (BLMOVE) onto their own processing list and remove
+it only on ack, so a crashed consumer's jobs stay in Redis:
+- consumers heartbeat; the processing list of a consumer that has been
+  silent for longer than the visibility timeout is reclaimed by the others
+- a failed or reclaimed message is retried with exponential backoff
+  (through a delayed sorted set) up to max_attempts
+- after that it goes to the dead-letter list with its last error
+Delivery is at-least-once: a job can run again only if its consumer died
+or lost its lease before acking.
+Every key a script touches is passed in KEYS. The helper keys are named
+{queue_key}:<suffix>, whose hash tag hashes like the untagged queue key,
+so under Redis Cluster they all share the queue's slot.
+"""
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+VISIBILITY_TIMEOUT = int(os.getenv("EYE_QUEUE_VISIBILITY_TIMEOUT", "300"))
+MAX_ATTEMPTS = int(os.getenv("EYE_QUEUE_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = float(os.getenv("EYE_QUEUE_BACKOFF_BASE", "5"))
+BACKOFF_MAX = float(os.getenv("EYE_QUEUE_BACKOFF_MAX", "300"))
+
+# Shared by nack and reclaim: count the attempt, then delay or dead-letter.
+# KEYS[2..4]: attempts hash, delayed zset, dead list. ARGV[1..4]: max_attempts, now, base, max
+_RETRY_LUA = """
+local function retry(raw, err)
+  local digest = redis.sha1hex(raw)
+  local attempts = redis.call('HINCRBY', KEYS[2], digest, 1)
+  if attempts >= tonumber(ARGV[1]) then
+    redis.call('HDEL', KEYS[2], digest)
+    redis.call('LPUSH', KEYS[4], cjson.encode({message = raw, error = err, attempts = attempts, failed_at = tonumber(ARGV[2])}))
+    return 0
+  end
+  local delay = math.min(tonumber(ARGV[4]), tonumber(ARGV[3]) * 2 ^ (attempts - 1))
+  redis.call('ZADD', KEYS[3], tonumber(ARGV[2]) + delay, raw)
+  return attempts
+end
+"""
+
+# KEYS: processing list, attempts, delayed, dead. ARGV: ..., raw, error
+_NACK_SCRIPT = _RETRY_LUA + """
+if redis.call('LREM', KEYS[1], 1, ARGV[5]) == 0 then return -1 end
+return retry(ARGV[5], ARGV[6])
+"""
+
+# KEYS: processing list, attempts, delayed, dead, heartbeats. ARGV: ..., consumer id
+_RECLAIM_SCRIPT = _RETRY_LUA + """
+local moved = 0
+while true do
+  local raw = redis.call('RPOP', KEYS[1])
+  if not raw then break end
+  retry(raw, 'consumer ' .. ARGV[5] .. ' stopped heartbeating')
+  moved = moved + 1
+end
+redis.call('ZREM', KEYS[5], ARGV[5])
+return moved
+"""
+
+# KEYS: processing list, queue. ARGV: raw messages
+_RELEASE_SCRIPT = """
+local released = 0
+for _, raw in ipairs(ARGV) do
+  if redis.call('LREM', KEYS[1], 1, raw) == 1 then
+    redis.call('RPUSH', KEYS[2], raw)
+    released = released + 1
+  end
+end
+return released
+"""
+
+# KEYS: delayed, queue. ARGV: now, limit
+_PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, raw in ipairs(due) do
+  redis.call('ZREM', KEYS[1], raw)
+  redis.call('LPUSH', KEYS[2], raw)
+end
+return #due
+"""
+
+
+def default_consumer_id() -> str:
+    return os.getenv("EYE_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class Delivery:
+    """A received message; pass it back to ack() or nack()"""
+    raw: bytes
+    job: Dict[str, Any]
+    attempt: int
+
+
+class ReliableQueue:
+    def __init__(
+        self,
+        client,
+        queue_key: str,
+        consumer_id: Optional[str] = None,
+        visibility_timeout: int = VISIBILITY_TIMEOUT,
+        max_attempts: int = MAX_ATTEMPTS,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+    ):
+        self.client = client
+        self.queue_key = queue_key
+        self.consumer_id = consumer_id or default_consumer_id()
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.processing_key = self._processing_key(self.consumer_id)
+        self.heartbeats_key = self._key("heartbeats")
+        self.attempts_key = self._key("attempts")
+        self.delayed_key = self._key("delayed")
+        self.dead_key = self._key("dead")
+
+        self._nack = client.register_script(_NACK_SCRIPT)
+        self._reclaim = client.register_script(_RECLAIM_SCRIPT)
+        self._promote = client.register_script(_PROMOTE_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+        self._last_maintenance = 0.0
+        self._heartbeat_stop: Optional[threading.Event] = None
+
+    def _key(self, suffix: str) -> str:
+        """Helper key in the queue key's cluster slot"""
+        if "{" in self.queue_key:
+            return f"{self.queue_key}:{suffix}"
+        return f"{{{self.queue_key}}}:{suffix}"
+
+    def _processing_key(self, consumer_id: str) -> str:
+        return self._key(f"processing:{consumer_id}")
+
+    def _retry_args(self) -> List[Any]:
+        return [self.max_attempts, time.time(), self.backoff_base, self.backoff_max]
+
+    def enqueue(self, payload: Dict[str, Any]) -> int:
+        return self.client.lpush(self.queue_key, json.dumps(payload))
+
+    def receive(self, timeout: float = 5, block: bool = True) -> Optional[Delivery]:
+        """
+        Move the next message onto this consumer's processing list
+
+        Also promotes due retries and, at most every few seconds, reclaims
+        the messages of consumers that stopped heartbeating.
+        """
+        self.heartbeat()
+        self.maintain()
+        if block:
+            raw = self.client.blmove(self.queue_key, self.processing_key, timeout, "RIGHT", "LEFT")
+        else:
+            raw = self.client.lmove(self.queue_key, self.processing_key, "RIGHT", "LEFT")
+        if raw is None:
+            return None
+        deliveries = self._deliveries([raw])
+        return deliveries[0] if deliveries else None
+
+    def receive_many(self, count: int, timeout: float = 5) -> List[Delivery]:
+        """
+        Block for one message, then take up to count - 1 more in a single round-trip
+        """
+        first = self.receive(timeout=timeout)
+        if first is None or count <= 1:
+            return [first] if first else []
+        pipe = self.client.pipeline(transaction=False)
+        for _ in range(count - 1):
+            pipe.lmove(self.queue_key, self.processing_key, "RIGHT", "LEFT")
+        return [first] + self._deliveries([raw for raw in pipe.execute() if raw is not None])
+
+    def _deliveries(self, raws: List[bytes]) -> List[Delivery]:
+        """Parse moved messages (dead-lettering invalid ones) and look up their attempt counts"""
+        parsed = []
+        for raw in raws:
+            try:
+                job = json.loads(raw)
+                if not isinstance(job, dict):
+                    raise ValueError("job must be a JSON object")
+            except ValueError as e:
+                self._dead_letter(raw, f"invalid job: {e}")
+                continue
+            parsed.append((raw, job))
+        if not parsed:
+            return []
+        previous = self.client.hmget(self.attempts_key, [_digest(raw) for raw, _ in parsed])
+        return [Delivery(raw=raw, job=job, attempt=int(count or 0) + 1) for (raw, job), count in zip(parsed, previous)]
+
+    def ack(self, delivery: Delivery, pipe=None) -> Optional[bool]:
+        """
+        Remove a finished message; False if the lease was lost (it was reclaimed)
+
+        With pipe, the commands are only queued on it and None is returned.
+        """
+        target = pipe if pipe is not None else self.client.pipeline()
+        target.lrem(self.processing_key, 1, delivery.raw)
+        target.hdel(self.attempts_key, _digest(delivery.raw))
+        if pipe is not None:
+            return None
+        removed, _ = target.execute()
+        if not removed:
+            logger.warning(f"Acked a message this consumer no longer holds: {delivery.job.get('id')}")
+        return bool(removed)
+
+    def nack(self, delivery: Delivery, error: str, pipe=None) -> Optional[int]:
+        """
+        Fail a message: schedule a retry with backoff or dead-letter it
+
+        Returns:
+            The attempt count if it will be retried, 0 if it was
+            dead-lettered, -1 if the lease was already lost (None when
+            queued on pipe)
+        """
+        result = self._nack(
+            keys=[self.processing_key, self.attempts_key, self.delayed_key, self.dead_key],
+            args=self._retry_args() + [delivery.raw, error],
+            client=pipe if pipe is not None else self.client,
+        )
+        return None if pipe is not None else int(result)
+
+    def will_retry(self, delivery: Delivery) -> bool:
+        """Whether a nack of this delivery schedules a retry rather than dead-lettering it"""
+        return delivery.attempt < self.max_attempts
+
+    def release(self, deliveries: List[Delivery]) -> int:
+        """Hand unstarted messages back to the front of the queue without counting an attempt"""
+        if not deliveries:
+            return 0
+        return int(self._release(keys=[self.processing_key, self.queue_key], args=[d.raw for d in deliveries]))
+
+    def heartbeat(self) -> None:
+        self.client.zadd(self.heartbeats_key, {self.consumer_id: time.time()})
+
+    def start_heartbeat(self, interval: Optional[float] = None) -> None:
+        """Heartbeat from a background thread, so long jobs keep their lease"""
+        if self._heartbeat_stop is not None:
+            return
+        interval = interval or max(1.0, self.visibility_timeout / 3)
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.heartbeat()
+                except Exception as e:
+                    logger.warning(f"Queue heartbeat failed: {e}")
+
+        self._heartbeat_stop = stop
+        self.heartbeat()
+        threading.Thread(target=run, name="queue-heartbeat", daemon=True).start()
+
+    def stop_heartbeat(self) -> None:
+        if self._heartbeat_stop is not None:
+            self._heartbeat_stop.set()
+            self._heartbeat_stop = None
+
+    def maintain(self, force: bool = False) -> None:
+        """Promote due retries and reclaim stale consumers (rate-limited)"""
+        now = time.time()
+        if not force and now - self._last_maintenance < min(5.0, self.visibility_timeout / 4):
+            return
+        self._last_maintenance = now
+        self._promote(keys=[self.delayed_key, self.queue_key], args=[now, 1000])
+        self.reclaim_stale(now)
+
+    def reclaim_stale(self, now: Optional[float] = None) -> int:
+        """Requeue the in-flight messages of consumers silent for longer than the visibility timeout"""
+        cutoff = (now or time.time()) - self.visibility_timeout
+        moved = 0
+        for raw_id in self.client.zrangebyscore(self.heartbeats_key, "-inf", cutoff):
+            consumer_id = raw_id.decode() if isinstance(raw_id, bytes) else raw_id
+            moved += self.reclaim(consumer_id)
+        return moved
+
+    def reclaim(self, consumer_id: str) -> int:
+        """Requeue (as a failed attempt) everything held by a consumer"""
+        moved = int(self._reclaim(
+            keys=[self._processing_key(consumer_id), self.attempts_key, self.delayed_key,
+                  self.dead_key, self.heartbeats_key],
+            args=self._retry_args() + [consumer_id],
+        ))
+        if moved:
+            logger.warning(f"Reclaimed {moved} in-flight jobs from consumer {consumer_id}")
+        return moved
+
+    def recover(self) -> int:
+        """Requeue messages left on this consumer's own processing list by a previous run"""
+        return self.reclaim(self.consumer_id)
+
+    def _dead_letter(self, raw: bytes, error: str) -> None:
+        entry = json.dumps({"message": raw.decode("utf-8", "replace"), "error": error,
+                            "attempts": 0, "failed_at": time.time()})
+        pipe = self.client.pipeline()
+        pipe.lrem(self.processing_key, 1, raw)
+        pipe.lpush(self.dead_key, entry)
+        pipe.execute()
+        logger.error(f"Dead-lettered message: {error}")
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return [json.loads(entry) for entry in self.client.lrange(self.dead_key, 0, limit - 1)]
+
+    def stats(self) -> Dict[str, int]:
+        pipe = self.client.pipeline()
+        pipe.llen(self.queue_key)
+        pipe.llen(self.processing_key)
+        pipe.zcard(self.delayed_key)
+        pipe.llen(self.dead_key)
+        pipe.zcard(self.heartbeats_key)
+        queued, processing, delayed, dead, consumers = pipe.execute()
+        return {"queued": queued, "processing": processing, "delayed": delayed, "dead": dead, "consumers": consumers}
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.sha1(raw if isinstance(raw, bytes) else raw.encode()).hexdigest()
@@ -0,0 +1,232 @@
+"""
+Worker runtime shared by the generic and YOLO-E workers
+- pulls up to pull_size jobs per Redis round-trip from a ReliableQueue
+- groups jobs with the same batch key into one batch-handler call
+- runs up to concurrency units (single jobs or batches) at once
+- writes status and result updates together with the ack/nack in one pipeline,
+  publishing each transition on the job events stream when event_source is set
+- on SIGTERM/SIGINT stops pulling, hands unstarted jobs back to the queue
+  and waits for running ones before exiting
+"""
+import os
+import json
+import time
+import signal
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    from .job_events import job_owner, publish_event
+    from .job_index import JOBS_BY_STATUS_PREFIX, SET_STATUS_SCRIPT, set_status_keys
+    from .reliable_queue import Delivery, ReliableQueue
+except ImportError:
+    from job_events import job_owner, publish_event
+    from job_index import JOBS_BY_STATUS_PREFIX, SET_STATUS_SCRIPT, set_status_keys
+    from reliable_queue import Delivery, ReliableQueue
+
+logger = logging.getLogger(__name__)
+
+JOB_HASH_KEY = "eye:job:{job_id}"
+STATUS_QUEUED = "QUEUED"
+STATUS_RUNNING = "RUNNING"
+STATUS_SUCCEEDED = "SUCCEEDED"
+STATUS_FAILED = "FAILED"
+
+JobHandler = Callable[[Dict[str, Any]], Dict[str, Any]]
+# Returns one result per job; an Exception in the list fails only that job
+BatchHandler = Callable[[List[Dict[str, Any]]], List[Any]]
+BatchKey = Callable[[Dict[str, Any]], Optional[Hashable]]
+
+
+@dataclass
+class RuntimeConfig:
+    """Worker runtime configuration"""
+    concurrency: int = int(os.getenv("EYE_WORKER_CONCURRENCY", "4"))
+    pull_size: int = int(os.getenv("EYE_WORKER_PULL_SIZE", "8"))
+    max_batch: int = int(os.getenv("EYE_WORKER_MAX_BATCH", "16"))
+    poll_timeout: float = float(os.getenv("EYE_WORKER_POLL_TIMEOUT", "5"))
+    drain_timeout: float = float(os.getenv("EYE_WORKER_DRAIN_TIMEOUT", "60"))
+
+
+class WorkerRuntime:
+    def __init__(
+        self,
+        queue: ReliableQueue,
+        handler: JobHandler,
+        batch_handler: Optional[BatchHandler] = None,
+        batch_key: Optional[BatchKey] = None,
+        config: Optional[RuntimeConfig] = None,
+        job_hash_key: str = JOB_HASH_KEY,
+        index_statuses: bool = False,
+        event_source: Optional[str] = None,
+    ):
+        self.queue = queue
+        self.client = queue.client
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.batch_key = batch_key
+        self.config = config or RuntimeConfig()
+        self.job_hash_key = job_hash_key
+        # Keep the jobs-by-status index (see job_index) in step with the hash
+        self._set_status_script = self.client.register_script(SET_STATUS_SCRIPT) if index_statuses else None
+        self.event_source = event_source
+        self._executor = ThreadPoolExecutor(max_workers=self.config.concurrency, thread_name_prefix="eye-job")
+        self._in_flight: Dict[Future, List[Delivery]] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def stop(self, *_) -> None:
+        if not self._stopping.is_set():
+            logger.info("Worker draining: no new jobs will be pulled")
+        self._stopping.set()
+
+    def run(self) -> None:
+        """Serve jobs until stop() or SIGTERM, then drain"""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info(f"Requeued {recovered} jobs left in flight by a previous run")
+        self.queue.start_heartbeat()
+        logger.info(
+            f"Worker runtime started as {self.queue.consumer_id} "
+            f"(concurrency={self.config.concurrency}, pull_size={self.config.pull_size})"
+        )
+        try:
+            while not self._stopping.is_set():
+                with self._lock:
+                    running = list(self._in_flight)
+                if len(running) >= self.config.concurrency:
+                    wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+                    continue
+                try:
+                    deliveries = self.queue.receive_many(self.config.pull_size, timeout=self.config.poll_timeout)
+                except Exception as e:
+                    logger.error(f"Queue receive failed: {e}")
+                    time.sleep(1.0)
+                    continue
+                if deliveries:
+                    self._start(deliveries)
+        finally:
+            self._drain()
+
+    def _start(self, deliveries: List[Delivery]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for delivery in deliveries:
+            job_id = delivery.job.get("id")
+            if job_id:
+                self._set_status(pipe, delivery, {"status": STATUS_RUNNING, "attempt": delivery.attempt,
+                                                  "worker": self.queue.consumer_id})
+        pipe.execute()
+
+        for unit, batched in self._group(deliveries):
+            with self._lock:
+                future = self._executor.submit(self._run_unit, unit, batched)
+                self._in_flight[future] = unit
+            future.add_done_callback(self._done)
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight.pop(future, None)
+
+    def _set_status(self, pipe, delivery: Delivery, mapping: Dict[str, Any]) -> None:
+        """Queue a job hash update (status plus extra fields) and its event on pipe"""
+        job_id = delivery.job["id"]
+        key = self.job_hash_key.format(job_id=job_id)
+        if self._set_status_script is None:
+            pipe.hset(key, mapping=mapping)
+        else:
+            fields = [value for field, v in mapping.items() if field != "status" for value in (field, v)]
+            self._set_status_script(keys=set_status_keys(key), args=[job_id, mapping["status"], JOBS_BY_STATUS_PREFIX] + fields, client=pipe)
+        if self.event_source:
+            publish_event(pipe, self.event_source, job_id, mapping["status"], job_owner(delivery.job),
+                          attempt=delivery.attempt, error=mapping.get("error"))
+
+    def _group(self, deliveries: List[Delivery]) -> List[Tuple[List[Delivery], bool]]:
+        """Single-job units, plus batches of jobs sharing a batch key"""
+        units: List[Tuple[List[Delivery], bool]] = []
+        batches: Dict[Hashable, List[Delivery]] = {}
+        for delivery in deliveries:
+            key = self.batch_key(delivery.job) if self.batch_handler and self.batch_key else None
+            if key is None:
+                units.append(([delivery], False))
+                continue
+            batch = batches.setdefault(key, [])
+            batch.append(delivery)
+            if len(batch) >= self.config.max_batch:
+                units.append((batches.pop(key), True))
+        units.extend((batch, True) for batch in batches.values())
+        return units
+
+    def _run_unit(self, unit: List[Delivery], batched: bool) -> None:
+        outcomes: List[Tuple[Delivery, Any, Optional[str]]] = []
+        start = time.time()
+        try:
+            if not batched:
+                outcomes.append((unit[0], self.handler(unit[0].job), None))
+            else:
+                results = self.batch_handler([d.job for d in unit])
+                if len(results) != len(unit):
+                    raise ValueError(f"Batch handler returned {len(results)} results for {len(unit)} jobs")
+                for delivery, result in zip(unit, results):
+                    if isinstance(result, Exception):
+                        outcomes.append((delivery, None, str(result)))
+                    else:
+                        outcomes.append((delivery, result, None))
+        except Exception as e:
+            outcomes = [(delivery, None, str(e)) for delivery in unit]
+        self._finish(outcomes)
+        logger.info(f"Finished {len(unit)} job(s) in {time.time() - start:.2f}s")
+
+    def _finish(self, outcomes: List[Tuple[Delivery, Any, Optional[str]]]) -> None:
+        """Status, result and ack/nack for a whole unit in one round-trip"""
+        pipe = self.client.pipeline(transaction=False)
+        for delivery, result, error in outcomes:
+            job_id = delivery.job.get("id")
+            if error is None:
+                if job_id:
+                    mapping = {"status": STATUS_SUCCEEDED}
+                    if result is not None:
+                        mapping["result"] = json.dumps(result)
+                    self._set_status(pipe, delivery, mapping)
+                self.queue.ack(delivery, pipe=pipe)
+            else:
+                retry = self.queue.will_retry(delivery)
+                if job_id:
+                    self._set_status(pipe, delivery, {"status": STATUS_QUEUED if retry else STATUS_FAILED, "error": error})
+                self.queue.nack(delivery, error, pipe=pipe)
+                logger.error(f"Job {job_id} failed (attempt {delivery.attempt}, "
+                             f"{'retrying' if retry else 'dead-lettered'}): {error}")
+        try:
+            pipe.execute()
+        except Exception as e:
+            # Unacked jobs stay on the processing list and are reclaimed later
+            logger.error(f"Could not record job outcomes: {e}")
+
+    def _drain(self) -> None:
+        with self._lock:
+            in_flight = dict(self._in_flight)
+        unstarted = [d for future, unit in in_flight.items() if future.cancel() for d in unit]
+        if unstarted:
+            released = self.queue.release(unstarted)
+            pipe = self.client.pipeline(transaction=False)
+            for delivery in unstarted:
+                if delivery.job.get("id"):
+                    self._set_status(pipe, delivery, {"status": STATUS_QUEUED})
+            pipe.execute()
+            logger.info(f"Returned {released} unstarted jobs to the queue")
+
+        running = [future for future in in_flight if not future.cancelled()]
+        if running:
+            logger.info(f"Waiting up to {self.config.drain_timeout:.0f}s for {len(running)} running unit(s)")
+            _, not_done = wait(running, timeout=self.config.drain_timeout)
+            if not_done:
+                logger.warning(f"{len(not_done)} unit(s) still running at exit; they will be reclaimed")
+        self._executor.shutdown(wait=False)
+        self.queue.stop_heartbeat()
+        logger.info("Worker runtime stopped")
@@ -7,6 +7,7 @@ import json
 import os
 import redis
 import logging
+import threading
 from typing import Dict, Any, Optional
 from pathlib import Path
 
@@ -16,11 +17,26 @@ try:
 except ImportError:
     YOLOENode = None
 
+try:
+    from engines.scanner import scan_images
+except ImportError:
+    scan_images = None
+
+try:
+    from .job_events import SOURCE_YOLO_E, job_owner, publish_event
+    from .reliable_queue import ReliableQueue
+    from .runtime import WorkerRuntime
+except ImportError:
+    from job_events import SOURCE_YOLO_E, job_owner, publish_event
+    from reliable_queue import ReliableQueue
+    from runtime import WorkerRuntime
+
 logger = logging.getLogger(__name__)
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6380/0")
 QUEUE_KEY = os.getenv("YOLO_E_QUEUE_KEY", "eye:yolo_e:jobs")
 JOB_HASH_KEY = "eye:yolo_e:job:{job_id}"
+YOLO_E_WEIGHTS = os.getenv("YOLO_E_WEIGHTS", "/app/storage/weights/yolo_e/base/yoloe-11s-seg.pt")
 STATUS_RUNNING = "RUNNING"
 STATUS_SUCCEEDED = "SUCCEEDED"
 STATUS_FAILED = "FAILED"
@@ -31,6 +47,8 @@ class YOLOEWorker:
     def __init__(self):
         self.client = redis.Redis.from_url(REDIS_URL)
         self.yolo_e_engine = None
+        # The runtime runs jobs on several threads; one engine is shared and is not thread-safe
+        self._engine_lock = threading.Lock()
         self.initialized = False
         
     def initialize(self):
@@ -39,6 +57,7 @@ class YOLOEWorker:
             if YOLOENode:
                 self.yolo_e_engine = YOLOENode()
                 logger.info("YOLO-E engine initialized")
+                self._load_engine(YOLO_E_WEIGHTS)
             else:
                 logger.warning("YOLO-E engine not available, using placeholder")
             
@@ -75,6 +94,47 @@ class YOLOEWorker:
             logger.error(f"Job processing failed: {str(e)}")
             raise
     
+    def _load_engine(self, weights_path: str) -> bool:
+        """Load the default weights; jobs use the placeholder path if this fails"""
+        try:
+            with self._engine_lock:
+                self.yolo_e_engine.load(weights_path)
+            return True
+        except Exception as e:
+            logger.warning(f"YOLO-E weights not loaded from {weights_path}, using placeholder: {e}")
+            return False
+    
+    def _engine_infer_batch(self, image_paths: list, **kwargs) -> Optional[list]:
+        """Run the shared engine, one call at a time; None while it is not loaded"""
+        engine = self.yolo_e_engine
+        if engine is None or not getattr(engine, "loaded", False):
+            return None
+        with self._engine_lock:
+            return engine.infer_batch(image_paths, **kwargs)
+    
+    def _report_progress(self, job: Dict[str, Any], **progress: Any) -> None:
+        """Record progress on the job hash and publish it as a RUNNING event"""
+        job_id = job.get("id")
+        if not job_id:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(JOB_HASH_KEY.format(job_id=job_id), mapping={k: json.dumps(v) for k, v in progress.items()})
+            publish_event(pipe, SOURCE_YOLO_E, job_id, STATUS_RUNNING, job_owner(job), **progress)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not report progress for {job_id}: {e}")
+    
+    def batch_key(self, job: Dict[str, Any]) -> Optional[tuple]:
+        """Inference jobs for the same model and threshold can share one engine batch"""
+        if job.get("type") != "inference":
+            return None
+        return ("inference", job.get("model_path"), job.get("confidence_threshold", 0.5))
+    
+    def process_batch(self, jobs: list) -> list:
+        """Process jobs with the same batch_key; returns a result or an exception per job"""
+        return self._process_inference_batch(jobs)
+    
     def _process_few_shot_training(self, job: Dict[str, Any]) -> Dict[str, Any]:
         """Process few-shot training job"""
         try:
@@ -93,6 +153,7 @@ class YOLOEWorker:
             for epoch in range(epochs):
                 logger.info(f"Training epoch {epoch + 1}/{epochs}")
                 time.sleep(0.1)  # Placeholder for actual training time
+                self._report_progress(job, progress=round(100 * (epoch + 1) / epochs), epoch=epoch + 1, epochs=epochs)
             
             # Generate training results
             training_results = {
@@ -136,11 +197,36 @@ class YOLOEWorker:
             # Create output directory
             os.makedirs(output_directory, exist_ok=True)
             
-            # Get image files
-            image_files = self._get_image_files(input_directory)
-            total_images = len(image_files)
+            # Image files are discovered lazily, so the first batch starts
+            # without waiting for the whole tree to be scanned
+            image_files = self._get_image_files(
+                input_directory,
+                shard_index=job.get("shard_index", 0),
+                num_shards=job.get("num_shards", 1),
+                index_path=os.path.join(output_directory, ".scan_index.sqlite") if job.get("incremental") else None
+            )
             
-            if total_images == 0:
+            # Process images in batches
+            discovered_count = 0
+            processed_count = 0
+            batch_index = 0
+            results = []
+            batch_files = []
+            
+            for image_file in image_files:
+                discovered_count += 1
+                batch_files.append(image_file)
+                if len(batch_files) < batch_size:
+                    continue
+                processed_count += self._run_file_batch(batch_files, batch_index, confidence_threshold, output_directory, results)
+                batch_index += 1
+                batch_files = []
+                # The total is unknown while the scan is lazy, so report counts
+                self._report_progress(job, discovered_images=discovered_count, processed_images=processed_count, batches=batch_index)
+            if batch_files:
+                processed_count += self._run_file_batch(batch_files, batch_index, confidence_threshold, output_directory, results)
+            
+            if discovered_count == 0:
                 return {
                     "job_id": job.get("id"),
                     "status": "completed",
@@ -148,69 +234,81 @@ class YOLOEWorker:
                     "message": "No images found"
                 }
             
-            # Process images in batches
-            processed_count = 0
-            results = []
-            
-            for i in range(0, total_images, batch_size):
-                batch_files = image_files[i:i + batch_size]
-                
-                # TODO: Implement actual batch processing with YOLO-E
-                # This would use the YOLO-E engine for inference
-                
-                batch_results = self._process_image_batch(batch_files, confidence_threshold)
-                results.extend(batch_results)
-                processed_count += len(batch_files)
-                
-                # Save intermediate results
-                self._save_batch_results(batch_results, output_directory, i // batch_size)
-                
-                logger.info(f"Processed batch {i // batch_size + 1}: {processed_count}/{total_images}")
-            
             # Save final results
             final_results = {
                 "job_id": job.get("id"),
                 "status": "completed",
-                "total_images": total_images,
+                "total_images": discovered_count,
                 "processed_images": processed_count,
+                "failed_images": discovered_count - processed_count,
                 "results": results,
                 "output_directory": output_directory
             }
             
             self._save_final_results(final_results, output_directory)
             
-            logger.info(f"Batch processing completed: {processed_count}/{total_images} images")
+            logger.info(f"Batch processing completed: {processed_count} images")
             return final_results
             
         except Exception as e:
             logger.error(f"Batch processing failed: {str(e)}")
             raise
     
+    def _run_file_batch(self, batch_files: list, batch_index: int, confidence_threshold: float,
+                        output_directory: str, results: list) -> int:
+        """Process and save one batch of files; returns how many succeeded"""
+        # TODO: Implement actual batch processing with YOLO-E
+        # This would use the YOLO-E engine for inference
+        
+        batch_results = self._process_image_batch(batch_files, confidence_threshold)
+        results.extend(batch_results)
+        
+        # Save intermediate results
+        self._save_batch_results(batch_results, output_directory, batch_index)
+        
+        logger.info(f"Processed batch {batch_index + 1}: {len(results)} images so far")
+        return sum(1 for result in batch_results if not result.get("error"))
+    
     def _process_inference(self, job: Dict[str, Any]) -> Dict[str, Any]:
         """Process single image inference job"""
+        result = self._process_inference_batch([job])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def _process_inference_batch(self, jobs: list) -> list:
+        """Process inference jobs as one engine batch"""
         try:
-            image_path = job.get("image_path")
-            confidence_threshold = job.get("confidence_threshold", 0.5)
+            image_paths = [job.get("image_path") for job in jobs]
+            confidence_threshold = jobs[0].get("confidence_threshold", 0.5)
             
-            logger.info(f"Processing inference for: {image_path}")
+            logger.info(f"Processing inference for {len(image_paths)} image(s)")
             
-            # TODO: Implement actual inference with YOLO-E
-            # This would use the YOLO-E engine for inference
+            start = time.time()
+            outputs = self._engine_infer_batch(image_paths, confidence_threshold=confidence_threshold)
+            if outputs is None:
+                # No engine loaded: simulate inference
+                time.sleep(0.1)
+                outputs = [{"detections": []} for _ in jobs]
+            processing_time = time.time() - start
             
-            # Simulate inference
-            time.sleep(0.1)
-            
-            result = {
-                "job_id": job.get("id"),
-                "status": "completed",
-                "image_path": image_path,
-                "detections": [],
-                "processing_time": 0.1,
-                "confidence_threshold": confidence_threshold
-            }
+            results = []
+            for job, image_path, output in zip(jobs, image_paths, outputs):
+                if output.get("error"):
+                    results.append(RuntimeError(f"{image_path}: {output['error']}"))
+                    continue
+                results.append({
+                    "job_id": job.get("id"),
+                    "status": "completed",
+                    "image_path": image_path,
+                    "detections": output.get("detections", []),
+                    "processing_time": processing_time,
+                    "batch_size": len(jobs),
+                    "confidence_threshold": confidence_threshold
+                })
             
-            logger.info(f"Inference completed: {job.get('id')}")
-            return result
+            logger.info(f"Inference completed for {len(jobs)} job(s)")
+            return results
             
         except Exception as e:
             logger.error(f"Inference failed: {str(e)}")
@@ -224,18 +322,21 @@ class YOLOEWorker:
             
             logger.info(f"Loading YOLO-E model: {model_path}")
             
-            # TODO: Implement actual model loading
-            # This would use the YOLO-E engine to load the model
-            
-            # Simulate model loading
-            time.sleep(1.0)
+            start = time.time()
+            if self.yolo_e_engine is not None:
+                # Swapped under the lock, so no inference sees a half-loaded model
+                with self._engine_lock:
+                    self.yolo_e_engine.load(model_path, config_path)
+            else:
+                # No engine available: simulate model loading
+                time.sleep(1.0)
             
             result = {
                 "job_id": job.get("id"),
                 "status": "completed",
                 "model_path": model_path,
                 "model_loaded": True,
-                "loading_time": 1.0
+                "loading_time": time.time() - start
             }
             
             logger.info(f"Model loading completed: {job.get('id')}")
@@ -245,20 +346,36 @@ class YOLOEWorker:
             logger.error(f"Model loading failed: {str(e)}")
             raise
     
-    def _get_image_files(self, directory: str) -> list:
-        """Get all image files from directory"""
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
-        image_files = []
+    def _get_image_files(self, directory: str, shard_index: int = 0, num_shards: int = 1,
+                         index_path: Optional[str] = None):
+        """Lazily yield image files from directory (optionally one shard, or only new/changed files)"""
+        if scan_images is not None:
+            return scan_images(directory, index_path=index_path, shard_index=shard_index, num_shards=num_shards)
+        if num_shards > 1 or index_path:
+            # A plain walk would process the whole tree on every shard and every run
+            raise RuntimeError("Sharded or incremental scans need the engines package, which is not installed in this worker")
         
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if Path(file).suffix.lower() in image_extensions:
-                    image_files.append(os.path.join(root, file))
-        
-        return sorted(image_files)
+        # Engines package not installed: plain walk of the whole tree
+        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+        return (
+            os.path.join(root, file)
+            for root, dirs, files in os.walk(directory)
+            for file in sorted(files)
+            if Path(file).suffix.lower() in image_extensions
+        )
     
     def _process_image_batch(self, image_files: list, confidence_threshold: float) -> list:
-        """Process a batch of images (placeholder implementation)"""
+        """Process a batch of images (placeholder until an engine is loaded)"""
+        start = time.time()
+        outputs = self._engine_infer_batch(image_files, confidence_threshold=confidence_threshold)
+        if outputs is not None:
+            elapsed = (time.time() - start) / max(1, len(image_files))
+            return [
+                {"image_path": image_file, "detections": output.get("detections", []),
+                 "error": output.get("error"), "processing_time": elapsed}
+                for image_file, output in zip(image_files, outputs)
+            ]
+        
         # TODO: Implement actual batch processing with YOLO-E
         results = []
         
@@ -295,48 +412,17 @@ def main():
         worker.initialize()
         logger.info("YOLO-E worker started")
         
-        while True:
-            # Poll for YOLO-E jobs
-            item = worker.client.brpop(QUEUE_KEY, timeout=5)
-            if item is None:
-                continue
-            
-            _, data = item
-            job_id = None
-            
-            try:
-                job = json.loads(data)
-                job_id = job.get("id")
-                
-                # Update job status to running
-                if job_id:
-                    worker.client.hset(
-                        JOB_HASH_KEY.format(job_id=job_id),
-                        mapping={"status": STATUS_RUNNING}
-                    )
-                
-                # Process the job
-                result = worker.process_job(job)
-                
-                # Update job status to succeeded
-                if job_id:
-                    worker.client.hset(
-                        JOB_HASH_KEY.format(job_id=job_id),
-                        mapping={"status": STATUS_SUCCEEDED, "result": json.dumps(result)}
-                    )
-                
-                logger.info(f"YOLO-E job completed: {job_id}")
-                
-            except Exception as e:
-                # Update job status to failed
-                if job_id:
-                    worker.client.hset(
-                        JOB_HASH_KEY.format(job_id=job_id),
-                        mapping={"status": STATUS_FAILED, "error": str(e)}
-                    )
-                
-                logger.error(f"YOLO-E job failed: {job_id}, error: {str(e)}")
-                
+        # Compatible inference jobs pulled together run as one engine batch
+        runtime = WorkerRuntime(
+            ReliableQueue(worker.client, QUEUE_KEY),
+            handler=worker.process_job,
+            batch_handler=worker.process_batch,
+            batch_key=worker.batch_key,
+            job_hash_key=JOB_HASH_KEY,
+            event_source=SOURCE_YOLO_E
+        )
+        runtime.run()
+        
     except KeyboardInterrupt:
         logger.info("YOLO-E worker stopped")
     except Exception as e:
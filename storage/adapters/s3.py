@@ -53,3 +53,7 @@ class S3Adapter:
     def download(self, key: str, local_path: str) -> str:
         self.client.download_file(self.bucket, key, local_path)
         return local_path
+
+    def download_bytes(self, key: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=key)
+        return response["Body"].read()
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from engines.batch_output import Checkpoint, ResultWriter
+
+
+def rows(*paths, error=None):
+    return [{"image_path": p, "detections": [], "error": error} for p in paths]
+
+
+def read_jsonl(output_dir):
+    with open(os.path.join(output_dir, "results.jsonl")) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_checkpoint_persists_done_paths(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path))
+    checkpoint.mark_done(["a.jpg", "b.jpg"])
+    checkpoint.mark_done(["b.jpg"])
+
+    reloaded = Checkpoint(str(tmp_path))
+    assert len(reloaded) == 2
+    assert reloaded.is_done("a.jpg") and reloaded.is_done("b.jpg")
+    assert not reloaded.is_done("c.jpg")
+
+
+def test_manifest_round_trip(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path))
+    assert checkpoint.load_manifest() == {}
+    checkpoint.write_manifest({"processed_images": 3})
+    manifest = Checkpoint(str(tmp_path)).load_manifest()
+    assert manifest["processed_images"] == 3 and "updated_at" in manifest
+    assert not os.path.exists(checkpoint.manifest_path + ".tmp")
+
+
+def test_jsonl_flush_reports_only_successful_rows(tmp_path):
+    writer = ResultWriter(str(tmp_path), "jsonl")
+    writer.write(rows("a.jpg", "b.jpg") + rows("bad.jpg", error="cannot identify image file"))
+    assert writer.flush() == ["a.jpg", "b.jpg"]
+    assert writer.close() == []
+    # The failure is still recorded in the output
+    assert [r["image_path"] for r in read_jsonl(tmp_path)] == ["a.jpg", "b.jpg", "bad.jpg"]
+    assert read_jsonl(tmp_path)[2]["error"] == "cannot identify image file"
+
+
+def test_failed_images_are_retried_on_rerun(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path))
+    writer = ResultWriter(str(tmp_path), "jsonl")
+    writer.write(rows("a.jpg") + rows("bad.jpg", error="truncated"))
+    checkpoint.mark_done(writer.close())
+
+    rerun = Checkpoint(str(tmp_path))
+    assert rerun.is_done("a.jpg")
+    assert not rerun.is_done("bad.jpg")
+
+
+def test_jsonl_resume_discards_uncommitted_tail(tmp_path):
+    writer = ResultWriter(str(tmp_path), "jsonl")
+    writer.write(rows("a.jpg"))
+    writer.flush()
+    committed = writer.state()
+    writer.write(rows("b.jpg"))
+    writer.close()  # b.jpg reached the file but not the manifest
+
+    resumed = ResultWriter(str(tmp_path), "jsonl", committed=committed)
+    resumed.write(rows("b.jpg"))
+    resumed.close()
+    assert [r["image_path"] for r in read_jsonl(tmp_path)] == ["a.jpg", "b.jpg"]
+
+
+def test_unknown_output_format(tmp_path):
+    with pytest.raises(ValueError):
+        ResultWriter(str(tmp_path), "csv")
+
+
+def test_parquet_parts_are_durable_only_when_closed(tmp_path):
+    pytest.importorskip("pyarrow")
+    writer = ResultWriter(str(tmp_path), "parquet", rows_per_part=2)
+    writer.write(rows("a.jpg"))
+    assert writer.flush() == []
+    writer.write(rows("b.jpg") + rows("bad.jpg", error="truncated"))
+    assert writer.flush() == ["a.jpg", "b.jpg"]
+    assert len(writer.state()["files"]) == 1
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import time
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from orchestrator.dispatcher import DEFAULT_COLD_LOAD, Dispatcher
+from services.inference_executor import ExecutorConfig, InferenceExecutor
+
+Key = namedtuple("Key", "model_path")
+
+
+def pid(key):
+    return os.getpid()
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = Dispatcher()
+    dispatcher.register("detect", "yolo")
+    for worker_id in ("w1", "w2"):
+        dispatcher.add_worker(worker_id, "yolo")
+    return dispatcher
+
+
+def test_least_expected_wait_wins(dispatcher):
+    dispatcher.heartbeat("w1", queue_depth=3)
+    assert dispatcher.select("detect") == "w2"
+
+
+def test_latency_weighs_queue_depth(dispatcher):
+    dispatcher.complete("w1", latency=0.1)
+    dispatcher.complete("w2", latency=2.0)
+    dispatcher.heartbeat("w1", queue_depth=4)
+    # 5 * 0.1 beats 1 * 2.0
+    assert dispatcher.select("detect") == "w1"
+
+
+def test_loaded_model_beats_cold_load(dispatcher):
+    dispatcher.heartbeat("w2", queue_depth=1, loaded_models=["a.pt"])
+    assert dispatcher.select("detect", model="a.pt") == "w2"
+    assert dispatcher.counters["affinity_hits"] == 1
+    # Without the model loaded, the cold-load penalty outweighs the queue
+    dispatcher.heartbeat("w1", queue_depth=0)
+    assert dispatcher.select("detect", model="b.pt") == "w1"
+    assert dispatcher.counters["cold_routes"] == 1
+    assert dispatcher.decisions[-1]["candidates"]["w1"] == 1.0 + DEFAULT_COLD_LOAD
+
+
+def test_ties_go_to_least_picked(dispatcher):
+    picks = [dispatcher.select("detect") for _ in range(2)]
+    assert sorted(picks) == ["w1", "w2"]
+
+
+def test_complete_frees_slot_and_records_model(dispatcher):
+    worker_id = dispatcher.select("detect", model="a.pt")
+    dispatcher.complete(worker_id, latency=0.5, model="a.pt", cold_load_time=3.0)
+    state = dispatcher.metrics()["workers"][worker_id]
+    assert state["queue_depth"] == 0 and state["latency_ewma"] == 0.5
+    assert state["loaded_models"] == ["a.pt"]
+    assert dispatcher.cold_load_ewma == 3.0
+
+
+def test_stale_workers_are_skipped():
+    dispatcher = Dispatcher(heartbeat_timeout=10)
+    dispatcher.register("detect", "yolo")
+    dispatcher.add_worker("w1", "yolo")
+    dispatcher.workers["w1"].last_seen = time.time() - 60
+    assert dispatcher.select("detect") is None
+    assert dispatcher.counters["no_worker"] == 1
+    dispatcher.heartbeat("w1")
+    assert dispatcher.select("detect") == "w1"
+
+
+def test_render_prometheus(dispatcher):
+    dispatcher.complete("w1", latency=0.25)
+    text = dispatcher.render_prometheus()
+    assert "eye_dispatcher_decisions_total 0" in text
+    assert 'eye_dispatcher_worker_latency_ewma_seconds{worker="w1",engine="yolo"} 0.25' in text
+    assert 'worker="w2",engine="yolo"} 0.25' not in text
+
+
+def test_process_executor_routes_through_dispatcher():
+    executor = InferenceExecutor(ExecutorConfig(mode="process", workers=2))
+
+    async def run():
+        first = await executor.run(pid, Key("a.pt"))
+        second = await executor.run(pid, Key("b.pt"))
+        again = await executor.run(pid, Key("a.pt"))
+        return first, second, again
+
+    try:
+        first, second, again = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    # Each model stays on the process that loaded it
+    assert first != second and again == first
+    counters = executor.dispatcher.metrics()["counters"]
+    assert counters["decisions"] == 3 and counters["affinity_hits"] == 1
+    assert all(w["queue_depth"] == 0 for w in executor.dispatcher.metrics()["workers"].values())
+
+
+def record_pid(key, directory):
+    with open(os.path.join(directory, f"{os.getpid()}.{key.model_path}"), "w"):
+        pass
+    return os.getpid()
+
+
+def crash(key):
+    os._exit(3)
+
+
+def test_broadcast_preloads_every_process_and_rewarms_restarts(tmp_path):
+    executor = InferenceExecutor(ExecutorConfig(mode="process", workers=2))
+    try:
+        pids = executor.broadcast(record_pid, Key("a.pt"), str(tmp_path))
+        assert len(set(pids)) == 2
+        assert all(w["loaded_models"] == ["a.pt"] for w in executor.dispatcher.metrics()["workers"].values())
+
+        async def run():
+            await executor.run(pid, Key("a.pt"))
+            with pytest.raises(BrokenProcessPool):
+                await executor.run(crash, Key("a.pt"))
+
+        asyncio.run(run())
+        assert executor.dispatcher.counters["cold_routes"] == 0
+        # The replacement process replays the preload before it counts as warm
+        deadline = time.time() + 30
+        while executor.cold_workers() or len(os.listdir(tmp_path)) < 3:
+            assert time.time() < deadline, "re-warm did not finish"
+            time.sleep(0.05)
+        assert all(w["loaded_models"] == ["a.pt"] for w in executor.dispatcher.metrics()["workers"].values())
+    finally:
+        executor.shutdown()
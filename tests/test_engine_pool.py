@@ -0,0 +1,136 @@
+import asyncio
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from engines import pool as pool_module
+from engines.base import EngineNode
+from engines.pool import EnginePool, NoWorkersAvailable, WorkerCrashed
+from services import inference_executor
+from services.inference_executor import ExecutorConfig, InferenceExecutor, PooledCall, register_pooled
+
+Key = namedtuple("Key", "model_path device")
+
+
+class EchoEngine(EngineNode):
+    """Reports input shapes; the path "crash" kills the worker, a marker file fails load()"""
+
+    def load(self, weights_path: str) -> None:
+        if os.path.exists(weights_path):
+            raise RuntimeError("weights unreadable")
+
+    def infer(self, input_path: str):
+        return {"input": input_path, "detections": []}
+
+    def infer_batch(self, inputs, **kwargs):
+        if "crash" in [i for i in inputs if isinstance(i, str)]:
+            os._exit(3)
+        return [{"shape": list(i.shape) if isinstance(i, np.ndarray) else i, "detections": []} for i in inputs]
+
+
+@pytest.fixture(autouse=True)
+def fast_restarts(monkeypatch):
+    monkeypatch.setattr(pool_module, "RESTART_DELAY", 0.05)
+    monkeypatch.setattr(pool_module, "LIVENESS_INTERVAL", 0.05)
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def make_pool(tmp_path, **kwargs):
+    kwargs.setdefault("num_workers", 1)
+    return EnginePool(EchoEngine, str(tmp_path / "fail-load"), threads_per_worker=1, pin_cpus=False,
+                      batch_size=2, slot_bytes=1024 * 1024, start_timeout=60, **kwargs)
+
+
+def test_results_come_back_in_order(tmp_path):
+    with make_pool(tmp_path, num_workers=2) as pool:
+        inputs = [np.zeros((4, 4 + i, 3), dtype=np.uint8) for i in range(5)]
+        results = pool.infer_batch(inputs)
+    assert [r["shape"] for r in results] == [[4, 4 + i, 3] for i in range(5)]
+
+
+def test_crashed_batch_fails_and_worker_restarts(tmp_path):
+    with make_pool(tmp_path) as pool:
+        with pytest.raises(WorkerCrashed):
+            pool.submit(["crash"]).result(timeout=30)
+        assert pool.submit(["ok.jpg"]).result(timeout=30) == [{"shape": "ok.jpg", "detections": []}]
+        stats = pool.stats()
+    # Retried once, so the worker died twice
+    assert stats["workers"][0]["restarts"] == 2
+    assert not stats["degraded"]
+
+
+def test_worker_that_cannot_reload_is_given_up(tmp_path):
+    with make_pool(tmp_path, max_restarts=2) as pool:
+        (tmp_path / "fail-load").write_text("")
+        # The retry waits for a restart that never loads
+        with pytest.raises(NoWorkersAvailable):
+            pool.submit(["crash"]).result(timeout=30)
+        wait_for(lambda: pool.degraded)
+        stats = pool.stats()["workers"][0]
+        assert stats["gave_up"] and stats["last_error"] == "weights unreadable"
+        with pytest.raises(NoWorkersAvailable):
+            pool.submit(["ok.jpg"])
+
+
+class ShapeEngine(EngineNode):
+    """Pool-mode engine for the executor test: reports shapes and its process"""
+
+    def __init__(self, device):
+        self.device = device
+
+    def load(self, weights_path: str) -> None:
+        self.weights_path = weights_path
+
+    def infer(self, input_path: str):
+        raise NotImplementedError
+
+    def infer_batch(self, inputs, scale):
+        return [{"shape": list(i.shape), "scale": scale, "pid": os.getpid(),
+                 "model": f"{self.weights_path}@{self.device}"} for i in inputs]
+
+
+def shapes(key, arrays):
+    return [{"pid": os.getpid()} for _ in arrays]
+
+
+register_pooled(shapes, PooledCall(
+    engine=ShapeEngine,
+    split=lambda key, arrays: (key.model_path, key.device, arrays, {"scale": 2}),
+))
+
+
+def local(key):
+    return os.getpid()
+
+
+def test_executor_pool_mode_runs_registered_calls_on_engine_pool(monkeypatch):
+    # Only this test's call, not the detection engine registered on import
+    monkeypatch.setattr(inference_executor, "_pooled_calls", {shapes: inference_executor._pooled_calls[shapes]})
+    executor = InferenceExecutor(ExecutorConfig(mode="pool", workers=2))
+    key = Key("a.pt", "cpu")
+
+    async def run():
+        pooled = await executor.run(shapes, key, [np.zeros((4, 5, 3), dtype=np.uint8)])
+        unregistered = await executor.run(local, key)
+        return pooled, unregistered
+
+    try:
+        pooled, unregistered = asyncio.run(run())
+        assert pooled == [{"shape": [4, 5, 3], "scale": 2, "pid": pooled[0]["pid"], "model": "a.pt@cpu"}]
+        assert pooled[0]["pid"] != os.getpid()
+        assert unregistered == os.getpid()
+        # Warm-up starts the model's pool; it is reused by later calls
+        executor.broadcast(local, Key("b.pt", "cpu"))
+        assert sorted(executor.stats()["engine_pools"]) == ["a.pt@cpu", "b.pt@cpu"]
+        assert len(executor.stats()["engine_pools"]["a.pt@cpu"]["workers"]) == 2
+    finally:
+        executor.shutdown()
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from orchestrator.workers.job_events import JOB_EVENTS_STREAM
+from services import job_event_hub
+from services.job_event_hub import JobEventHub, JobEventsConfig
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(job_event_hub.aioredis.Redis, "from_url", lambda url: client)
+    return JobEventHub(JobEventsConfig(read_block_ms=50))
+
+
+def publish(hub, job_id, status):
+    return hub.client.xadd(JOB_EVENTS_STREAM, {"source": "jobs", "job_id": job_id, "status": status})
+
+
+def test_event_between_subscribe_and_snapshot_is_delivered(hub):
+    async def run():
+        await publish(hub, "old", "QUEUED")
+        subscription = await hub.subscribe(["1"])
+        # Published before the snapshot reads the head, which the tail may not have read yet
+        await publish(hub, "1", "RUNNING")
+        await hub.client.hset("eye:job:1", mapping={"status": "RUNNING"})
+        snapshot = await hub.snapshot(subscription)
+        await publish(hub, "1", "SUCCEEDED")
+        received = await subscription.next(2.0)
+        await hub.close()
+        return snapshot, received
+
+    snapshot, (_, event) = asyncio.run(run())
+    assert snapshot[0]["status"] == "RUNNING"
+    assert event["status"] == "SUCCEEDED"
+
+
+def test_tail_on_empty_stream_reads_from_start(hub):
+    async def run():
+        subscription = await hub.subscribe(["1"])
+        await publish(hub, "1", "RUNNING")
+        received = await subscription.next(2.0)
+        await hub.close()
+        return received
+
+    _, event = asyncio.run(run())
+    assert event["status"] == "RUNNING"
+
+
+def test_one_tail_for_concurrent_subscribers(hub):
+    async def run():
+        first, second = await asyncio.gather(hub.subscribe(["1"]), hub.subscribe(["1"]))
+        tails = [task for task in asyncio.all_tasks() if task.get_coro().__name__ == "_tail"]
+        await publish(hub, "1", "RUNNING")
+        received = [await first.next(2.0), await second.next(2.0)]
+        await hub.close()
+        return tails, received
+
+    tails, received = asyncio.run(run())
+    assert len(tails) == 1
+    assert [event["status"] for _, event in received] == ["RUNNING", "RUNNING"]
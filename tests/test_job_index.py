@@ -0,0 +1,143 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from orchestrator.workers.job_index import (
+    JOB_HASH_KEY,
+    JOBS_BY_STATUS_ZSET,
+    JOBS_BY_TYPE_ZSET,
+    JOBS_INDEXED_KEY,
+    JOBS_RECENT_ZSET,
+)
+from orchestrator.workers.reliable_queue import Delivery
+from orchestrator.workers.runtime import WorkerRuntime
+from services import jobs
+
+
+class Queue:
+    def __init__(self, client):
+        self.client = client
+
+
+@pytest.fixture
+def store(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(jobs.redis.Redis, "from_url", lambda url: client)
+    return jobs.JobsStore()
+
+
+def members(client, key):
+    return [m.decode() for m in client.zrange(key, 0, -1)]
+
+
+def add_job(client, job_id, created_at, job_type="detect", status="QUEUED", indexed=True):
+    client.hset(JOB_HASH_KEY.format(job_id=job_id),
+                mapping={"id": job_id, "type": job_type, "status": status, "created_at": created_at})
+    client.zadd(JOBS_RECENT_ZSET, {job_id: created_at})
+    if indexed:
+        client.zadd(JOBS_BY_TYPE_ZSET.format(job_type=job_type), {job_id: created_at})
+        client.zadd(JOBS_BY_STATUS_ZSET.format(status=status), {job_id: created_at})
+
+
+def ids(page):
+    return [job["id"] for job in page]
+
+
+def test_set_status_moves_the_status_index(store):
+    job_id = store.create_job("detect", {})
+    assert store.set_status(job_id, "RUNNING") is True
+    assert store.get_job(job_id)["status"] == "RUNNING"
+    assert members(store.client, JOBS_BY_STATUS_ZSET.format(status="QUEUED")) == []
+    assert members(store.client, JOBS_BY_STATUS_ZSET.format(status="RUNNING")) == [job_id]
+
+
+def test_set_status_of_missing_job_writes_nothing(store):
+    assert store.set_status("gone", "RUNNING") is False
+    assert store.get_job("gone") is None
+    assert members(store.client, JOBS_BY_STATUS_ZSET.format(status="RUNNING")) == []
+
+
+def test_runtime_status_update_keeps_index(store):
+    job_id = store.create_job("detect", {})
+    runtime = WorkerRuntime(Queue(store.client), handler=lambda job: {}, index_statuses=True)
+    try:
+        pipe = store.client.pipeline()
+        runtime._set_status(pipe, Delivery(raw=b"{}", job={"id": job_id}, attempt=2),
+                            {"status": "FAILED", "error": "boom"})
+        pipe.execute()
+    finally:
+        runtime._executor.shutdown()
+    assert store.get_job(job_id)["error"] == "boom"
+    assert members(store.client, JOBS_BY_STATUS_ZSET.format(status="FAILED")) == [job_id]
+    assert members(store.client, JOBS_BY_STATUS_ZSET.format(status="QUEUED")) == []
+
+
+def test_cursor_pages_cover_ties_once(store):
+    for i in range(5):
+        add_job(store.client, f"j{i}", 100)
+    add_job(store.client, "new", 200)
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.list_page(limit=2, cursor=cursor)
+        seen += ids(page)
+        if cursor is None:
+            break
+    assert seen == ["new", "j4", "j3", "j2", "j1", "j0"]
+
+
+def test_unfiltered_offset_past_scan_cap(store, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_PAGE_SCAN", 5)
+    for i in range(20):
+        add_job(store.client, f"j{i:02d}", 1000 - i)
+    page, _ = store.list_page(limit=3, offset=12)
+    assert ids(page) == ["j12", "j13", "j14"]
+
+
+def test_filtered_offset_past_scan_cap(store, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_PAGE_SCAN", 5)
+    for i in range(20):
+        add_job(store.client, f"j{i:02d}", 1000 - i, job_type="detect" if i % 2 else "train")
+    page, _ = store.list_page(limit=2, offset=6, job_type="detect", status="QUEUED")
+    assert ids(page) == ["j13", "j15"]
+    # Skipped entries are not fetched
+    reads = []
+    original = store._get_jobs
+    monkeypatch.setattr(store, "_get_jobs", lambda job_ids: reads.extend(job_ids) or original(job_ids))
+    store.list_page(limit=2, offset=6, job_type="detect", status="QUEUED")
+    assert reads == ["j13", "j15"]
+
+
+def test_scan_cap_returns_a_cursor(store, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_PAGE_SCAN", 3)
+    for i in range(6):
+        add_job(store.client, f"t{i}", 100 - i, job_type="train")
+    add_job(store.client, "d", 10)
+    page, cursor = store.list_page(limit=2, job_type="detect", status="QUEUED")
+    assert page == [] and cursor is not None
+    while cursor and not page:
+        page, cursor = store.list_page(limit=2, cursor=cursor, job_type="detect", status="QUEUED")
+    assert ids(page) == ["d"]
+
+
+def test_entries_without_hash_are_skipped(store):
+    for i in range(4):
+        add_job(store.client, f"j{i}", 100 - i)
+    store.client.delete(JOB_HASH_KEY.format(job_id="j1"))
+    page, _ = store.list_page(limit=3, status="QUEUED")
+    assert ids(page) == ["j0", "j2", "j3"]
+
+
+def test_ensure_indexed_indexes_legacy_jobs_once(store):
+    add_job(store.client, "legacy", 100, job_type="train", status="SUCCEEDED", indexed=False)
+    # Stale entry from before status indexes were kept in step
+    store.client.zadd(JOBS_BY_STATUS_ZSET.format(status="RUNNING"), {"legacy": 100})
+    assert store.list_page(status="SUCCEEDED")[0] == []
+
+    assert store.ensure_indexed() == 1
+    assert ids(store.list_page(status="SUCCEEDED")[0]) == ["legacy"]
+    assert ids(store.list_page(job_type="train")[0]) == ["legacy"]
+    assert members(store.client, JOBS_BY_STATUS_ZSET.format(status="RUNNING")) == []
+    assert store.client.exists(JOBS_INDEXED_KEY)
+
+    add_job(store.client, "later", 200, indexed=False)
+    assert store.ensure_indexed() == 0
@@ -0,0 +1,189 @@
+import pytest
+
+from orchestrator.workers.job_index import (
+    JOB_HASH_KEY,
+    JOBS_BY_STATUS_ZSET,
+    JOBS_BY_TYPE_ZSET,
+    JOBS_INDEXED_KEY,
+    JOBS_RECENT_ZSET,
+)
+from services import job_retention
+from services.job_retention import (
+    EXTEND_LOCK_SCRIPT,
+    LOCK_KEY,
+    RELEASE_LOCK_SCRIPT,
+    JobCompactor,
+    JobRetentionConfig,
+)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.replies = []
+
+    def _rows(self, key):
+        return sorted(((m.encode(), s) for m, s in self.client.zsets.get(key, {}).items()), key=lambda r: r[1])
+
+    def zrange(self, key, start, stop, withscores=False):
+        self.replies.append(self._rows(key)[start:stop + 1])
+
+    def zrangebyscore(self, key, low, high, start=0, num=None, withscores=False):
+        rows = [r for r in self._rows(key) if r[1] <= high]
+        self.replies.append(rows[start:start + num])
+
+    def execute(self):
+        return self.replies
+
+
+class FakeRedis:
+    def __init__(self):
+        self.zsets = {}
+        self.strings = {JOBS_INDEXED_KEY: "1"}
+
+    def exists(self, key):
+        return int(key in self.strings)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value
+        return True
+
+    def register_script(self, script):
+        def extend(keys, args):
+            return int(self.strings.get(keys[0]) == args[0])
+
+        def release(keys, args):
+            if self.strings.get(keys[0]) == args[0]:
+                del self.strings[keys[0]]
+                return 1
+            return 0
+
+        return {EXTEND_LOCK_SCRIPT: extend, RELEASE_LOCK_SCRIPT: release}.get(script, lambda **kwargs: [0, 0])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(job_retention.redis.Redis, "from_url", lambda url: fake)
+    return fake
+
+
+def add_jobs(client, status, **scores):
+    client.zsets.setdefault(JOBS_BY_STATUS_ZSET.format(status=status), {}).update(scores)
+    client.zsets.setdefault(JOBS_RECENT_ZSET, {}).update(scores)
+
+
+def compactor(**kwargs):
+    kwargs.setdefault("max_jobs", 0)
+    return JobCompactor(JobRetentionConfig(**kwargs))
+
+
+def test_candidates_are_expired_finished_jobs_oldest_first(client):
+    add_jobs(client, "SUCCEEDED", a=800, b=950)
+    add_jobs(client, "FAILED", c=850)
+    add_jobs(client, "RUNNING", old=100)
+    assert compactor(retention_seconds=100)._candidates(1000) == ["a", "c"]
+
+
+def test_candidates_include_oldest_jobs_over_the_cap(client):
+    add_jobs(client, "SUCCEEDED", a=800, b=950, d=990)
+    add_jobs(client, "RUNNING", r1=100, r2=200)
+    # 5 records with a cap of 3: the two oldest finished jobs go, although none has expired
+    assert compactor(retention_seconds=10_000, max_jobs=3)._candidates(1000) == ["a", "b"]
+
+
+def test_candidates_are_limited_to_one_batch(client):
+    add_jobs(client, "SUCCEEDED", a=1, b=2, c=3)
+    add_jobs(client, "FAILED", d=0)
+    assert compactor(retention_seconds=100, batch_size=2)._candidates(1000) == ["d", "a"]
+
+
+def test_lock_is_extended_per_batch_and_released_with_token(client):
+    job_compactor = compactor(max_batches=3)
+    batches = [["a"], ["b"], []]
+    job_compactor._candidates = lambda now: batches.pop(0)
+    job_compactor._compact_batch = lambda job_ids: len(job_ids)
+    job_compactor.run_once()
+    assert batches == [] and LOCK_KEY not in client.strings
+
+
+def test_lost_lock_stops_the_pass_and_is_not_released(client):
+    job_compactor = compactor(max_batches=5)
+    compacted = []
+    job_compactor._candidates = lambda now: ["a"]
+
+    def compact(job_ids):
+        compacted.append(job_ids)
+        # The lock expired mid-batch and another replica took it
+        client.strings[LOCK_KEY] = "other"
+        return 1
+
+    job_compactor._compact_batch = compact
+    job_compactor.run_once()
+    assert len(compacted) == 1
+    assert client.strings[LOCK_KEY] == "other"
+
+
+def test_held_lock_skips_the_run(client):
+    client.strings[LOCK_KEY] = "other"
+    assert compactor().run_once()["runs"] == 0
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    fake = fakeredis.FakeRedis()
+    monkeypatch.setattr(job_retention.redis.Redis, "from_url", lambda url: fake)
+    return fake
+
+
+def add_job(client, job_id, created_at, status, indexed=True):
+    client.hset(JOB_HASH_KEY.format(job_id=job_id),
+                mapping={"id": job_id, "type": "detect", "status": status, "created_at": created_at})
+    client.zadd(JOBS_RECENT_ZSET, {job_id: created_at})
+    if indexed:
+        client.zadd(JOBS_BY_TYPE_ZSET.format(job_type="detect"), {job_id: created_at})
+        client.zadd(JOBS_BY_STATUS_ZSET.format(status=status), {job_id: created_at})
+
+
+def keys_of(client):
+    return sorted(key.decode() for key in client.keys("eye:job*") if key.decode() != JOBS_INDEXED_KEY)
+
+
+def test_compaction_removes_expired_jobs_and_index_entries(redis_client):
+    add_job(redis_client, "old", 100, "SUCCEEDED")
+    add_job(redis_client, "running", 100, "RUNNING")
+    redis_client.zadd(JOBS_BY_STATUS_ZSET.format(status="FAILED"), {"orphan": 50})
+    redis_client.zadd(JOBS_RECENT_ZSET, {"orphan": 50})
+    stats = compactor(retention_seconds=10).run_once()
+    assert stats["jobs_deleted"] == 1 and stats["orphans_removed"] == 1
+    assert keys_of(redis_client) == [
+        "eye:job:running", "eye:jobs:by_status:RUNNING", "eye:jobs:by_type:detect", "eye:jobs:recent",
+    ]
+    assert redis_client.zrange(JOBS_RECENT_ZSET, 0, -1) == [b"running"]
+
+
+def test_job_that_left_finished_status_is_kept(redis_client):
+    add_job(redis_client, "retried", 100, "FAILED")
+    job_compactor = compactor(retention_seconds=10)
+    job_ids = job_compactor._candidates(1000)
+    # Requeued after it was picked
+    job_compactor.store.set_status("retried", "QUEUED")
+    assert job_compactor._compact_batch(job_ids) == 0
+    assert redis_client.hget(JOB_HASH_KEY.format(job_id="retried"), "status") == b"QUEUED"
+
+
+def test_legacy_jobs_are_indexed_and_expired(redis_client):
+    add_job(redis_client, "legacy", 100, "SUCCEEDED", indexed=False)
+    stats = compactor(retention_seconds=10).run_once()
+    assert stats["jobs_deleted"] == 1
+    assert not redis_client.exists(JOB_HASH_KEY.format(job_id="legacy"))
+    assert redis_client.zcard(JOBS_RECENT_ZSET) == 0
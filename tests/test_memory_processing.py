@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from orchestrator.workers.reliable_queue import Delivery
+from services.memory_processing_service import MemoryProcessingService, ProcessingJob
+
+
+class FakeQueue:
+    """Hands out the given deliveries, then stops the service; ack and nack fail"""
+
+    def __init__(self, service, deliveries):
+        self.service = service
+        self.deliveries = list(deliveries)
+        self.nacked = []
+
+    def receive(self, timeout):
+        if not self.deliveries:
+            self.service.is_running = False
+            return None
+        return self.deliveries.pop(0)
+
+    def ack(self, delivery):
+        raise ConnectionError("redis went away")
+
+    def nack(self, delivery, error):
+        self.nacked.append(error)
+        raise ConnectionError("redis went away")
+
+    def will_retry(self, delivery):
+        return True
+
+
+def delivery(job_id):
+    return Delivery(raw=job_id.encode(), job={"id": job_id, "memory_id": "m", "image_uuid": "u"}, attempt=1)
+
+
+def make_service(handler=None):
+    service = MemoryProcessingService()
+    if handler is not None:
+        service.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+def test_consumer_survives_failed_ack_and_nack():
+    service = make_service()
+    processed = []
+
+    async def process(job):
+        processed.append(job.job_id)
+        if job.job_id == "bad":
+            raise RuntimeError("step failed")
+
+    async def save(job, pipe=None):
+        pass
+
+    async def run():
+        service.queue = FakeQueue(service, [delivery("ok"), delivery("bad"), delivery("ok-2")])
+        service._queue_executor = ThreadPoolExecutor(max_workers=1)
+        service._process_job = process
+        service._save = save
+        service.is_running = True
+        try:
+            await service._consume()
+        finally:
+            service._queue_executor.shutdown()
+
+    asyncio.run(run())
+    assert processed == ["ok", "bad", "ok-2"]
+    assert service.queue.nacked == ["step failed"]
+
+
+@pytest.mark.parametrize("step", ["detection", "llm", "update"])
+def test_step_failures_raise(step):
+    service = make_service(lambda request: httpx.Response(500))
+    job = ProcessingJob(job_id="j", memory_id="m", image_uuid="u", user_tags=[], user_notes=None,
+                        yolo_results={})
+
+    async def run():
+        try:
+            if step == "detection":
+                await service._run_yolo_detection(b"jpeg")
+            elif step == "llm":
+                await service._run_llm_processing(b"jpeg", {})
+            else:
+                await service._update_memory_record(job)
+        finally:
+            await service.http_client.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from services.model_export import (
+    ExportInProgress,
+    ModelExportConfig,
+    ModelExporter,
+    artifact_path,
+)
+
+
+class FakeModel:
+    """Writes <stem>.onnx next to the weights it was loaded from, like ultralytics"""
+
+    def __init__(self, path, release=None):
+        self.path = path
+        self.release = release
+
+    def export(self, **kwargs):
+        out = os.path.splitext(self.path)[0] + ".onnx"
+        with open(out, "wb") as f:
+            f.write(b"partial")
+            if self.release is not None:
+                self.release.wait(5)
+            f.write(b"-graph")
+        return out
+
+
+@pytest.fixture(autouse=True)
+def fake_onnx(monkeypatch):
+    monkeypatch.setitem(sys.modules, "onnx", types.ModuleType("onnx"))
+
+
+@pytest.fixture
+def weights(tmp_path):
+    path = tmp_path / "model.pt"
+    path.write_bytes(b"weights")
+    return str(path)
+
+
+def test_export_is_renamed_into_place(weights, tmp_path):
+    loaded = []
+
+    def loader(path):
+        loaded.append(path)
+        return FakeModel(path)
+
+    exporter = ModelExporter(ModelExportConfig(), loader=loader)
+    target = exporter.ensure(weights, "onnx")
+
+    assert target == artifact_path(weights, "onnx")
+    with open(target, "rb") as f:
+        assert f.read() == b"partial-graph"
+    # Exported from a temp name, never from the real weights path
+    assert loaded and loaded[0] != weights
+    assert sorted(os.listdir(tmp_path)) == ["model.onnx", "model.pt"]
+
+
+def test_target_never_partially_written(weights):
+    release = threading.Event()
+    exporter = ModelExporter(ModelExportConfig(), loader=lambda path: FakeModel(path, release))
+    thread = threading.Thread(target=exporter.ensure, args=(weights, "onnx"))
+    thread.start()
+    time.sleep(0.1)
+    assert not os.path.exists(artifact_path(weights, "onnx"))
+    release.set()
+    thread.join(5)
+    assert os.path.exists(artifact_path(weights, "onnx"))
+
+
+def test_ensure_background_raises_until_export_finishes(weights):
+    release = threading.Event()
+    exporter = ModelExporter(ModelExportConfig(retry_after=7), loader=lambda path: FakeModel(path, release))
+
+    with pytest.raises(ExportInProgress) as first:
+        exporter.ensure_background(weights, "onnx")
+    assert first.value.retry_after == 7
+    with pytest.raises(ExportInProgress):
+        exporter.ensure_background(weights, "onnx")
+    assert len(exporter._pending) == 1
+
+    release.set()
+    exporter._pending[artifact_path(weights, "onnx")].result(5)
+    assert exporter.ensure_background(weights, "onnx") == artifact_path(weights, "onnx")
+    assert exporter._pending == {}
+
+
+def test_ensure_background_reports_failure_once(weights):
+    calls = []
+
+    def loader(path):
+        calls.append(path)
+        raise ValueError("bad weights")
+
+    exporter = ModelExporter(ModelExportConfig(), loader=loader)
+    with pytest.raises(ExportInProgress):
+        exporter.ensure_background(weights, "onnx")
+    exporter._pending[artifact_path(weights, "onnx")].exception(5)
+
+    with pytest.raises(ValueError):
+        exporter.ensure_background(weights, "onnx")
+    # The next request starts a new attempt
+    with pytest.raises(ExportInProgress):
+        exporter.ensure_background(weights, "onnx")
+    exporter._pending[artifact_path(weights, "onnx")].exception(5)
+    assert len(calls) == 2
+
+
+def test_torch_backend_needs_no_export(weights):
+    exporter = ModelExporter(ModelExportConfig(), loader=lambda path: pytest.fail("no export expected"))
+    assert exporter.ensure_background(weights, "torch") == weights
@@ -0,0 +1,113 @@
+import threading
+
+from services import model_warmup
+from services.model_warmup import (
+    STATE_FAILED,
+    STATE_READY,
+    ModelWarmup,
+    WarmupConfig,
+    WarmupModel,
+)
+
+
+class FlakyWarmup(ModelWarmup):
+    """Fails the first `failures` warm-ups of each model"""
+
+    def __init__(self, config, failures):
+        super().__init__(config)
+        self.failures = dict(failures)
+        self.calls = []
+
+    def _warm_model(self, model):
+        self.calls.append(model.name)
+        if self.failures.get(model.name, 0) > 0:
+            self.failures[model.name] -= 1
+            raise RuntimeError("weights not mounted yet")
+        return {"model": model.name, "backend": model.backend, "status": STATE_READY}
+
+
+def config(**kwargs):
+    kwargs.setdefault("models", [WarmupModel("a.pt"), WarmupModel("b.pt")])
+    return WarmupConfig(enabled=True, retry_delay=0.01, retry_max_delay=0.02, **kwargs)
+
+
+def test_strict_mode_retries_until_ready():
+    warmup = FlakyWarmup(config(strict=True), {"b.pt": 2})
+    warmup.run()
+    assert warmup.ready
+    # Only the failed model is retried
+    assert warmup.calls == ["a.pt", "b.pt", "b.pt", "b.pt"]
+    assert [r["attempts"] for r in warmup.status()["models"]] == [1, 3]
+    assert warmup.status()["next_retry_at"] is None
+
+
+def test_strict_mode_gives_up_after_max_attempts():
+    warmup = FlakyWarmup(config(strict=True, max_attempts=2), {"a.pt": 5})
+    warmup.run()
+    assert warmup.state == STATE_FAILED
+    assert warmup.calls.count("a.pt") == 2
+
+
+def test_non_strict_mode_is_ready_without_retrying():
+    warmup = FlakyWarmup(config(strict=False), {"a.pt": 1})
+    warmup.run()
+    assert warmup.ready
+    assert warmup.calls == ["a.pt", "b.pt"]
+    assert warmup.status()["models"][0]["status"] == STATE_FAILED
+
+
+def test_stop_ends_retries():
+    warmup = FlakyWarmup(
+        WarmupConfig(enabled=True, strict=True, retry_delay=30, models=[WarmupModel("a.pt")]),
+        {"a.pt": 100},
+    )
+    thread = threading.Thread(target=warmup.run)
+    thread.start()
+    while warmup.next_retry_at is None:
+        thread.join(0.01)
+    warmup.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert warmup.state == STATE_FAILED
+
+
+def test_disabled_warmup_is_ready():
+    warmup = FlakyWarmup(WarmupConfig(enabled=False), {})
+    warmup.run()
+    assert warmup.ready and warmup.calls == []
+
+
+class FakeExecutor:
+    def __init__(self, workers=2, cold=()):
+        self.workers = workers
+        self.cold = list(cold)
+        self.calls = []
+
+    def broadcast(self, fn, *args):
+        self.calls.append((fn, args))
+        return [{"load_time": 0.5 + i, "batch_times": {"1": [0.1]}} for i in range(self.workers)]
+
+    def cold_workers(self):
+        return self.cold
+
+
+def test_models_are_warmed_in_every_worker(monkeypatch, tmp_path):
+    weights = tmp_path / "a.pt"
+    weights.write_bytes(b"weights")
+    executor = FakeExecutor(workers=3)
+    monkeypatch.setattr(model_warmup, "get_inference_executor", lambda: executor)
+    warmup = ModelWarmup(WarmupConfig(enabled=True, models=[WarmupModel(str(weights))]))
+    warmup.run()
+    assert warmup.ready
+    assert executor.calls[0][0] is model_warmup.warm_worker
+    assert executor.calls[0][1][0].model_path == str(weights)
+    result = warmup.status()["models"][0]
+    assert result["workers"] == 3 and result["load_time"] == 2.5
+
+
+def test_not_ready_while_a_worker_rewarms(monkeypatch):
+    monkeypatch.setattr(model_warmup, "get_inference_executor", lambda: FakeExecutor(cold=["process-1"]))
+    warmup = FlakyWarmup(WarmupConfig(enabled=False), {})
+    warmup.run()
+    status = warmup.status()
+    assert not status["ready"] and status["cold_workers"] == ["process-1"]
@@ -0,0 +1,45 @@
+import pytest
+from redis.crc import key_slot
+
+from orchestrator.workers.reliable_queue import Delivery, ReliableQueue
+
+
+class RecordingClient:
+    """Records the KEYS each script is called with"""
+
+    def __init__(self):
+        self.calls = []
+
+    def register_script(self, script):
+        def call(keys, args, client=None):
+            self.calls.append(keys)
+            return 0
+        return call
+
+    def zrangebyscore(self, key, low, high):
+        self.calls.append([key])
+        return [b"dead-consumer"]
+
+    def zadd(self, key, mapping):
+        self.calls.append([key])
+
+
+@pytest.mark.parametrize("queue_key", ["eye:jobs", "{eye}:yolo_e:jobs"])
+def test_script_keys_share_the_queue_slot(queue_key):
+    client = RecordingClient()
+    queue = ReliableQueue(client, queue_key, consumer_id="c1")
+    queue.nack(Delivery(raw=b"{}", job={}, attempt=1), "boom")
+    queue.release([Delivery(raw=b"{}", job={}, attempt=1)])
+    queue.maintain(force=True)
+
+    keys = [key for call in client.calls for key in call]
+    assert queue.processing_key in keys and queue.dead_key in keys
+    assert any("dead-consumer" in key for key in keys)
+    assert {key_slot(key.encode()) for key in keys} == {key_slot(queue_key.encode())}
+
+
+def test_helper_keys_keep_untagged_queue_name():
+    queue = ReliableQueue(RecordingClient(), "eye:jobs", consumer_id="c1")
+    # Producers still LPUSH onto the plain queue key
+    assert queue.queue_key == "eye:jobs"
+    assert queue.processing_key == "{eye:jobs}:processing:c1"
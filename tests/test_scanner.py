@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from engines.scanner import ScanIndex, iter_image_paths, scan_images, shard_of
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for directory in ("a", "a/nested", "b"):
+        (tmp_path / directory).mkdir(parents=True, exist_ok=True)
+    paths = []
+    for directory in ("", "a", "a/nested", "b"):
+        for i in range(5):
+            path = tmp_path / directory / f"img{i}.jpg"
+            path.write_bytes(b"x")
+            paths.append(str(path))
+    (tmp_path / "notes.txt").write_text("skip me")
+    (tmp_path / "b" / "upper.PNG").write_bytes(b"x")
+    paths.append(str(tmp_path / "b" / "upper.PNG"))
+    return tmp_path, sorted(paths)
+
+
+def test_walk_finds_images_in_deterministic_order(tree):
+    root, paths = tree
+    first = list(iter_image_paths(str(root)))
+    assert sorted(first) == paths
+    assert list(iter_image_paths(str(root))) == first
+
+
+def test_shards_partition_the_tree(tree):
+    root, paths = tree
+    shards = [list(iter_image_paths(str(root), shard_index=i, num_shards=3)) for i in range(3)]
+    combined = [p for shard in shards for p in shard]
+    assert sorted(combined) == paths
+    assert len(set(combined)) == len(combined)
+    for index, shard in enumerate(shards):
+        assert all(shard_of(os.path.relpath(p, root), 3) == index for p in shard)
+
+
+def test_invalid_shard_index(tree):
+    root, _ = tree
+    with pytest.raises(ValueError):
+        list(iter_image_paths(str(root), shard_index=3, num_shards=3))
+
+
+def test_index_returns_only_new_or_changed_files(tree, tmp_path_factory):
+    root, paths = tree
+    index_path = str(tmp_path_factory.mktemp("index") / "scan.sqlite")
+    assert sorted(scan_images(str(root), index_path=index_path)) == paths
+    assert list(scan_images(str(root), index_path=index_path)) == []
+
+    changed = root / "a" / "img0.jpg"
+    changed.write_bytes(b"longer content")
+    added = root / "b" / "new.webp"
+    added.write_bytes(b"x")
+    assert sorted(scan_images(str(root), index_path=index_path)) == sorted([str(changed), str(added)])
+
+
+def test_interrupted_scan_is_not_committed(tree, tmp_path_factory):
+    root, paths = tree
+    index_path = str(tmp_path_factory.mktemp("index") / "scan.sqlite")
+    scan = scan_images(str(root), index_path=index_path)
+    next(scan)
+    scan.close()
+    assert sorted(scan_images(str(root), index_path=index_path)) == paths
+
+
+def test_full_scan_prunes_deleted_files(tree, tmp_path_factory):
+    root, paths = tree
+    index_path = str(tmp_path_factory.mktemp("index") / "scan.sqlite")
+    list(scan_images(str(root), index_path=index_path))
+    os.remove(paths[0])
+    list(scan_images(str(root), index_path=index_path))
+    index = ScanIndex(index_path)
+    try:
+        assert index.count() == len(paths) - 1
+    finally:
+        index.close()
+
+
+def test_worker_refuses_sharding_without_scanner(tree, monkeypatch):
+    from orchestrator.workers import yolo_e_worker
+
+    root, paths = tree
+    monkeypatch.setattr(yolo_e_worker, "scan_images", None)
+    worker = yolo_e_worker.YOLOEWorker()
+    with pytest.raises(RuntimeError):
+        worker._get_image_files(str(root), shard_index=0, num_shards=2)
+    with pytest.raises(RuntimeError):
+        worker._get_image_files(str(root), index_path=str(root / "index.sqlite"))
+    assert sorted(worker._get_image_files(str(root))) == paths
@@ -0,0 +1,114 @@
+import pytest
+
+from orchestrator.scheduler import RedisScheduler, Scheduler, SchedulingPolicy
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def drain(scheduler):
+    order = []
+    while True:
+        job = scheduler.dequeue()
+        if job is None:
+            return order
+        order.append(job["job_id"])
+
+
+def test_classes_run_in_priority_order():
+    clock = Clock()
+    scheduler = Scheduler(clock=clock)
+    scheduler.enqueue("b", {}, priority="batch")
+    scheduler.enqueue("p", {}, priority="prelabel")
+    scheduler.enqueue("i", {}, priority="interactive")
+    assert drain(scheduler) == ["i", "p", "b"]
+
+
+def test_old_batch_job_outranks_fresh_interactive_one():
+    clock = Clock()
+    scheduler = Scheduler(clock=clock)
+    scheduler.enqueue("old-batch", {}, priority="batch")
+    clock.now += 301
+    scheduler.enqueue("interactive", {}, priority="interactive")
+    assert drain(scheduler) == ["old-batch", "interactive"]
+
+
+def test_deadline_caps_the_key():
+    clock = Clock()
+    scheduler = Scheduler(clock=clock)
+    scheduler.enqueue("interactive", {}, priority="interactive")
+    scheduler.enqueue("urgent-batch", {"priority": "batch", "deadline": clock.now - 1})
+    assert drain(scheduler) == ["urgent-batch", "interactive"]
+
+
+def test_busy_tenant_cannot_crowd_out_light_one():
+    scheduler = Scheduler(clock=Clock())
+    for i in range(4):
+        scheduler.enqueue(f"heavy-{i}", {}, tenant="heavy", priority="batch")
+    scheduler.enqueue("light-0", {}, tenant="light", priority="batch")
+    assert drain(scheduler)[:2] == ["heavy-0", "light-0"]
+
+
+def test_weights_share_throughput():
+    policy = SchedulingPolicy(weights={"gold": 2.0})
+    scheduler = Scheduler(policy=policy, clock=Clock())
+    for i in range(6):
+        scheduler.enqueue(f"gold-{i}", {}, tenant="gold", priority="batch")
+        scheduler.enqueue(f"free-{i}", {}, tenant="free", priority="batch")
+    first = drain(scheduler)[:6]
+    assert sum(job.startswith("gold") for job in first) == 4
+
+
+def test_idle_tenant_rejoins_without_banked_credit():
+    scheduler = Scheduler(clock=Clock())
+    for i in range(4):
+        scheduler.enqueue(f"a-{i}", {}, tenant="a", priority="batch")
+    assert [scheduler.dequeue()["job_id"] for _ in range(3)] == ["a-0", "a-1", "a-2"]
+    for i in range(4):
+        scheduler.enqueue(f"b-{i}", {}, tenant="b", priority="batch")
+    # b starts at the current virtual time; with credit from its idle time
+    # it would run three jobs before a's next one
+    assert "a-3" in drain(scheduler)[:3]
+
+
+def test_duplicate_job_ids_and_unknown_priority():
+    scheduler = Scheduler(clock=Clock())
+    assert scheduler.enqueue("a", {})
+    assert not scheduler.enqueue("a", {})
+    assert len(scheduler) == 1
+    with pytest.raises(ValueError):
+        scheduler.enqueue("b", {}, priority="urgent")
+
+
+class FakeClient:
+    def __init__(self, head):
+        self.head = head
+        self.calls = []
+
+    def register_script(self, script):
+        return script
+
+    def zrange(self, key, start, stop):
+        return [self.head]
+
+
+def test_redis_keys_share_a_hash_tag_and_dequeue_follows_the_head():
+    client = FakeClient(b"a")
+    scheduler = RedisScheduler(client, prefix="eye:sched")
+    replies = [[b"b"], [b"job-1", b'{"tenant": "b"}']]
+
+    def dequeue(keys, args):
+        client.calls.append(keys)
+        return replies.pop(0)
+
+    scheduler._dequeue = dequeue
+    job = scheduler.dequeue()
+    assert job == {"tenant": "b", "job_id": "job-1"}
+    # The pop is retried against the tenant the script reported at the head
+    assert [keys[1] for keys in client.calls] == ["{eye:sched}:tenant:a", "{eye:sched}:tenant:b"]
+    assert all(key.startswith("{eye:sched}:") for keys in client.calls for key in keys)
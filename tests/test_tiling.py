@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from engines.tiling import (
+    TileSpec,
+    merge_tile_detections,
+    nms,
+    slice_tiles,
+    tile_grid,
+    weighted_box_fusion,
+)
+
+
+def test_tile_grid_covers_image_with_equal_tiles():
+    grid = tile_grid(1500, 900, tile_size=640, overlap=0.2)
+    assert all(x1 - x0 == 640 and y1 - y0 == 640 for x0, y0, x1, y1 in grid)
+    assert max(x1 for _, _, x1, _ in grid) == 1500
+    assert max(y1 for _, _, _, y1 in grid) == 900
+    assert (0, 0, 640, 640) in grid
+
+
+def test_tile_grid_small_image_is_one_tile():
+    assert tile_grid(300, 200, tile_size=640) == [(0, 0, 300, 200)]
+
+
+def test_slice_tiles_are_views():
+    image = np.zeros((900, 1500, 3), dtype=np.uint8)
+    tiles = slice_tiles(image, tile_grid(1500, 900))
+    assert all(np.shares_memory(tile, image) for tile in tiles)
+
+
+def test_nms_is_class_aware():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10]], dtype=np.float64)
+    scores = np.array([0.9, 0.8, 0.7])
+    classes = np.array([0, 0, 1])
+    keep = nms(boxes, scores, classes, iou_threshold=0.5)
+    assert keep.tolist() == [0, 2]
+
+
+def test_wbf_averages_overlapping_boxes_by_score():
+    boxes = np.array([[0, 0, 10, 10], [2, 2, 12, 12], [50, 50, 60, 60]], dtype=np.float64)
+    scores = np.array([0.75, 0.25, 0.5])
+    classes = np.array([3, 3, 3])
+    fused, fused_scores, fused_classes = weighted_box_fusion(boxes, scores, classes, iou_threshold=0.3)
+    assert fused.shape == (2, 4)
+    np.testing.assert_allclose(fused[0], [0.5, 0.5, 10.5, 10.5])
+    np.testing.assert_allclose(fused_scores, [0.75, 0.5])
+    assert fused_classes.tolist() == [3, 3]
+
+
+@pytest.mark.parametrize("merge", ["nms", "wbf"])
+def test_merge_maps_tiles_to_image_and_dedupes_overlap(merge):
+    # The same object seen by two overlapping tiles
+    tile_boxes = [np.array([[600, 100, 630, 130]]), np.array([[88, 100, 118, 130]])]
+    tile_scores = [np.array([0.9]), np.array([0.8])]
+    tile_classes = [np.array([1]), np.array([1])]
+    boxes, scores, classes = merge_tile_detections(
+        tile_boxes, tile_scores, tile_classes, [(0, 0), (512, 0)], TileSpec(merge=merge)
+    )
+    assert len(boxes) == 1
+    np.testing.assert_allclose(boxes[0], [600, 100, 630, 130])
+    assert scores.tolist() == [0.9]
+    assert classes.tolist() == [1]
+
+
+def test_merge_with_no_detections():
+    boxes, scores, classes = merge_tile_detections(
+        [np.zeros((0, 4))], [np.zeros(0)], [np.zeros(0)], [(0, 0)], TileSpec()
+    )
+    assert boxes.shape == (0, 4) and len(scores) == 0 and len(classes) == 0
+
+
+def test_tile_spec_validation():
+    with pytest.raises(ValueError):
+        TileSpec(merge="soft-nms").validate()
+    with pytest.raises(ValueError):
+        TileSpec(overlap=1.0).validate()
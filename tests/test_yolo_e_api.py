@@ -0,0 +1,66 @@
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from api import yolo_e
+
+COLUMNS = {"class_ids": [3], "class_names": ["cat"], "confidence_scores": [0.9],
+           "bounding_boxes": [[1.0, 2.0, 3.0, 4.0]]}
+
+
+class NoCache:
+    def cache_key(self, *args, **kwargs):
+        return "key"
+
+    async def aget(self, key):
+        return None
+
+    async def aset(self, key, detections):
+        pass
+
+
+def fake_detect_batch(key, images):
+    return [COLUMNS for _ in images]
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(yolo_e, "get_detection_cache", lambda: NoCache())
+    monkeypatch.setattr(yolo_e, "detect_batch", fake_detect_batch)
+    app = FastAPI()
+    app.include_router(yolo_e.router, prefix="/api")
+    weights = tmp_path / "trained.pt"
+    weights.write_bytes(b"weights")
+    return TestClient(app), str(weights)
+
+
+def jpeg():
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), "white").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_infer_trained_returns_detections(client):
+    http, weights = client
+    response = http.post(
+        "/api/v1/yolo-e/infer/trained",
+        files={"file": ("a.jpg", jpeg(), "image/jpeg")},
+        data={"model_path": weights, "use_gpu": "false"},
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["detections"][0]["class_name"] == "cat"
+    assert body["class_ids"] == [3]
+
+
+def test_infer_trained_missing_model(client):
+    http, weights = client
+    response = http.post(
+        "/api/v1/yolo-e/infer/trained",
+        files={"file": ("a.jpg", jpeg(), "image/jpeg")},
+        data={"model_path": weights + ".missing", "use_gpu": "false"},
+    )
+    assert response.status_code == 404
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+
+from services.yolo_e_batcher import BatchKey, BatchPolicy, InferenceBatcher
+
+KEY = BatchKey("yoloe-11s-seg.pt", "cpu", 0.5, 0.45)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_flushes_when_batch_is_full():
+    batches = []
+
+    def runner(key, items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = InferenceBatcher(runner, BatchPolicy(max_batch_size=4, max_wait_ms=5000), policies={})
+        start = time.time()
+        results = await asyncio.gather(*(batcher.submit(KEY, i) for i in range(4)))
+        return results, time.time() - start
+
+    results, elapsed = run(main())
+    assert results == [0, 2, 4, 6]
+    assert batches == [[0, 1, 2, 3]]
+    assert elapsed < 1.0  # did not wait for max_wait_ms
+
+
+def test_flushes_partial_batch_after_max_wait():
+    batches = []
+
+    def runner(key, items):
+        batches.append(len(items))
+        return items
+
+    async def main():
+        batcher = InferenceBatcher(runner, BatchPolicy(max_batch_size=8, max_wait_ms=20), policies={})
+        return await asyncio.gather(batcher.submit(KEY, "a"), batcher.submit(KEY, "b"))
+
+    assert run(main()) == ["a", "b"]
+    assert batches == [2]
+
+
+def test_keys_are_batched_separately():
+    seen = []
+
+    def runner(key, items):
+        seen.append((key.confidence_threshold, len(items)))
+        return items
+
+    async def main():
+        batcher = InferenceBatcher(runner, BatchPolicy(max_batch_size=8, max_wait_ms=10), policies={})
+        other = KEY._replace(confidence_threshold=0.25)
+        await asyncio.gather(batcher.submit(KEY, 1), batcher.submit(other, 2), batcher.submit(KEY, 3))
+
+    run(main())
+    assert sorted(seen) == [(0.25, 1), (0.5, 2)]
+
+
+def test_runner_error_fails_every_caller_in_batch():
+    def runner(key, items):
+        raise ValueError("boom")
+
+    async def main():
+        batcher = InferenceBatcher(runner, BatchPolicy(max_batch_size=2, max_wait_ms=10), policies={})
+        return await asyncio.gather(batcher.submit(KEY, 1), batcher.submit(KEY, 2), return_exceptions=True)
+
+    results = run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_result_count_mismatch_is_an_error():
+    async def main():
+        batcher = InferenceBatcher(lambda key, items: items[:1], BatchPolicy(max_batch_size=2, max_wait_ms=10), policies={})
+        return await asyncio.gather(batcher.submit(KEY, 1), batcher.submit(KEY, 2), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in run(main()))
+
+
+def test_policy_lookup_by_model_name():
+    batcher = InferenceBatcher(lambda k, i: i, BatchPolicy(max_batch_size=8),
+                               policies={"yoloe-11s-seg.pt": BatchPolicy(max_batch_size=16)})
+    assert batcher.policy_for(KEY).max_batch_size == 16
+    assert batcher.policy_for(KEY._replace(model_path="other.pt")).max_batch_size == 8
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from services.yolo_e_registry import ModelRegistry, ModelRegistryConfig
+
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+
+
+@pytest.fixture
+def weights(tmp_path):
+    def make(name):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 1024)
+        return str(path)
+    return make
+
+
+def make_registry(max_models=2, loads=None):
+    def loader(path):
+        if loads is not None:
+            loads.append(path)
+        return FakeModel(path)
+    return ModelRegistry(ModelRegistryConfig(memory_budget_mb=1024, max_models=max_models), loader=loader)
+
+
+def test_model_loaded_once_and_shared(weights):
+    loads = []
+    registry = make_registry(loads=loads)
+    path = weights("a.pt")
+    with registry.use(path) as first, registry.use(path) as second:
+        assert first is second
+        assert first.refcount == 2
+    assert loads == [path]
+    assert registry.list_loaded()[0]["in_use"] == 0
+
+
+def test_lru_evicts_least_recently_used_idle_model(weights):
+    registry = make_registry(max_models=2)
+    a, b, c = weights("a.pt"), weights("b.pt"), weights("c.pt")
+    registry.warm(a)
+    registry.warm(b)
+    registry.warm(a)  # a is now most recently used
+    registry.warm(c)
+    assert registry.is_loaded(a)
+    assert not registry.is_loaded(b)
+    assert registry.is_loaded(c)
+    assert registry.evictions == 1
+
+
+def test_pinned_model_is_not_evicted(weights):
+    registry = make_registry(max_models=1)
+    a, b = weights("a.pt"), weights("b.pt")
+    entry = registry.acquire(a)
+    registry.warm(b)
+    # Over budget, but a is in use, so the idle b is the one evicted
+    assert registry.is_loaded(a)
+    assert not registry.is_loaded(b)
+    registry.release(entry)
+    registry.warm(b)
+    assert not registry.is_loaded(a)
+    assert registry.is_loaded(b)
+
+
+def test_concurrent_acquire_loads_once_and_drops_load_lock(weights):
+    loads = []
+    registry = make_registry(loads=loads)
+    path = weights("a.pt")
+    original = registry._loader
+
+    def slow_loader(p):
+        time.sleep(0.05)
+        return original(p)
+
+    registry._loader = slow_loader
+    threads = [threading.Thread(target=registry.warm, args=(path,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loads == [path]
+    assert registry._load_locks == {}
+
+
+def test_load_locks_do_not_accumulate_per_variant(weights):
+    registry = make_registry(max_models=2)
+    path = weights("a.pt")
+    for i in range(20):
+        registry.warm(path) if i == 0 else registry.release(registry.acquire(path, variant=f"vocab-{i}"))
+    assert registry._load_locks == {}
+    assert len(registry.list_loaded()) == 2
+
+
+def test_failed_load_releases_load_lock(weights, tmp_path):
+    registry = make_registry()
+    with pytest.raises(FileNotFoundError):
+        registry.acquire(str(tmp_path / "missing.pt"))
+    assert registry._load_locks == {}
+
+
+def test_changed_weights_are_reloaded(weights):
+    loads = []
+    registry = make_registry(loads=loads)
+    path = weights("a.pt")
+    registry.warm(path)
+    with open(path, "ab") as f:
+        f.write(b"more")
+    registry.warm(path)
+    assert loads == [path, path]
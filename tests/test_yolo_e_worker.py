@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from orchestrator.workers import yolo_e_worker
+
+
+class FakeEngine:
+    """Records how many calls overlap; load fails for paths containing "missing" """
+
+    def __init__(self):
+        self.loaded = False
+        self.weights = None
+        self.active = 0
+        self.max_active = 0
+        self.guard = threading.Lock()
+
+    def load(self, weights_path, config_path=None):
+        if "missing" in weights_path:
+            raise RuntimeError("no such file")
+        self.weights = weights_path
+        self.loaded = True
+
+    def infer_batch(self, inputs, **kwargs):
+        with self.guard:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.02)
+        with self.guard:
+            self.active -= 1
+        return [{"detections": [{"class": "cat"}]} for _ in inputs]
+
+
+def make_worker(monkeypatch, weights="base.pt"):
+    monkeypatch.setattr(yolo_e_worker, "YOLOENode", FakeEngine)
+    monkeypatch.setattr(yolo_e_worker, "YOLO_E_WEIGHTS", weights)
+    worker = yolo_e_worker.YOLOEWorker()
+    worker.initialize()
+    return worker
+
+
+def test_initialize_loads_default_weights(monkeypatch):
+    worker = make_worker(monkeypatch)
+    assert worker.yolo_e_engine.loaded and worker.yolo_e_engine.weights == "base.pt"
+    result = worker.process_job({"id": "j1", "type": "inference", "image_path": "a.jpg"})
+    assert result["detections"] == [{"class": "cat"}]
+
+
+def test_engine_calls_are_serialized(monkeypatch):
+    worker = make_worker(monkeypatch)
+    jobs = [{"id": f"j{i}", "type": "inference", "image_path": f"{i}.jpg"} for i in range(8)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(worker.process_job, jobs))
+    assert len(results) == 8
+    assert worker.yolo_e_engine.max_active == 1
+
+
+def test_failed_load_falls_back_to_placeholder(monkeypatch):
+    worker = make_worker(monkeypatch, weights="missing.pt")
+    assert worker.initialized and not worker.yolo_e_engine.loaded
+    result = worker.process_job({"id": "j1", "type": "inference", "image_path": "a.jpg"})
+    assert result["detections"] == []
+
+
+def test_model_loading_job_loads_the_engine(monkeypatch):
+    worker = make_worker(monkeypatch, weights="missing.pt")
+    result = worker.process_job({"id": "j1", "type": "model_loading", "model_path": "trained.pt"})
+    assert result["model_loaded"] and worker.yolo_e_engine.weights == "trained.pt"